@@ -1,4 +1,6 @@
-from typing import Dict, List, Optional
+import os
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Literal, Optional
 
 from fipy.cfg.reader import YamlReader
 from pydantic import AnyHttpUrl, BaseModel, BaseSettings, PyObject
@@ -14,11 +16,23 @@ class BoardAssembly(BaseModel):
     be used to instantiate the dashboard whereas the service and board paths
     are optional params for tweaking the URL at which the dashboard gets
     mounted as a FastAPI sub-app. See `BasePath` for the details of how the
-    mount URL gets generated.
+    mount URL gets generated. If `orion_snapshots` is on, the dashboard
+    reads the latest values of entities from in-memory snapshots of Orion
+    entities rather than querying a backend on every refresh. See
+    `SnapshotSettings`.
+
+    When Dazzler assembles boards lazily, i.e. on the first request for
+    them, `warm_up` makes it assemble this one at startup anyway, so the
+    first user to open it doesn't have to wait. If set, `compress` turns
+    response compression on or off for this board regardless of what
+    `CompressionSettings` says.
     """
     builder: PyObject
     service_path: Optional[str]
     board_path: Optional[str]
+    orion_snapshots: Optional[bool]
+    warm_up: Optional[bool]
+    compress: Optional[bool]
 
 
 def demo_boards() -> List[BoardAssembly]:
@@ -32,10 +46,183 @@ DEMO_TENANT_NAME = 'demo'
 CONFIG_FILE_ENV_VAR_NAME = 'DAZZLER_CONFIG'
 
 
+EntityType = str
+
+
+class QueryCacheSettings(BaseModel):
+    """Sizing of the process-wide cache of backend query results.
+
+    Cached results stay around for `default_ttl` seconds, unless the
+    `ttls` map has an entry for the type of the entities being queried
+    in which case that TTL wins. A TTL of zero disables caching. The
+    cache evicts least recently used results when the memory they take
+    up goes over `max_bytes`.
+
+    With several worker processes, the caches of all the workers can
+    share results through a store in shared memory (`shm`), kept in
+    `shm_dir` and also bounded by `max_bytes`, or in Redis (`redis`) at
+    `redis_url`. The Redis store needs the `redis` package. Dazzler only
+    uses `shm_dir` if it's owned by the user Dazzler runs as and nobody
+    else can access it. Workers share the images boards render through
+    the same store.
+    """
+    max_bytes: int = 64 * 1024 * 1024
+    default_ttl: float = 2.0
+    ttls: Dict[EntityType, float] = {}
+    shared: Literal['none', 'shm', 'redis'] = 'none'
+    shm_dir: str = '/dev/shm/dazzler-query-cache'
+    redis_url: Optional[str] = None
+
+    def ttl_for(self, entity_type: EntityType) -> float:
+        return self.ttls.get(entity_type, self.default_ttl)
+
+
+class HttpSettings(BaseModel):
+    """Tuning of the HTTP connections to FIWARE backends.
+
+    Dazzler keeps a pool of up to `pool_maxsize` connections for each
+    backend, shared by all tenants and boards. Connections stay open
+    between requests unless `keep_alive` is off. GET requests that fail
+    with a connection error or a 502, 503 or 504 get retried up to
+    `retries` times, waiting `backoff_factor * 2^(n-1)` seconds before
+    the n-th retry. Timeouts are in seconds. Async data sources send at
+    most `max_concurrency` requests at a time to each backend and retry
+    connection errors only.
+    """
+    pool_maxsize: int = 32
+    max_concurrency: int = 16
+    keep_alive: bool = True
+    connect_timeout: float = 3.05
+    read_timeout: float = 30
+    retries: int = 2
+    backoff_factor: float = 0.2
+
+
+class PushSettings(BaseModel):
+    """Configuration of the push mode for live boards.
+
+    When enabled, live boards refresh when Orion notifies Dazzler of
+    updates to the entities they display rather than on a timer. Orion
+    has to be able to reach Dazzler at `notify_base_url` and won't send
+    more than one notification every `throttling` seconds for the same
+    subscription. Orion notifies Quantum Leap at the same time as Dazzler,
+    so boards refresh once more `follow_up` seconds after a notification
+    to pick up data that wasn't in Quantum Leap yet the first time round.
+    Set it to zero to turn the follow-up refresh off.
+    """
+    enabled: bool = False
+    notify_base_url: AnyHttpUrl = 'http://dazzler:8000'
+    throttling: int = 1
+    follow_up: float = 2.0
+
+
+class SnapshotSettings(BaseModel):
+    """Refreshing of the in-memory snapshots of Orion entities.
+
+    A background thread fetches the current state of the entities in
+    each snapshot from Orion every `interval` seconds. Snapshots no board
+    read in the last `idle_expiry` seconds get dropped, so Dazzler stops
+    polling Orion for data nobody looks at.
+    """
+    interval: float = 1.0
+    idle_expiry: float = 300.0
+
+
+class PrefetchSettings(BaseModel):
+    """Scheduling of the queries boards share through the prefetch
+    scheduler.
+
+    Each board tells the scheduler how often it needs fresh data. Queries
+    no board read in the last `idle_expiry` seconds stop running.
+    """
+    idle_expiry: float = 300.0
+
+
+class DownsampleSettings(BaseModel):
+    """Downsampling of long series before plotting.
+
+    Boards plot at most about `target_points` points per chart, picked
+    with the given `method`: `lttb` (Largest-Triangle-Three-Buckets) to
+    preserve the shape of the series or `minmax` to keep the extremes of
+    each bucket of points. Charts showing downsampled data say so.
+    """
+    enabled: bool = True
+    target_points: int = 800
+    method: Literal['lttb', 'minmax'] = 'lttb'
+
+
+class EntityIndexSettings(BaseModel):
+    """Loading of the entity IDs boards let users search through.
+
+    IDs get fetched `page_size` at a time. Every `refresh_interval`
+    seconds we only fetch the entities created since the last fetch, and
+    every `rebuild_interval` seconds we fetch all of them again to drop
+    deleted ones. Selectors show at most `max_options` matching IDs.
+    """
+    page_size: int = 1000
+    refresh_interval: float = 30.0
+    rebuild_interval: float = 600.0
+    max_options: int = 50
+
+
+class ComponentSuiteSettings(BaseModel):
+    """Serving of the JavaScript bundles of Dash component libraries.
+
+    With `shared` on, all boards load the bundles from the same URLs, so
+    browsers only download them once. Dazzler compresses each bundle with
+    gzip at `gzip_level` and, if the `brotli` package is installed, with
+    Brotli at `brotli_quality`.
+    """
+    shared: bool = True
+    gzip_level: int = 9
+    brotli_quality: int = 11
+
+
+class CompressionSettings(BaseModel):
+    """Compression of HTTP responses, e.g. the figures board callbacks
+    send to browsers.
+
+    With `enabled` on, Dazzler compresses responses of at least
+    `min_size` bytes, unless the board they come from says otherwise, see
+    `BoardAssembly`. Responses get compressed with Brotli at
+    `brotli_quality`, if the `brotli` package is installed and the
+    browser accepts it, or gzip at `gzip_level` otherwise.
+    """
+    enabled: bool = False
+    min_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+
+class MetricsSettings(BaseModel):
+    """Collection of the metrics Dazzler exposes at `/metrics`.
+
+    With `enabled` on, we time board callbacks and backend queries. The
+    latency histograms count observations in `latency_buckets`, given as
+    upper bounds in seconds.
+    """
+    enabled: bool = True
+    latency_buckets: List[float] = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                    0.5, 1.0, 2.5, 5.0, 10.0]
+
+
 class Settings(BaseSettings):
     orion_base_url: AnyHttpUrl = 'http://orion:1026'
     quantumleap_base_url: AnyHttpUrl = 'http://quantumleap:8668'
     boards: Dict[TenantName, List[BoardAssembly]] = {}
+    hot_reload_interval: Optional[float] = None
+    lazy_boards: bool = False
+    dispatch_boards: bool = False
+    query_cache: QueryCacheSettings = QueryCacheSettings()
+    http: HttpSettings = HttpSettings()
+    push: PushSettings = PushSettings()
+    snapshots: SnapshotSettings = SnapshotSettings()
+    prefetch: PrefetchSettings = PrefetchSettings()
+    downsampling: DownsampleSettings = DownsampleSettings()
+    entity_index: EntityIndexSettings = EntityIndexSettings()
+    component_suites: ComponentSuiteSettings = ComponentSuiteSettings()
+    compression: CompressionSettings = CompressionSettings()
+    metrics: MetricsSettings = MetricsSettings()
 
     @staticmethod
     def demo_config() -> 'Settings':
@@ -56,5 +243,88 @@ class Settings(BaseSettings):
         return Settings.demo_config()
 
 
+_settings: Optional[Settings] = None
+_settings_lock = Lock()
+
+
 def dazzler_config() -> Settings:
-    return Settings.load()
+    """Get the Dazzler settings. We load the settings the first time this
+    function gets called and then keep on returning the same instance until
+    `reload_config` gets called.
+
+    Returns:
+        The process-wide Dazzler settings.
+    """
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = Settings.load()
+        return _settings
+
+
+def reload_config() -> Settings:
+    """Load the Dazzler settings again and make them the process-wide
+    settings `dazzler_config` returns from now on.
+
+    Returns:
+        The freshly loaded settings.
+    """
+    global _settings
+    settings = Settings.load()
+    with _settings_lock:
+        _settings = settings
+    return settings
+
+
+class ConfigWatcher:
+    """Reloads the Dazzler settings whenever the config file changes.
+
+    A background thread checks the modification time of the file the
+    `DAZZLER_CONFIG` env var points to every `interval` seconds. If the
+    file changed, the thread reloads the process-wide settings and passes
+    them on to the given callback.
+
+    Dazzler's callback recreates the shared services whose settings
+    changed, like the query cache or the HTTP connection pools, and
+    remounts the boards. A few settings only take effect on restart:
+    `lazy_boards`, `dispatch_boards`, `hot_reload_interval`, `metrics`,
+    the `push` notification URL and throttling, and the `compression`
+    size threshold and levels. See `dazzler.dash.services`.
+    """
+
+    def __init__(self, interval: float,
+                 on_reload: Callable[[Settings], None]):
+        self._interval = interval
+        self._on_reload = on_reload
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, daemon=True,
+                              name='dazzler-config-watcher')
+
+    @staticmethod
+    def _modified_time() -> Optional[float]:
+        path = os.environ.get(CONFIG_FILE_ENV_VAR_NAME)
+        try:
+            return os.stat(path).st_mtime if path else None
+        except OSError:
+            return None
+
+    def _run(self):
+        last_modified = self._modified_time()
+        while not self._stopped.wait(self._interval):
+            modified = self._modified_time()
+            if modified is None or modified == last_modified:
+                continue
+            last_modified = modified
+            try:
+                self._on_reload(reload_config())
+            except Exception as e:
+                print(f"Dazzler config reload failed: {e}")
+    # NOTE. Broken config. If the new file content is invalid, we keep on
+    # running with the settings we've got and try again on the next change.
+
+    def start(self) -> 'ConfigWatcher':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
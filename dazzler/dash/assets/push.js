@@ -0,0 +1,43 @@
+// Push-mode refresh triggers.
+// Look for the hidden buttons `dazzler.dash.push.LiveRefresh` puts in the
+// board layout in push mode, listen to the SSE stream each button points
+// to and click the button whenever an event comes in, then once more after
+// the follow-up delay, unless another event comes in first. Dash renders
+// the layout after the page loads, so we watch the DOM for new buttons.
+(function () {
+    const EVENTS_URL_ATTR = 'data-dazzler-events';
+    const FOLLOW_UP_ATTR = 'data-dazzler-follow-up';
+    const WIRED_ATTR = 'data-dazzler-wired';
+
+    function wire(button) {
+        button.setAttribute(WIRED_ATTR, 'true');
+        const events = new EventSource(button.getAttribute(EVENTS_URL_ATTR));
+        const followUp = Number(button.getAttribute(FOLLOW_UP_ATTR)) || 0;
+        let followUpTimer = null;
+
+        function refresh() {
+            if (document.body.contains(button)) {
+                button.click();
+                return true;
+            }
+            events.close();
+            return false;
+        }
+
+        events.onmessage = function () {
+            clearTimeout(followUpTimer);
+            if (refresh() && followUp > 0) {
+                followUpTimer = setTimeout(refresh, followUp);
+            }
+        };
+    }
+
+    function wireAll() {
+        const selector = `[${EVENTS_URL_ATTR}]:not([${WIRED_ATTR}])`;
+        document.querySelectorAll(selector).forEach(wire);
+    }
+
+    new MutationObserver(wireAll).observe(document, {
+        childList: true, subtree: true
+    });
+})();
@@ -1,18 +1,38 @@
 import datetime
+import itertools
 from abc import ABC
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Union
 
 import dash_bootstrap_components as dbc
+import httpx
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import pytz
-from dash import Dash, html, dcc, Output, Input
+from dash import Dash, html, dcc, Output
 from dash.development.base_component import Component
 from requests import HTTPError, ConnectionError
 
-from dazzler.dash.fiware import QuantumLeapSource, OrionSource
-from dazzler.dash.wiring import BasePath
+from dazzler.dash.figures import FigureCache
+from dazzler.dash.fiware import AttributePath, BatchResult, \
+    QuantumLeapSource, OrionSource, SeriesQuery
+from dazzler.dash.prefetch import prefetch_scheduler
+from dazzler.dash.push import LiveRefresh
+from dazzler.dash.snapshot import snapshot_table
+from dazzler.dash.wiring import BasePath, orion_snapshots_for
+from dazzler.ngsy import WORKER_FATIGUE_PATH
+
+
+FATIGUE = AttributePath(WORKER_FATIGUE_PATH)
+
+ASSIGNMENT_ATTRS = ['creationTimestamp', 'oldTask', 'newTask',
+                    'additionalParameters']
+EXECUTION_ATTRS = ['creationTimestamp']
+
+LatestRecord = Union[Dict, Exception, None]
+"""The attributes of the last entity of a type, the error we got trying
+to fetch it or `None` if there's no such entity.
+"""
 
 
 def dash_builder(app: Dash) -> Dash:
@@ -27,6 +47,15 @@ class FatigueDashboard(ABC):
         self._orion = OrionSource(app)
         self._quantumleap = QuantumLeapSource(app)
         self._base_path = BasePath.from_board_app(app)
+        self._snapshots = orion_snapshots_for(app)
+        self._refresh = LiveRefresh(app, 'fams-interval', 5 * 1000,
+                                    'Worker', 'TaskAssignment',
+                                    'TaskExecution')
+        self._workers = prefetch_scheduler().register(
+            app, 'Worker', window=datetime.timedelta(minutes=10), period=5,
+            attrs=[FATIGUE.attr_name]
+        )
+        self._figures = FigureCache()
 
         self.worker_data = dict()
 
@@ -36,6 +65,7 @@ class FatigueDashboard(ABC):
         return self.app
 
     def _build_layout(self):
+        worker_graphs, interventions = self._update_panels()
         self.app.layout = dbc.Container(
             [
                 html.H1("Worker lines fatigue monitoring dashboard"),
@@ -54,26 +84,17 @@ class FatigueDashboard(ABC):
                         html.Hr(),
 
                         dbc.Col(
-                            children=[self._build_worker_graphs()],
+                            children=[worker_graphs],
                             md=12,
                             id="worker_graphs"
                         ),
-                        dcc.Interval(
-                            id='worker-interval',
-                            interval=5 * 1000,  # in milliseconds
-                            n_intervals=0
-                        ),
 
                         dbc.Col(
-                            children=[self._build_interventions()],
+                            children=[interventions],
                             md=12,
                             id="interventions"
                         ),
-                        dcc.Interval(
-                            id='interventions-interval',
-                            interval=5 * 1000,  # in milliseconds
-                            n_intervals=0
-                        )
+                        self._refresh.component()
                     ]
                 ),
             ],
@@ -87,36 +108,98 @@ class FatigueDashboard(ABC):
     def _worker_line(self, worker_id):
         return ord(worker_id[-1]) % 3
 
-    def _fetch_workers_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
-
+    def _fetch_panel_data(self) -> Tuple[pd.DatetimeIndex, BatchResult,
+                                         LatestRecord, LatestRecord]:
         dti = self._date_time_index_utc()
+        workers = self._prefetched_workers()
+        if self._snapshots:
+            return (dti, workers,
+                    self._snapshot_record("TaskAssignment", ASSIGNMENT_ATTRS),
+                    self._snapshot_record("TaskExecution", EXECUTION_ATTRS))
 
+        from_ = pd.Timestamp.now('utc') - pd.Timedelta(hours=1)
+        queries = [
+            SeriesQuery(entity_type="TaskAssignment",
+                        from_timepoint=from_, entries_from_latest=1),
+            SeriesQuery(entity_type="TaskExecution",
+                        from_timepoint=from_, entries_from_latest=1)
+        ]
+        assignments, executions = self._quantumleap.fetch_batch(
+            queries, return_exceptions=True
+        )
+        return (dti, workers,
+                self._latest_record(assignments),
+                self._latest_record(executions))
+    # NOTE. Panel queries. The Worker series comes from the prefetch
+    # scheduler, which queries QL in the background for all the boards
+    # showing workers. Both panels refresh on the same tick, so we run
+    # the two remaining QL queries in one batch. This way the refresh takes
+    # as long as the slowest query rather than as long as both. With Orion
+    # snapshots, the last assignment and execution come from memory and
+    # the refresh doesn't query any backend.
+
+    def _prefetched_workers(self) -> BatchResult:
         try:
-            r = self._quantumleap.fetch_entity_type_series(entity_type="Worker",
-                                                           from_timepoint=dti[0],
-                                                           to_timepoint=dti[-1])
-            worker_data = {
-                k: r[k].set_index('index').workerStates.apply(
-                    lambda x: x["fatigue"]["level"]["value"] if x else x).resample('T').mean().to_frame(
-                    name=f'Line{self._worker_line(k) + 1}'
-                )
-                for k in r if r[k]['workerStates'].any()}
-
-            fatigue_df = self._empty_dataset(dti)
-            for worker_df in worker_data.values():
-                fatigue_df = pd.concat([fatigue_df, worker_df])
-
-        except (HTTPError, ConnectionError) as e:
+            return self._workers.frames()
+        except Exception as e:
+            return e
+
+    def _fetch_workers_data(self, dti: pd.DatetimeIndex, r: BatchResult) \
+            -> Tuple[pd.DataFrame, pd.DataFrame]:
+        try:
+            if isinstance(r, Exception):
+                raise r
+            states = {k: r[k][FATIGUE.attr_name].tolist() for k in r}
+            workers = [k for k in r if any(states[k])]
+            lines = [f'Line{self._worker_line(k) + 1}' for k in workers]
+            fatigue_df = self._line_fatigue(
+                dti, [r[k]['index'] for k in workers],
+                [states[k] for k in workers], lines
+            )
+
+        except (HTTPError, ConnectionError, httpx.HTTPError) as e:
             print(f"No data available for the given time window {dti[0]} -- {dti[-1]}")
             print(e)
             return pd.DataFrame(columns=['workers', 'line']), self._empty_dataset()
 
         workers_lines_df = pd.DataFrame(
-            {'workers': worker_data.keys(),
-             'line': [f'Line{self._worker_line(w_id) + 1}' for w_id in worker_data]}
+            {'workers': workers, 'line': lines}
         ).groupby('line').count()
 
-        return workers_lines_df, fatigue_df.groupby(fatigue_df.index).mean()
+        return workers_lines_df, fatigue_df
+
+    def _line_fatigue(self, dti: pd.DatetimeIndex,
+                      time_indexes: List[pd.Series], states: List[list],
+                      lines: List[str]) -> pd.DataFrame:
+        empty = self._empty_dataset(dti)
+        if not states:
+            return empty
+
+        sizes = [len(xs) for xs in states]
+        times = pd.DatetimeIndex(np.concatenate([t.values
+                                                 for t in time_indexes]))
+        samples = pd.DataFrame({
+            FATIGUE.attr_name: list(itertools.chain.from_iterable(states))
+        })
+        samples = pd.DataFrame({
+            'minute': times.tz_localize('UTC').floor('T'),
+            'worker': np.repeat(np.arange(len(states)), sizes),
+            'line': np.repeat(lines, sizes),
+            'fatigue': FATIGUE.extract(samples).to_numpy(dtype=np.float64)
+        })
+        worker_means = samples.groupby(['minute', 'line', 'worker'],
+                                       sort=False)['fatigue'].mean()
+        line_means = worker_means.groupby(level=['minute', 'line']).mean() \
+            .unstack('line')
+        return empty.combine_first(line_means)[list(empty.columns)]
+    # NOTE. Line fatigue. Each line's fatigue at a given minute is the mean
+    # of the fatigue means of the line's workers over that minute. We used
+    # to resample each worker's series and then concat them one at a time,
+    # which copies the accumulated frame for each worker. Now we lay out
+    # all the samples in flat arrays in one go and run two group-bys, so
+    # the cost grows linearly with the number of samples. The empty data
+    # set gives us a row for every minute in the window, even without
+    # samples.
 
     def _empty_dataset(self, dti=None) -> pd.DataFrame:
         if dti is None:
@@ -129,8 +212,8 @@ class FatigueDashboard(ABC):
 
         return df.resample('T').mean()
 
-    def _build_worker_graphs(self, n=0) -> Component:
-        workers_by_line_df, worker_data = self._fetch_workers_data()
+    def _build_worker_graphs(self, workers_by_line_df: pd.DataFrame,
+                             worker_data: pd.DataFrame) -> Component:
         worker_data.index = worker_data.index.tz_convert('CET')  # read timezone from env
 
         return dbc.Row(
@@ -150,15 +233,7 @@ class FatigueDashboard(ABC):
                         ]),
                         dbc.Col(
                             dcc.Graph(id="workers-by-line",
-                                      figure=px.pie(
-                                          workers_by_line_df,
-                                          title="",
-                                          values="workers",
-                                          names=workers_by_line_df.index,
-                                          color=workers_by_line_df.index,
-                                          color_discrete_sequence=['rgb(248,156,116)', 'rgb(139,224,164)',
-                                                                   'rgb(158,185,243)'],
-                                      ))
+                                      figure=self._build_workers_by_line(workers_by_line_df))
                         )
                     ],
                     className="gy-3",
@@ -194,8 +269,19 @@ class FatigueDashboard(ABC):
             ],
         )
 
+    def _build_workers_by_line(self, workers_by_line_df):
+        return self._figures.figure('workers-by-line', workers_by_line_df, lambda: px.pie(
+            workers_by_line_df,
+            title="",
+            values="workers",
+            names=workers_by_line_df.index,
+            color=workers_by_line_df.index,
+            color_discrete_sequence=['rgb(248,156,116)', 'rgb(139,224,164)',
+                                     'rgb(158,185,243)'],
+        ))
+
     def _build_worker_line_fatigue_last(self, fatigue_df):
-        return px.bar(
+        return self._figures.figure('current-fatigue', fatigue_df, lambda: px.bar(
             # title='Control',
             x=fatigue_df.columns,
             y=[fatigue_df[line].mean() for line in fatigue_df.columns],
@@ -204,23 +290,41 @@ class FatigueDashboard(ABC):
             color=fatigue_df.columns,
             color_discrete_sequence=['rgb(248,156,116)', 'rgb(139,224,164)', 'rgb(158,185,243)'],
             range_y=[0, 10]
-        )
+        ))
 
     def _build_worker_line_fatigue_timeseries(self, fatigue_df):
-        return px.line(
+        return self._figures.figure('timeseries-fatigue', fatigue_df, lambda: px.line(
             fatigue_df,
             labels={'index': 'Time', 'value': 'Fatigue [avg]', 'variable': 'Legend'},
             color_discrete_sequence=['rgb(248,156,116)', 'rgb(139,224,164)', 'rgb(158,185,243)'],
-            range_y=[0, 10])
+            range_y=[0, 10]))
 
-    def _fetch_intervention(self) -> Dict:
-        from_ = pd.Timestamp.now('utc') - pd.Timedelta(hours=1)
+    @staticmethod
+    def _latest_record(r: BatchResult) -> LatestRecord:
+        if isinstance(r, Exception):
+            return r
+        frames = list(r.values())
+        return frames[0].to_dict(orient='records')[-1] if frames else None
 
+    def _snapshot_record(self, entity_type: str,
+                         attrs: List[str]) -> LatestRecord:
+        try:
+            return snapshot_table(self.app, entity_type, attrs).latest()
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _record(r: LatestRecord) -> Dict:
+        if isinstance(r, Exception):
+            raise r
+        if r is None:
+            raise LookupError('no entities')
+        return r
+
+    def _fetch_intervention(self, assignment: LatestRecord,
+                            execution: LatestRecord) -> Dict:
         try:
-            assignment = list(self._quantumleap.fetch_entity_type_series(entity_type="TaskAssignment",
-                                                                         from_timepoint=from_,
-                                                                         entries_from_latest=1).values())[0].to_dict(
-                orient='records')[-1]
+            assignment = self._record(assignment)
             assignment_intervention = {
                 'datetime': datetime.datetime.fromtimestamp(int(assignment['creationTimestamp']) / 1000, tz=pytz.utc),
                 'intervention': "Reconfigure",
@@ -232,10 +336,7 @@ class FatigueDashboard(ABC):
             assignment_intervention = {}
 
         try:
-            execution = list(self._quantumleap.fetch_entity_type_series(entity_type="TaskExecution",
-                                                                        from_timepoint=from_,
-                                                                        entries_from_latest=1).values())[0].to_dict(
-                orient='records')[-1]
+            execution = self._record(execution)
             execution_intervention = {
                 'datetime': datetime.datetime.fromtimestamp(int(execution['creationTimestamp']) / 1000, tz=pytz.utc),
                 'intervention': "Continue"
@@ -255,8 +356,7 @@ class FatigueDashboard(ABC):
         else:
             return {}
 
-    def _build_interventions(self, n=0) -> Component:
-        intervention = self._fetch_intervention()
+    def _build_interventions(self, intervention: Dict) -> Component:
         if not intervention:
             p = [html.Small(
                 datetime.datetime.now(pytz.utc).astimezone(pytz.timezone('CET')).strftime("%d-%m-%Y %H:%M:%S"),
@@ -288,13 +388,19 @@ class FatigueDashboard(ABC):
             ),
         ])
 
+    def _update_panels(self, n=0) -> Tuple[Component, Component]:
+        dti, workers, assignment, execution = self._fetch_panel_data()
+        worker_graphs = self._build_worker_graphs(
+            *self._fetch_workers_data(dti, workers)
+        )
+        interventions = self._build_interventions(
+            self._fetch_intervention(assignment, execution)
+        )
+        return worker_graphs, interventions
+
     def _build_callbacks(self):
         self.app.callback(
             Output("worker_graphs", 'children'),
-            Input('worker-interval', 'n_intervals')
-        )(self._build_worker_graphs)
-
-        self.app.callback(
             Output("interventions", 'children'),
-            Input('interventions-interval', 'n_intervals')
-        )(self._build_interventions)
+            self._refresh.input()
+        )(self._update_panels)
@@ -1,16 +1,25 @@
 from abc import ABC
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import pytz
-from dash import Dash, html, dcc, Output, Input
+from dash import Dash, html, dcc, Output
 from dash.development.base_component import Component
 from dash.html import Figure
 from requests import HTTPError
 
-from dazzler.dash.fiware import QuantumLeapSource, OrionSource
+from dazzler.dash.figures import FigureCache
+from dazzler.dash.fiware import AttributePath, OrionSource
+from dazzler.dash.prefetch import prefetch_scheduler
+from dazzler.dash.push import LiveRefresh
 from dazzler.dash.wiring import BasePath
+from dazzler.ngsy import WORKER_FATIGUE_PATH
+
+
+FATIGUE = AttributePath(WORKER_FATIGUE_PATH)
+
+WORKER_WINDOW = timedelta(minutes=3)
 
 
 def dash_builder(app: Dash) -> Dash:
@@ -23,8 +32,14 @@ class FatigueDashboard(ABC):
 
         self.app = app
         self._orion = OrionSource(app)
-        self._quantumleap = QuantumLeapSource(app)
         self._base_path = BasePath.from_board_app(app)
+        self._worker_refresh = LiveRefresh(app, 'worker-interval', 5 * 1000,
+                                           'Worker')
+        self._workers = prefetch_scheduler().register(
+            app, 'Worker', window=WORKER_WINDOW, period=5,
+            attrs=[FATIGUE.attr_name]
+        )
+        self._figures = FigureCache(max_entries=256)  # one per worker
 
         self.worker_data = dict()
 
@@ -52,11 +67,7 @@ class FatigueDashboard(ABC):
                             md=12,
                             id="worker_graphs"
                         ),
-                        dcc.Interval(
-                            id='worker-interval',
-                            interval=5 * 1000,  # in milliseconds
-                            n_intervals=0
-                        )
+                        self._worker_refresh.component()
                     ]
                 ),
             ],
@@ -64,19 +75,15 @@ class FatigueDashboard(ABC):
         )
 
     def _fetch_workers_data(self):
-        to_ = datetime.now(timezone.utc)
-        from_ = to_ - timedelta(minutes=3)
         try:
-            self.worker_data = self._quantumleap.fetch_entity_type_series(entity_type="Worker",
-                                                                          from_timepoint=from_,
-                                                                          to_timepoint=to_)
+            self.worker_data = self._workers.frames()
             for key in self.worker_data:
                 tz = pytz.timezone('CET')  # TODO: read timezone from environment vars
                 self.worker_data[key]['index'] = self.worker_data[key]['index'].apply(lambda x: x.astimezone(tz))
                 self.worker_data[key] = self.worker_data[key].set_index('index')
 
         except HTTPError:
-            print(f"No data available for the given time window {from_} -- {to_}")
+            print(f"No worker data available for the last {WORKER_WINDOW}")
             self.worker_data = {}
 
     def _build_worker_graphs(self, n=0) -> Component:
@@ -159,14 +166,14 @@ class FatigueDashboard(ABC):
         )
 
     def _update_worker_fatigue(self, worker_id) -> Figure:
-        fatigue = self.worker_data[worker_id].workerStates.apply(
-            lambda x: x["fatigue"]["level"]["value"] if x else x).rename("Fatigue")
+        fatigue = FATIGUE.extract(self.worker_data[worker_id], name="Fatigue")
 
-        return px.line(fatigue, title=worker_id, x=fatigue.index, y="Fatigue", markers=True,
-                       color_discrete_sequence=['coral'])
+        return self._figures.figure(worker_id, fatigue, lambda: px.line(
+            fatigue, title=worker_id, x=fatigue.index, y="Fatigue", markers=True,
+            color_discrete_sequence=['coral']))
 
     def _build_callbacks(self):
         self.app.callback(
             Output("worker_graphs", 'children'),
-            Input('worker-interval', 'n_intervals')
+            self._worker_refresh.input()
         )(self._build_worker_graphs)
@@ -6,7 +6,9 @@ from typing import List
 from dash import Dash
 
 from dazzler.dash.board.insight.model import *
-from dazzler.dash.wiring import BasePath
+from dazzler.dash.entityindex import EntityIdIndex, orion_entity_ids, \
+    quantumleap_entity_ids
+from dazzler.dash.wiring import BasePath, settings_for
 from dazzler.dash.fiware import OrionSource, QuantumLeapSource
 from dazzler.ngsy import INSIGHT_TYPE, InsightEntity
 
@@ -14,6 +16,7 @@ from dazzler.ngsy import INSIGHT_TYPE, InsightEntity
 class IgBaseDataSource(ABC):
 
     def __init__(self, app: Dash):
+        self._app = app
         self._base_path = BasePath.from_board_app(app)
 
     def tenant(self) -> str:
@@ -23,7 +26,7 @@ class IgBaseDataSource(ABC):
         return self._base_path.service_path()
 
     @abstractmethod
-    def load_insight_entity_ids(self) -> List[str]:
+    def insight_entity_ids(self) -> EntityIdIndex:
         pass
 
     @abstractmethod
@@ -57,9 +60,8 @@ class IgOrionDataSource(IgBaseDataSource):
         super().__init__(app)
         self._orion = OrionSource(app)
 
-    def load_insight_entity_ids(self) -> List[str]:
-        ids = self._orion.fetch_entity_ids(entity_type=INSIGHT_TYPE)
-        return ids
+    def insight_entity_ids(self) -> EntityIdIndex:
+        return orion_entity_ids(self._app, INSIGHT_TYPE)
 
     def load_analyses_for(self, entity_id: str) -> List[IgAnalysis]:
         like = InsightEntity(id=entity_id)
@@ -87,9 +89,8 @@ class IgQlDataSource(IgBaseDataSource):
         super().__init__(app)
         self._quantumleap = QuantumLeapSource(app)
 
-    def load_insight_entity_ids(self) -> List[str]:
-        ids = self._quantumleap.fetch_entity_ids(entity_type=INSIGHT_TYPE)
-        return ids
+    def insight_entity_ids(self) -> EntityIdIndex:
+        return quantumleap_entity_ids(self._app, INSIGHT_TYPE)
 
     def load_analyses_for(self, entity_id: str) -> List[IgAnalysis]:
         df = self._quantumleap.fetch_entity_series(
@@ -115,9 +116,13 @@ class IgDemoDataSource(IgBaseDataSource):
                 example_ngsi_structured_value_2()
             )
         }
+        ids = list(self._data)
+        self._ids = EntityIdIndex(lambda offset, limit:
+                                  ids[offset:offset + limit],
+                                  settings_for(app).entity_index)
 
-    def load_insight_entity_ids(self) -> List[str]:
-        return [entity_id for entity_id in self._data]
+    def insight_entity_ids(self) -> EntityIdIndex:
+        return self._ids
 
     def load_analyses_for(self, entity_id: str) -> List[IgAnalysis]:
         return self._data.get(entity_id, [])
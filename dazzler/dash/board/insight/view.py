@@ -1,7 +1,7 @@
 from typing import Any, List
 
 import dash_bootstrap_components as dbc
-from dash import Dash, Input, Output, dcc, html
+from dash import Dash, Input, Output, State, dcc, html
 import pandas as pd
 import plotly.express as px
 
@@ -97,7 +97,6 @@ class RecommendationDashboard:
     events.
     """
 
-    LOAD_BUTTON_ID = 'load-ids-button'
     ENTITY_SELECT_ID = 'entity-id'
     ANALYSIS_TABS_CONTAINER_ID = 'analysis-tabs'
 
@@ -139,18 +138,9 @@ class RecommendationDashboard:
                 html.Hr(),
                 dcc.Markdown(RECOMMENDATION_DASHBOARD_EXPLANATION),
                 html.Hr(),
-                dbc.Row([
-                    dbc.Col(
-                        dbc.Button('Load Entity IDs', id=self.LOAD_BUTTON_ID,
-                                    n_clicks=0),
-                        md=4
-                    ),
-                    dbc.Col(
-                        dbc.Select(id=self.ENTITY_SELECT_ID, options=[],
-                                    placeholder='Select...'),
-                        md=8
-                    )
-                ])
+                dcc.Dropdown(id=self.ENTITY_SELECT_ID, options=[],
+                             placeholder='Type a report ID...',
+                             className='text-dark')
             ],
             body=True
         )
@@ -162,14 +152,16 @@ class RecommendationDashboard:
         xs = self._datasource.load_analyses_for(value)
         return RecommendationTabs(xs).make_tabs()
 
-    def _populate_entity_ids(self, value) -> List[dict]:
-        xs = self._datasource.load_insight_entity_ids()
-        return [{'label': x, 'value': x} for x in xs]
+    def _populate_entity_ids(self, search_value: str,
+                             selected: str) -> List[dict]:
+        index = self._datasource.insight_entity_ids()
+        return index.options(search_value, selected)
 
     def _build_callbacks(self):
         self._app.callback(
             Output(self.ENTITY_SELECT_ID, 'options'),
-            Input(self.LOAD_BUTTON_ID, 'n_clicks')
+            Input(self.ENTITY_SELECT_ID, 'search_value'),
+            State(self.ENTITY_SELECT_ID, 'value')
         )(self._populate_entity_ids)
 
         self._app.callback(
@@ -194,10 +186,10 @@ This dashboard renders Insight Generator reports. Each report is made
 up by a set of recommended settings for each KPI Insight Generator
 analysed as well as recent KPI evolution over time.
 
-To display a report, press the "Load Entity IDs" button, then select
-the ID of the report you're interested in from the drop down menu on
-the right of the button. A group of tabs will appear on the right of
-the dashboard containing the report data.
+To display a report, start typing the ID of the report you're interested
+in, then select it from the matching IDs in the drop down menu. A group
+of tabs will appear on the right of the dashboard containing the report
+data.
 
 There's a tab for each KPI Insight Generator analysed. The tab contains
 a graph plotting the KPI values over time. Below the graph are the
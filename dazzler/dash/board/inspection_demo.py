@@ -41,9 +41,10 @@ class InspectionDemoDashboard(EntityMonitorDashboard):
 
         The graph updates automatically every few seconds so you can monitor
         your machining process in near real time. To start a monitoring
-        session, load the IDs of the available reports, then pick the
-        one you're interested in. Optionally choose how many data points
-        back in time to display from the latest received data point.
+        session, type the first few characters of the ID of the report
+        you're interested in, then pick it from the matching IDs. Optionally
+        choose how many data points back in time to display from the latest
+        received data point.
         '''
 
     def make_figure(self, df: pd.DataFrame) -> Any:
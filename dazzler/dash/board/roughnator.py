@@ -37,10 +37,11 @@ class RoughnatorDashboard(EntityMonitorDashboard):
         corresponding **roughness** estimate the AI computed.
 
         The graph updates automatically every few seconds so you can monitor
-        your machine in near real time. To start a monitoring session, load
-        the IDs of the machines connected to the system, then select the ID
-        of the machine you'd like to monitor. Optionally choose how many data
-        points back in time to display from the latest received data point.
+        your machine in near real time. To start a monitoring session, type
+        the first few characters of the ID of the machine you'd like to
+        monitor, then select it from the matching IDs. Optionally choose how
+        many data points back in time to display from the latest received
+        data point.
         '''
 
     def make_figure(self, df: pd.DataFrame) -> Any:
@@ -0,0 +1,166 @@
+"""
+Images of the screw-driving configurations the smart collaboration
+boards display.
+
+A configuration says which of the nine screws on the work piece are
+assigned to the operator. The boards show it as a photo of the work
+piece with a green box around each assigned screw and a red box around
+the others. There are only 2^9 possible configurations, so rather than
+drawing and encoding the image on every refresh we decode the photo
+once and keep the encoded image of each configuration we've drawn so
+far around. Boards show the images through the image store, so they
+only hand browsers an image URL.
+"""
+from collections import OrderedDict
+import os
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from dazzler.dash.images import ImageStore, content_digest, image_store
+
+
+FRAME_IMAGE_PATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'assets', 'frame.png'
+)
+
+SCREW_COORDS = [(15, 127, 47, 159),
+                (126, 54, 158, 86),
+                (323, 20, 355, 52),
+                (538, 75, 570, 107),
+                (355, 154, 387, 186),
+                (210, 255, 242, 287),
+                (485, 250, 517, 282),
+                (150, 368, 182, 400),
+                (345, 410, 377, 442)]
+
+ASSIGNED_COLOR = (0, 255, 0)
+UNASSIGNED_COLOR = (0, 0, 255)
+
+ScrewMask = Optional[int]
+"""Bit `k` is set if the operator's got screw `k`. `None` means there's
+no configuration to show, just the photo.
+"""
+
+
+def screw_mask(configuration: Optional[List[int]]) -> ScrewMask:
+    """Convert a configuration to a bitmask.
+
+    Args:
+        configuration: a list with a `1` for each screw assigned to the
+            operator. Entries past the last screw get ignored, missing
+            ones count as unassigned.
+
+    Returns:
+        The corresponding bitmask or `None` if there's no configuration.
+    """
+    if configuration is None:
+        return None
+    mask = 0
+    for (k, present) in enumerate(configuration[:len(SCREW_COORDS)]):
+        if present == 1:
+            mask |= 1 << k
+    return mask
+
+
+def draw_configuration(image: np.ndarray, mask: ScrewMask) -> np.ndarray:
+    """Draw the boxes around the screws on a copy of the given image.
+
+    Args:
+        image: the decoded photo of the work piece.
+        mask: the configuration to draw.
+
+    Returns:
+        A new image with the configuration drawn on it, or the image
+        itself if there's no configuration.
+    """
+    if mask is None:
+        return image
+    img = image.copy()
+    for (k, position) in enumerate(SCREW_COORDS):
+        color = ASSIGNED_COLOR if mask & (1 << k) else UNASSIGNED_COLOR
+        cv2.rectangle(img, (position[0], position[1]),
+                      (position[2], position[3]), color, 5)
+    return img
+
+
+def encode_jpeg(image: np.ndarray) -> bytes:
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+class ScrewConfigImages:
+    """Renders configuration images, remembering the most recently used
+    ones.
+    """
+
+    def __init__(self, frame_path: str = FRAME_IMAGE_PATH,
+                 max_entries: int = 2 ** len(SCREW_COORDS) + 1,
+                 store: Optional[ImageStore] = None):
+        """Create a new instance.
+
+        Args:
+            frame_path: where to read the photo of the work piece from.
+            max_entries: how many encoded images to keep at most. The
+                default is enough for all the configurations plus the
+                bare photo.
+            store: where to put the images for browsers to fetch them.
+                Defaults to the process-wide image store.
+        """
+        self._frame = cv2.imread(frame_path)
+        self._max_entries = max_entries
+        self._store = store or image_store()
+        self._lock = Lock()
+        self._images: 'OrderedDict[ScrewMask, Tuple[str, bytes]]' = \
+            OrderedDict()
+
+    def _encoded(self, mask: ScrewMask) -> Tuple[str, bytes]:
+        with self._lock:
+            image = self._images.get(mask)
+            if image is not None:
+                self._images.move_to_end(mask)
+                return image
+
+        jpeg = encode_jpeg(draw_configuration(self._frame, mask))
+        image = (content_digest(jpeg), jpeg)
+        with self._lock:
+            self._images[mask] = image
+            while len(self._images) > self._max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def url(self, configuration: Optional[List[int]] = None) -> str:
+        """Get the URL of the image of the given configuration.
+
+        Args:
+            configuration: which screws the operator's got, as in
+                `screw_mask`. `None` gets you the bare photo.
+
+        Returns:
+            The URL path the browser can fetch the JPEG image from.
+        """
+        digest, jpeg = self._encoded(screw_mask(configuration))
+        return self._store.put(jpeg, digest)
+    # NOTE. Keeping images in the store. We put the image in the store
+    # every time, not just after rendering it, so the store keeps the
+    # images boards are showing at the moment around even if other boards
+    # put lots of other images in there in the meantime.
+
+
+_screw_config_images: Optional[ScrewConfigImages] = None
+_screw_config_images_lock = Lock()
+
+
+def screw_config_images() -> ScrewConfigImages:
+    """Get the process-wide configuration image renderer, creating it on
+    first use.
+
+    Returns:
+        The renderer shared by all the smart collaboration boards.
+    """
+    global _screw_config_images
+    with _screw_config_images_lock:
+        if _screw_config_images is None:
+            _screw_config_images = ScrewConfigImages()
+        return _screw_config_images
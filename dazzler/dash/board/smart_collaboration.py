@@ -1,15 +1,24 @@
-import base64
-import os
-
-import cv2
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
 from dash import Dash, html, dcc, Output, Input
 
-from dazzler.dash.fiware import QuantumLeapSource, OrionSource
-from dazzler.dash.wiring import BasePath
-from dazzler.ngsy import TASK_EXECUTION_TYPE
+from dazzler.dash.board.screwconfig import screw_config_images
+from dazzler.dash.figures import FigureCache
+from dazzler.dash.fiware import AttributePath, QuantumLeapSource, \
+    OrionSource
+from dazzler.dash.push import LiveRefresh
+from dazzler.dash.snapshot import snapshot_table
+from dazzler.dash.wiring import BasePath, orion_snapshots_for
+from dazzler.ngsy import EQUIPMENT_BUFFER_LEVEL_PATH, TASK_EXECUTION_TYPE, \
+    WORKER_FATIGUE_PATH
+
+
+FATIGUE = AttributePath(WORKER_FATIGUE_PATH)
+BUFFER_LEVEL = AttributePath(EQUIPMENT_BUFFER_LEVEL_PATH)
+
+CONFIG_IMAGE_ID = 'config-image'
+CONFIG_ATTR = 'additionalParameters'
 
 
 def dash_builder(app: Dash) -> Dash:
@@ -21,20 +30,16 @@ class SmartCollaborationDashboard:
     def __init__(self, app: Dash):
         print()
         self._app = app
-        self._input_path = f"{os.path.dirname(os.path.realpath(__file__))}/assets/frame.png"
-        self._screw_coords = [(15, 127, 47, 159),
-                              (126, 54, 158, 86),
-                              (323, 20, 355, 52),
-                              (538, 75, 570, 107),
-                              (355, 154, 387, 186),
-                              (210, 255, 242, 287),
-                              (485, 250, 517, 282),
-                              (150, 368, 182, 400),
-                              (345, 410, 377, 442)]
+        self._config_images = screw_config_images()
         self._orion = OrionSource(app)
         self._quantumleap = QuantumLeapSource(app)
         self._base_path = BasePath.from_board_app(app)
+        self._snapshots = orion_snapshots_for(app)
+        self._refresh = LiveRefresh(app, 'config-interval', 1 * 1000,
+                                    TASK_EXECUTION_TYPE, 'Worker',
+                                    'EquipmentIoTMeasurement')
         self._image_width = None
+        self._figures = FigureCache()
 
     def build_dash_app(self) -> Dash:
         self._build_layout()
@@ -106,11 +111,7 @@ class SmartCollaborationDashboard:
                         ),
                     ],
                 ),
-                dcc.Interval(
-                    id='config-interval',
-                    interval=1 * 1000,  # in milliseconds
-                    n_intervals=0
-                )
+                self._refresh.component()
             ],
             fluid=False,
             class_name='p-3'  # padding
@@ -118,39 +119,37 @@ class SmartCollaborationDashboard:
 
     def _build_callbacks(self):
         self._app.callback(
-            Output('config', 'children'),
-            Input('config-interval', 'n_intervals'),
+            Output(CONFIG_IMAGE_ID, 'src'),
+            self._refresh.input(),
         )(self._update_config)
 
         self._app.callback(
             Output('fatigue', 'figure'),
-            Input('config-interval', 'n_intervals'),
+            self._refresh.input(),
             Input('config-worker-id', 'value'),
         )(self._update_fatigue)
 
         self._app.callback(
             Output('buffer', 'figure'),
-            Input('config-interval', 'n_intervals'),
+            self._refresh.input(),
             Input('config-iot-id', 'value'),
         )(self._update_buffer)
 
     def _fetch_last_config(self):
-        task_execution = list(self._quantumleap.fetch_entity_type_series(entity_type=TASK_EXECUTION_TYPE,
-                                                                         entries_from_latest=1).values())[0].to_dict(
-            orient='records')[-1]  # todo read ID from dashboard
-        return task_execution['additionalParameters']['sequence']
+        if self._snapshots:
+            task_execution = snapshot_table(
+                self._app, TASK_EXECUTION_TYPE, attrs=[CONFIG_ATTR]
+            ).latest()
+        else:
+            task_execution = self._orion.fetch_latest_entity(
+                TASK_EXECUTION_TYPE, attrs=[CONFIG_ATTR])  # todo read ID from dashboard
+        if not task_execution:
+            return None
+        return (task_execution.get(CONFIG_ATTR) or {}).get('sequence')
 
     def _update_config(self, n_intervals):
         last_configuration = self._fetch_last_config()
-        img = cv2.imread(self._input_path)
-        for position, present in zip(self._screw_coords, last_configuration):
-            if present == 1:
-                cv2.rectangle(img, (position[0], position[1]),
-                              (position[2], position[3]), (0, 255, 0), 5)
-            else:
-                cv2.rectangle(img, (position[0], position[1]),
-                              (position[2], position[3]), (0, 0, 255), 5)
-        return [self._config_fig(img)]
+        return self._config_images.url(last_configuration)
 
     def _update_fatigue(self, n_intervals, worker_entity_id):
         if not worker_entity_id:
@@ -160,11 +159,12 @@ class SmartCollaborationDashboard:
             entity_id=worker_entity_id,
             entity_type="Worker",
             entries_from_latest=10,
+            attrs=[FATIGUE.attr_name],
             # from_timepoint=datetime.now() - timedelta(seconds=60) - timedelta(hours=1),
             # to_timepoint=datetime.now() - timedelta(hours=1)
         )
 
-        fatigue = fatigue.workerStates.apply(lambda x: x["fatigue"]["level"]["value"] if x else x).rename("fatigue")
+        fatigue = FATIGUE.extract(fatigue, name="fatigue")
         return self._fatigue_fig(fatigue)
 
     def _update_buffer(self, n_intervals, iot_entity_id):
@@ -175,19 +175,18 @@ class SmartCollaborationDashboard:
             entity_id=iot_entity_id,
             entity_type="EquipmentIoTMeasurement",
             entries_from_latest=10,
+            attrs=[BUFFER_LEVEL.attr_name],
             # from_timepoint=datetime.now() - timedelta(seconds=60) - timedelta(hours=1),
             # to_timepoint=datetime.now() - timedelta(hours=1)
         )
 
-        buffer = buffer.fields.apply(lambda x: x["bufferLevel"]["value1"] if x else x).rename("buffer")
+        buffer = BUFFER_LEVEL.extract(buffer, name="buffer")
 
         return self._buffer_fig(buffer)
 
-    def _config_fig(self, img=None):
-        if img is None:  # The truth value of a Series is ambiguous
-            img = cv2.imread(self._input_path)
-        base64_img = base64.b64encode(cv2.imencode('.jpg', img)[1]).decode('ascii')
-        return html.Img(src=f"data:image/png;base64,{base64_img}",
+    def _config_fig(self, configuration=None):
+        return html.Img(id=CONFIG_IMAGE_ID,
+                        src=self._config_images.url(configuration),
                         className="img-fluid",
                         width=self._image_width)
 
@@ -198,7 +197,8 @@ class SmartCollaborationDashboard:
                 'fatigue': [],
             }
             df = pd.DataFrame(empty_fatigue).set_index('timestamp')
-        return px.line(df, x=df.index, y="fatigue", markers=True, color_discrete_sequence=['coral'])
+        return self._figures.figure('fatigue', df, lambda: px.line(
+            df, x=df.index, y="fatigue", markers=True, color_discrete_sequence=['coral']))
 
     def _buffer_fig(self, df=None):
         if df is None:  # The truth value of a Series is ambiguous
@@ -207,4 +207,5 @@ class SmartCollaborationDashboard:
                 'buffer': [],
             }
             df = pd.DataFrame(empty_buffer).set_index('timestamp')
-        return px.line(df, x=df.index, y='buffer', markers=True, color_discrete_sequence=['silver'])
+        return self._figures.figure('buffer', df, lambda: px.line(
+            df, x=df.index, y='buffer', markers=True, color_discrete_sequence=['silver']))
@@ -1,7 +1,8 @@
 import dash_bootstrap_components as dbc
-from dash import Dash, html, dcc, Output, Input
+from dash import Dash, html, dcc, Output
 
-from dazzler.dash.board.smart_collaboration import SmartCollaborationDashboard
+from dazzler.dash.board.smart_collaboration import CONFIG_IMAGE_ID, \
+    SmartCollaborationDashboard
 
 
 def dash_builder(app: Dash) -> Dash:
@@ -51,28 +52,27 @@ class SmartCollaborationLightDashboard(SmartCollaborationDashboard):
                         ),
                     ],
                 ),
-                dcc.Interval(
-                    id='config-interval',
-                    interval=1 * 1000,  # in milliseconds
-                    n_intervals=0
-                )
+                self._refresh.component()
             ],
             fluid=False,
             # class_name='p-3'  # padding
         )
 
-    def _update_config_number(self, n_intervals):
-        return [
-            html.H1(f"Assigned screws: {self._fetch_last_config().count(1)}", className="display-1"),
-        ]
+    def _update_config_and_number(self, n_intervals):
+        last_configuration = self._fetch_last_config()
+        assigned = '-' if last_configuration is None \
+            else last_configuration.count(1)
+        return (
+            self._config_images.url(last_configuration),
+            [html.H1(f"Assigned screws: {assigned}", className="display-1")]
+        )
+    # NOTE. One query per tick. Both the image and the number come from
+    # the same configuration, so we update them in a single callback to
+    # fetch the configuration only once each time the board refreshes.
 
     def _build_callbacks(self):
         self._app.callback(
-            Output('config', 'children'),
-            Input('config-interval', 'n_intervals'),
-        )(self._update_config)
-
-        self._app.callback(
+            Output(CONFIG_IMAGE_ID, 'src'),
             Output('config-number', 'children'),
-            Input('config-interval', 'n_intervals'),
-        )(self._update_config_number)
+            self._refresh.input(),
+        )(self._update_config_and_number)
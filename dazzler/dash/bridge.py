@@ -0,0 +1,167 @@
+"""
+Running coroutines from Dash callbacks.
+
+Dash callbacks are plain functions running on WSGI worker threads, so
+they can't await anything. The bridge runs an event loop on a background
+thread and lets callbacks hand it coroutines to run, e.g. to fetch all
+the series a callback needs concurrently rather than one after the other.
+The callback's thread still blocks until the results come back, but only
+for as long as the slowest query takes rather than for the sum of all
+query times.
+"""
+import asyncio
+from concurrent.futures import Future
+import os
+from threading import Lock, Thread, get_ident
+from typing import Any, Coroutine, List, Optional
+
+
+class AsyncBridge:
+    """Runs coroutines on a background event loop on behalf of sync code.
+
+    The loop and its thread get started lazily, on the first call to
+    `run` or `gather`. If the process forks after that, the child starts
+    a loop of its own the first time it uses the bridge since threads
+    don't survive a fork. Pausing stops the loop until the bridge gets
+    used again, which is what you want to do before forking.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._pid: Optional[int] = None
+
+    def _start_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.new_event_loop()
+        thread = Thread(target=self._run_loop, args=(loop,), daemon=True,
+                        name='dazzler-async-bridge')
+        thread.start()
+        self._loop, self._thread, self._pid = loop, thread, os.getpid()
+        return loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get the bridge's event loop, starting it if needed.
+
+        Returns:
+            The loop the bridge runs coroutines on.
+        """
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return self._start_loop()
+            return self._loop
+
+    def pause(self):
+        """Stop the bridge's loop and wait for its thread to exit.
+
+        The next call to `run` or `gather` starts a new loop. Only pause
+        the bridge when nothing's running on it, since the loop gets
+        closed along with whatever coroutines are still pending.
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread, self._pid = None, None, None
+        if loop is None or not thread.is_alive():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        """Schedule a coroutine to run on the bridge's loop.
+
+        Args:
+            coroutine: what to run.
+
+        Returns:
+            A future to get the coroutine's result with.
+        """
+        loop = self.loop()
+        if self._thread.ident == get_ident():
+            coroutine.close()
+            raise RuntimeError('AsyncBridge called from its own loop')
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+    # NOTE. Deadlock. If a coroutine running on the bridge's loop blocked
+    # waiting on another coroutine it submitted to the same loop, the loop
+    # would hang forever. So we fail fast instead.
+
+    def run(self, coroutine: Coroutine,
+            timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the bridge's loop and wait for its result.
+
+        Args:
+            coroutine: what to run.
+            timeout: how long, in seconds, to wait at most. `None` means
+                wait until done.
+
+        Returns:
+            What the coroutine returned.
+
+        Raises:
+            Exception: whatever the coroutine raised.
+            TimeoutError: if the coroutine didn't finish in time.
+        """
+        return self.submit(coroutine).result(timeout)
+
+    def gather(self, *coroutines: Coroutine,
+               timeout: Optional[float] = None,
+               return_exceptions: bool = False) -> List[Any]:
+        """Run coroutines concurrently on the bridge's loop and wait for
+        all of them to finish.
+
+        Args:
+            coroutines: what to run.
+            timeout: how long, in seconds, to wait at most for all the
+                coroutines to finish. `None` means wait until done.
+            return_exceptions: if `True`, put the exception a coroutine
+                raised in the results, in place of its return value,
+                rather than raising it.
+
+        Returns:
+            The coroutine results, in the same order as the coroutines.
+
+        Raises:
+            Exception: the first exception any of the coroutines raised,
+                unless `return_exceptions` is on.
+            TimeoutError: if the coroutines didn't finish in time.
+        """
+        return self.run(_gather(coroutines, return_exceptions), timeout)
+
+
+async def _gather(coroutines, return_exceptions: bool) -> List[Any]:
+    results = await asyncio.gather(*coroutines,
+                                   return_exceptions=return_exceptions)
+    return list(results)
+
+
+_async_bridge: Optional[AsyncBridge] = None
+_async_bridge_lock = Lock()
+
+
+def async_bridge() -> AsyncBridge:
+    """Get the process-wide bridge, creating it on first use.
+
+    Returns:
+        The bridge shared by all the boards.
+    """
+    global _async_bridge
+    with _async_bridge_lock:
+        if _async_bridge is None:
+            _async_bridge = AsyncBridge()
+        return _async_bridge
+
+
+def pause_async_bridge():
+    """Stop the loop of the process-wide bridge, if any, and wait for its
+    thread to exit. The bridge starts a new loop the next time it gets
+    used.
+    """
+    with _async_bridge_lock:
+        bridge = _async_bridge
+    if bridge is not None:
+        bridge.pause()
@@ -0,0 +1,300 @@
+"""
+Process-wide caching of backend query results.
+
+Every client viewing a live board polls the server on a timer and every
+poll turns into a backend query. When many clients look at the same data,
+most of those queries are identical, so we keep query results around for
+a little while and share them among callers. Results expire after a TTL,
+get evicted in LRU order when the cache grows beyond its byte budget and
+concurrent misses for the same key get coalesced so only one of them
+actually hits the backend. With several worker processes, the caches can
+also share results through a `SharedStore`.
+"""
+import asyncio
+from collections import OrderedDict
+from threading import Event, Lock
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, \
+    Tuple
+
+from pydantic import BaseModel
+
+from dazzler.dash.sharedcache import SharedStore, SharedValue, key_digest
+
+
+CacheKey = Hashable
+Fetch = Callable[[], Any]
+AsyncFetch = Callable[[], Awaitable[Any]]
+SizeOf = Callable[[Any], int]
+
+
+class CacheStats(BaseModel):
+    """Snapshot of the cache counters.
+
+    Hits, misses, coalesced and evictions are running totals since the
+    cache got created. A coalesced lookup is a miss that didn't have to
+    hit the backend b/c another caller was already fetching the same key.
+    A shared hit is a miss some other process had fetched already.
+    """
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    shared_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+    max_bytes: int = 0
+
+
+class _Entry:
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+    @staticmethod
+    def landed(value: Any) -> '_Flight':
+        flight = _Flight()
+        flight.value = value
+        flight.done.set()
+        return flight
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class QueryCache:
+    """Thread-safe, TTL-bounded LRU cache with single-flight fetching."""
+
+    def __init__(self, max_bytes: int, sizeof: SizeOf,
+                 clock: Callable[[], float] = time.monotonic,
+                 shared: Optional[SharedStore] = None):
+        """Create a new instance.
+
+        Args:
+            max_bytes: the maximum amount of memory, in bytes, the cached
+                values may take up. Least recently used values get evicted
+                to make room for new ones when going over budget.
+            sizeof: function to estimate how many bytes a value takes up.
+            clock: monotonic time source, in seconds.
+            shared: where to look for values other processes fetched
+                before fetching them ourselves, if anywhere.
+        """
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._shared = shared
+        self._lock = Lock()
+        self._entries: 'OrderedDict[CacheKey, _Entry]' = OrderedDict()
+        self._flights: Dict[CacheKey, _Flight] = {}
+        self._size = 0
+        self._stats = CacheStats(max_bytes=max_bytes)
+
+    def get_or_fetch(self, key: CacheKey, ttl: float, fetch: Fetch) -> Any:
+        """Look up the value associated to the given key, fetching it if
+        it isn't in the cache or has expired.
+
+        If another thread is already fetching the same key, wait for it to
+        finish and share its result instead of fetching again. If the fetch
+        fails, every caller waiting on it gets the same exception and
+        nothing gets cached.
+
+        Args:
+            key: identifies the query.
+            ttl: how long, in seconds, the fetched value should stay in the
+                cache. Zero or negative means don't cache, just fetch.
+            fetch: function to call to get the value on a miss.
+
+        Returns:
+            The cached or freshly fetched value.
+        """
+        if ttl <= 0:
+            return fetch()
+
+        flight, leader = self._board(key)
+        if leader:
+            try:
+                flight.value, ttl = self._fetch_through(key, ttl, fetch)
+            except BaseException as e:
+                flight.error = e
+            self._land(key, ttl, flight)
+        else:
+            flight.done.wait()
+
+        return flight.outcome()
+
+    async def get_or_fetch_async(self, key: CacheKey, ttl: float,
+                                 fetch: AsyncFetch) -> Any:
+        """Same as `get_or_fetch` but for coroutines.
+
+        The cache and the in-flight fetches are shared with `get_or_fetch`,
+        so a coroutine can wait on a fetch a thread started and vice versa.
+        Waiting on a thread's fetch happens in the loop's default executor
+        so as not to block the event loop.
+
+        Args:
+            key: identifies the query.
+            ttl: how long, in seconds, the fetched value should stay in the
+                cache. Zero or negative means don't cache, just fetch.
+            fetch: function returning an awaitable to get the value on a
+                miss.
+
+        Returns:
+            The cached or freshly fetched value.
+        """
+        if ttl <= 0:
+            return await fetch()
+
+        flight, leader = self._board(key)
+        if leader:
+            try:
+                flight.value, ttl = await self._fetch_through_async(
+                    key, ttl, fetch
+                )
+            except BaseException as e:
+                flight.error = e
+            self._land(key, ttl, flight)
+        elif not flight.done.is_set():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, flight.done.wait)
+
+        return flight.outcome()
+
+    def _shared_get(self, digest: str) -> Optional[SharedValue]:
+        try:
+            found = self._shared.get(digest)
+        except Exception as e:
+            print(f"Shared query cache lookup failed: {e}")
+            return None
+        if found is not None:
+            with self._lock:
+                self._stats.shared_hits += 1
+        return found
+
+    def _shared_put(self, digest: str, value: Any, ttl: float):
+        try:
+            self._shared.put(digest, value, ttl)
+        except Exception as e:
+            print(f"Shared query cache update failed: {e}")
+
+    def _fetch_through(self, key: CacheKey, ttl: float,
+                       fetch: Fetch) -> Tuple[Any, float]:
+        if self._shared is None:
+            return fetch(), ttl
+        digest = key_digest(key)
+        found = self._shared_get(digest)
+        if found is not None:
+            return found
+        value = fetch()
+        self._shared_put(digest, value, ttl)
+        return value, ttl
+
+    async def _fetch_through_async(self, key: CacheKey, ttl: float,
+                                   fetch: AsyncFetch) -> Tuple[Any, float]:
+        if self._shared is None:
+            return await fetch(), ttl
+        loop = asyncio.get_running_loop()
+        digest = key_digest(key)
+        found = await loop.run_in_executor(None, self._shared_get, digest)
+        if found is not None:
+            return found
+        value = await fetch()
+        await loop.run_in_executor(None, self._shared_put, digest, value, ttl)
+        return value, ttl
+    # NOTE. Shared store. Only the leader of a flight looks in the shared
+    # store, so there's at most one lookup per key and process at a time.
+    # A value we got from there only stays in our cache for as long as it
+    # had left to live in the shared store. Flights don't span processes
+    # though, so two processes missing the same key at the same time may
+    # both hit the backend. If the shared store is down, we just go to the
+    # backend.
+
+    def _board(self, key: CacheKey) -> Tuple[_Flight, bool]:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self._stats.hits += 1
+                return _Flight.landed(entry.value), False
+
+            self._stats.misses += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats.coalesced += 1
+                return flight, False
+
+            flight = _Flight()
+            self._flights[key] = flight
+            return flight, True
+    # NOTE. Boarding a flight. On a hit we hand out a flight that's already
+    # landed with the cached value. On a miss, the first caller becomes the
+    # leader of a new flight and has to fetch the value; everyone else
+    # asking for the same key in the meantime boards the leader's flight
+    # and waits for it to land.
+
+    def _land(self, key: CacheKey, ttl: float, flight: _Flight):
+        with self._lock:
+            if flight.error is None:
+                self._store(key, flight.value, ttl)
+            del self._flights[key]
+        flight.done.set()
+
+    def _lookup(self, key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self._stats.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: CacheKey, value: Any, ttl: float):
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        while self._entries and self._size + size > self._max_bytes:
+            lru_key = next(iter(self._entries))
+            self._remove(lru_key)
+            self._stats.evictions += 1
+
+        self._entries[key] = _Entry(value, size, self._clock() + ttl)
+        self._size += size
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+
+    def clear(self):
+        """Drop all the cached values. Counters are left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        """Take a snapshot of the cache counters.
+
+        Returns:
+            A copy of the current counters.
+        """
+        with self._lock:
+            snapshot = self._stats.copy()
+            snapshot.entries = len(self._entries)
+            snapshot.size_bytes = self._size
+            return snapshot
@@ -0,0 +1,195 @@
+"""
+Compression of HTTP responses, Dash callback payloads in particular.
+
+Dash callbacks send figures to the browser as plotly JSON, which is
+verbose: long arrays of numbers and timestamps with the same keys over
+and over. That compresses really well, but Flask doesn't compress
+responses and neither does `WSGIMiddleware`. So we've got an ASGI
+middleware that compresses responses with Brotli, if the `brotli`
+package is installed and the browser accepts it, or gzip otherwise.
+
+We only compress responses bigger than a threshold, since compressing a
+few hundred bytes costs more CPU than it saves bandwidth, and only text
+like JSON, HTML, CSS and JavaScript. Whether to compress is up to a
+policy function the middleware calls with the request path, which is how
+each board gets to decide for itself.
+"""
+import gzip
+from typing import Callable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from dazzler.config import CompressionSettings
+
+
+CompressionPolicy = Callable[[str], bool]
+"""Tells whether to compress responses to requests for a given path."""
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript',
+                      'text/html', 'text/css', 'text/javascript',
+                      'text/plain', 'image/svg+xml')
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def brotli_module():
+    """Import the `brotli` package, if installed.
+
+    Returns:
+        The `brotli` module or `None` if it isn't installed.
+    """
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def preferred_encoding(accept_encoding: Optional[str],
+                       available: Tuple[str, ...]) -> str:
+    """Pick the content encoding to send a response with.
+
+    Args:
+        accept_encoding: the value of the request's `Accept-Encoding`
+            header, if any.
+        available: the encodings we've got the response body in, from the
+            most to the least preferred.
+
+    Returns:
+        The first of the available encodings the client accepts or
+        `identity` if it doesn't accept any.
+    """
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        params = params.strip()
+        try:
+            q = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    for encoding in available:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return 'identity'
+
+
+def _header(headers: Headers, name: bytes) -> Optional[bytes]:
+    for (k, v) in headers:
+        if k.lower() == name:
+            return v
+    return None
+
+
+class Compressor:
+    """Compresses response bodies with the settings' encoders."""
+
+    def __init__(self, settings: CompressionSettings):
+        self.min_size = settings.min_size
+        self._gzip_level = settings.gzip_level
+        self._brotli_quality = settings.brotli_quality
+        self._brotli = brotli_module()
+        self.encodings = ('br', 'gzip') if self._brotli else ('gzip',)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return self._brotli.compress(body, quality=self._brotli_quality)
+        return gzip.compress(body, compresslevel=self._gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compresses the responses the policy says to compress, if big
+    enough and the client accepts it.
+    """
+
+    def __init__(self, app: ASGIApp, settings: CompressionSettings,
+                 policy: CompressionPolicy):
+        """Create a new instance.
+
+        Args:
+            app: the ASGI app whose responses to compress.
+            settings: encoders and size threshold.
+            policy: tells, given the request path, whether to compress.
+        """
+        self._app = app
+        self._compressor = Compressor(settings)
+        self._policy = policy
+
+    def _encoding(self, scope: Scope) -> str:
+        if scope['type'] != 'http' or scope['method'] == 'HEAD' or \
+                not self._policy(scope['path']):
+            return 'identity'
+        accept = _header(scope.get('headers', []), b'accept-encoding')
+        return preferred_encoding(accept.decode('latin1') if accept else None,
+                                  self._compressor.encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = self._encoding(scope)
+        if encoding == 'identity':
+            await self._app(scope, receive, send)
+            return
+        sender = _CompressingSender(self._compressor, encoding, send)
+        await self._app(scope, receive, sender.send)
+
+
+class _CompressingSender:
+
+    def __init__(self, compressor: Compressor, encoding: str, send: Send):
+        self._compressor = compressor
+        self._encoding = encoding
+        self._send = send
+        self._start: Optional[Message] = None
+        self._buffering = False
+        self._body: List[bytes] = []
+
+    def _should_buffer(self, headers: Headers) -> bool:
+        content_type = (_header(headers, b'content-type') or b'') \
+            .decode('latin1').split(';')[0].strip().lower()
+        return _header(headers, b'content-encoding') is None and \
+            content_type in COMPRESSIBLE_TYPES
+    # NOTE. Streams. Server-Sent Events go on for as long as the browser
+    # is connected, so we can't buffer them. Their content type isn't in
+    # the list, hence they go straight through.
+
+    async def send(self, message: Message):
+        if message['type'] == 'http.response.start':
+            self._start = message
+            self._buffering = self._should_buffer(message.get('headers', []))
+            if not self._buffering:
+                await self._send(message)
+            return
+        if message['type'] != 'http.response.body' or not self._buffering:
+            await self._send(message)
+            return
+
+        self._body.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            await self._flush()
+
+    async def _flush(self):
+        body = b''.join(self._body)
+        headers = [(k, v) for (k, v) in self._start.get('headers', [])
+                   if k.lower() not in (b'content-length', b'vary')]
+        vary = _header(self._start.get('headers', []), b'vary')
+
+        if len(body) >= self._compressor.min_size:
+            body = await run_in_threadpool(self._compressor.compress, body,
+                                           self._encoding)
+            headers.append((b'content-encoding', self._encoding.encode()))
+        if not vary:
+            vary = b'Accept-Encoding'
+        elif b'accept-encoding' not in vary.lower():
+            vary += b', Accept-Encoding'
+        headers.append((b'vary', vary))
+        headers.append((b'content-length', str(len(body)).encode()))
+
+        await self._send({**self._start, 'headers': headers})
+        await self._send({'type': 'http.response.body', 'body': body})
+    # NOTE. Buffering. We hold back the start of the response until we've
+    # got the whole body since the headers depend on whether we compress
+    # it and how big it ends up. `WSGIMiddleware` sends Dash responses in
+    # chunks anyway, so we'd have to buffer even to look at the size. We
+    # compress in a worker thread to keep the event loop free, since a big
+    # figure takes a few milliseconds.
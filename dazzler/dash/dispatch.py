@@ -0,0 +1,198 @@
+"""
+Routing of requests to dashboards through a single WSGI app.
+
+Mounting each dashboard as a FastAPI sub-app means one Starlette `Mount`
+and one `WSGIMiddleware` per dashboard, and Starlette tries the mounts
+one after the other, matching a regular expression each time, until it
+finds the dashboard a request is for. With hundreds of dashboards, that's
+hundreds of regular expressions for every request, including every Dash
+callback. So instead we can keep the dashboards in a trie keyed by base
+path segments and route all the dashboard requests through one route and
+one `WSGIMiddleware` that look up the dashboard in the trie, which takes
+as many dict lookups as there are segments in the base path.
+"""
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.middleware.wsgi import WSGIMiddleware
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+
+WsgiApp = Callable[[dict, Callable], Iterable]
+
+
+class _Node:
+
+    __slots__ = ('children', 'value')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.value: Any = None
+
+
+def _segments(path: str) -> list:
+    return [s for s in path.split('/') if s]
+
+
+class PathTrie:
+    """Associates values to URL paths and finds the value of the longest
+    path a given path starts with, segment by segment.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._lock = Lock()
+
+    def add(self, base_path: str, value: Any):
+        """Associate a value to the given path, replacing whatever value
+        was there before.
+
+        Args:
+            base_path: the path, e.g. `/dazzler/t/-/b/`.
+            value: anything but `None`.
+        """
+        with self._lock:
+            node = self._root
+            for segment in _segments(base_path):
+                node = node.children.setdefault(segment, _Node())
+            node.value = value
+
+    def remove(self, base_path: str):
+        """Drop the value associated to the given path, if any.
+
+        Args:
+            base_path: the path the value got added with.
+        """
+        with self._lock:
+            path = [self._root]
+            segments = _segments(base_path)
+            for segment in segments:
+                node = path[-1].children.get(segment)
+                if node is None:
+                    return
+                path.append(node)
+            path[-1].value = None
+
+            for (parent, segment) in zip(reversed(path[:-1]),
+                                         reversed(segments)):
+                child = parent.children[segment]
+                if child.value is not None or child.children:
+                    break
+                del parent.children[segment]
+    # NOTE. Pruning. We drop the nodes left without values below them, so
+    # the trie doesn't keep growing with hot reloads adding and removing
+    # dashboards.
+
+    def longest_prefix(self, path: str) -> Optional[Tuple[str, Any]]:
+        """Find the value of the longest path the given one starts with.
+
+        Args:
+            path: the path to look up, e.g. a request path.
+
+        Returns:
+            The longest path, without the trailing '/', and its value or
+            `None` if no path in the trie is a prefix of the given path.
+        """
+        node, depth = self._root, 0
+        found = None
+        for segment in path.split('/')[1:]:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            depth += 1
+            if node.value is not None:
+                found = (depth, node.value)
+        if found is None:
+            return None
+
+        depth, value = found
+        prefix = '/'.join(path.split('/', depth + 1)[:depth + 1])
+        return prefix, value
+    # NOTE. Lock-free reads. Readers walk the trie without taking the lock
+    # since looking up a dict key and reading an attribute are atomic in
+    # CPython. A reader racing a writer sees the trie either before or
+    # after the change.
+
+
+class BoardDispatcher:
+    """WSGI app routing requests to dashboards by base path.
+
+    Each request goes to the dashboard with the longest base path the
+    request path starts with. The dashboard gets the request as if it
+    were mounted at its base path, i.e. with the base path moved from
+    `PATH_INFO` to `SCRIPT_NAME`. Requests for paths no dashboard's base
+    path is a prefix of get a 404.
+    """
+
+    def __init__(self):
+        self._boards = PathTrie()
+
+    def add(self, base_path: str, board: WsgiApp):
+        """Route requests for the given base path to the given dashboard,
+        replacing whatever dashboard was there before.
+
+        Args:
+            base_path: the dashboard's base path, e.g. `/dazzler/t/-/b/`.
+            board: the dashboard's WSGI app.
+        """
+        self._boards.add(base_path, board)
+
+    def remove(self, base_path: str):
+        """Stop routing requests for the given base path.
+
+        Args:
+            base_path: the base path the dashboard got added with.
+        """
+        self._boards.remove(base_path)
+
+    def resolve(self, path: str) -> Optional[Tuple[str, WsgiApp]]:
+        """Find the dashboard a request path is for.
+
+        Args:
+            path: the request path.
+
+        Returns:
+            The dashboard's base path, without the trailing '/', and WSGI
+            app or `None` if no dashboard's base path is a prefix of the
+            given path.
+        """
+        return self._boards.longest_prefix(path)
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable:
+        path = environ.get('PATH_INFO', '')
+        resolved = self.resolve(path)
+        if resolved is None:
+            start_response('404 Not Found',
+                           [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+
+        prefix, board = resolved
+        environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + prefix
+        environ['PATH_INFO'] = path[len(prefix):] or '/'
+        return board(environ, start_response)
+
+
+class BoardRoutes(BaseRoute):
+    """Starlette route for all the dashboards in a `BoardDispatcher`.
+
+    The route only matches requests for a dashboard in the dispatcher,
+    so other routes, e.g. FastAPI endpoints below the same root as the
+    dashboards, still work no matter where this route is in the list.
+    """
+
+    def __init__(self, dispatcher: BoardDispatcher):
+        self.dispatcher = dispatcher
+        self._app = WSGIMiddleware(dispatcher)
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope['type'] == 'http' and \
+                self.dispatcher.resolve(scope['path']) is not None:
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send):
+        await self._app(scope, receive, send)
@@ -0,0 +1,236 @@
+"""
+Downsampling of entity series before plotting.
+
+Boards plotting long series send every point to the browser, but a
+chart a thousand pixels wide can't show more than a couple of points per
+pixel anyway. Past that, the figure JSON just gets bigger and the
+browser slower. So we reduce each series to about the width of the plot
+before building the figure, using one of two methods:
+
+- Largest-Triangle-Three-Buckets (LTTB), which keeps the points that
+  best preserve the visual shape of the series. See Steinarsson's
+  "Downsampling Time Series for Visual Representation", 2013.
+- Min-max bucketing, which keeps the smallest and largest value of each
+  bucket of consecutive points, so peaks and troughs never go missing.
+
+Both pick rows out of the original frame, so plotted points are actual
+data points, not averages.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dazzler.config import DownsampleSettings
+
+
+LTTB = 'lttb'
+MIN_MAX = 'minmax'
+
+
+def _bucket_edges(n: int, buckets: int) -> np.ndarray:
+    return np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """Pick the points to keep with Largest-Triangle-Three-Buckets.
+
+    Args:
+        x: the point abscissas, in ascending order.
+        y: the point ordinates. NaNs never get picked unless a bucket has
+            nothing else.
+        target: how many points to keep, at least 3.
+
+    Returns:
+        The positions of the points to keep, in ascending order. All the
+        positions if there are no more than `target` points.
+    """
+    n = len(y)
+    if n <= target or target < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, target - 2)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(np.nan_to_num(y[1:n - 1]), edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[n - 1])[1:]
+    avg_y = np.append(sums_y / counts, y[n - 1])[1:]
+
+    picked = np.empty(target, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for k in range(target - 2):
+        lo, hi = edges[k], edges[k + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        areas = np.abs((x[a] - avg_x[k]) * (by - y[a]) -
+                       (x[a] - bx) * (avg_y[k] - y[a]))
+        best = lo + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        picked[k + 1] = best
+        if not np.isnan(y[best]):
+            a = best
+    return picked
+# NOTE. Vectorizing. Each bucket's pick depends on the pick in the bucket
+# before it, so there's one loop iteration per bucket. But that's about
+# as many iterations as pixels in the plot, and all the work on the
+# points in a bucket, as well as the bucket averages, happens in NumPy.
+# If a bucket only has NaNs, we still pick one of them to keep the number
+# of points, but the next bucket's triangles use the last actual value.
+
+
+def minmax_indices(y: np.ndarray, target: int) -> np.ndarray:
+    """Pick the smallest and largest value in each bucket of points.
+
+    Args:
+        y: the point ordinates.
+        target: how many points to keep, at least 4. Half as many buckets
+            as that, plus the first and last point.
+
+    Returns:
+        The positions of the points to keep, in ascending order. All the
+        positions if there are no more than `target` points.
+    """
+    n = len(y)
+    if n <= target or target < 4:
+        return np.arange(n)
+
+    buckets = (target - 2) // 2
+    size = -(-(n - 2) // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n - 2] = y[1:n - 1]
+    rows = padded.reshape(buckets, size)
+    filled = ~np.isnan(rows).all(axis=1)
+    rows = rows[filled]
+    offsets = 1 + np.flatnonzero(filled) * size
+    lows = offsets + np.argmin(np.where(np.isnan(rows), np.inf, rows), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(rows), -np.inf, rows),
+                                axis=1)
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def _abscissas(frame: pd.DataFrame) -> np.ndarray:
+    index = frame.index
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(np.float64)
+    if pd.api.types.is_numeric_dtype(index):
+        return index.to_numpy(dtype=np.float64)
+    return np.arange(len(frame), dtype=np.float64)
+
+
+def _value_columns(frame: pd.DataFrame) -> List[str]:
+    return [c for c in frame.columns
+            if pd.api.types.is_numeric_dtype(frame[c]) and
+            not pd.api.types.is_bool_dtype(frame[c])]
+
+
+def _picked_rows(frame: pd.DataFrame, target: int,
+                 method: str) -> Optional[np.ndarray]:
+    columns = _value_columns(frame)
+    if len(frame) <= target or not columns:
+        return None
+
+    per_column = max(target // len(columns), 4)
+    x = _abscissas(frame)
+    picked = [
+        lttb_indices(x, frame[c].to_numpy(dtype=np.float64), per_column)
+        if method == LTTB else
+        minmax_indices(frame[c].to_numpy(dtype=np.float64), per_column)
+        for c in columns
+    ]
+    return np.unique(np.concatenate(picked))
+
+
+def downsample_frame(frame: pd.DataFrame, target: int,
+                     method: str = LTTB) -> pd.DataFrame:
+    """Reduce a series frame to about `target` rows.
+
+    Each numeric column gets downsampled on its own and the frame keeps
+    the union of the rows picked for each column, so the frame may end
+    up with a few more rows than `target`.
+
+    Args:
+        frame: the series, indexed by time or anything else in ascending
+            order.
+        target: how many rows to keep, roughly.
+        method: `LTTB` or `MIN_MAX`.
+
+    Returns:
+        The frame with only the picked rows, the frame itself if it
+        doesn't have more than `target` rows or any numeric column.
+    """
+    rows = _picked_rows(frame, target, method)
+    return frame if rows is None else frame.iloc[rows]
+
+
+class Downsampler:
+    """Downsamples the data of a board's figures and flags figures that
+    don't show all the data.
+    """
+
+    def __init__(self, settings: DownsampleSettings):
+        self._enabled = settings.enabled
+        self._target = settings.target_points
+        self._method = settings.method
+
+    def frame(self, frame: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """Downsample a series.
+
+        Args:
+            frame: the series.
+
+        Returns:
+            The downsampled series along with how many rows it had to
+            start with.
+        """
+        if not self._enabled:
+            return frame, len(frame)
+        return downsample_frame(frame, self._target, self._method), len(frame)
+
+    def frames(self, frames: Dict[str, pd.DataFrame]) \
+            -> Tuple[Dict[str, pd.DataFrame], int]:
+        """Downsample a series for each entity, splitting the target
+        points evenly among entities.
+
+        Args:
+            frames: the series, keyed on entity ID. Each series has its
+                time points in an `index` column.
+
+        Returns:
+            The downsampled series, with positional indexes, along with
+            how many rows they had to start with in total.
+        """
+        total = sum(len(f) for f in frames.values())
+        if not self._enabled or not frames:
+            return frames, total
+
+        target = max(self._target // len(frames), 4)
+        picked = {}
+        for (entity_id, frame) in frames.items():
+            timed = frame.set_index('index') if 'index' in frame else frame
+            rows = _picked_rows(timed, target, self._method)
+            picked[entity_id] = frame if rows is None else \
+                frame.iloc[rows].reset_index(drop=True)
+        return picked, total
+    # NOTE. Positional indexes. Boards may look up rows by position, e.g.
+    # VIQE uses `iloc` with the position of the most recent row, so we
+    # renumber the rows we keep.
+
+    def annotate(self, figure: Any, shown: int, total: int) -> Any:
+        """Add a note to the figure saying it only shows some of the data
+        points, if it does.
+
+        Args:
+            figure: a plotly figure.
+            shown: how many data points the figure shows.
+            total: how many data points there were before downsampling.
+
+        Returns:
+            The figure.
+        """
+        if shown < total:
+            figure.add_annotation(
+                text=f"downsampled ({self._method}): "
+                     f"{shown:,} of {total:,} points",
+                xref='paper', yref='paper', x=1, y=1.08, showarrow=False,
+                xanchor='right', font={'size': 11}, opacity=0.7
+            )
+        return figure
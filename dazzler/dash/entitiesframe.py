@@ -8,8 +8,10 @@ import pandas as pd
 
 from dazzler.dash.components import has_triggered, datetime_local_input, \
     from_datetime_local_input
-from dazzler.dash.wiring import BasePath
-from dazzler.dash.fiware import QuantumLeapSource
+from dazzler.dash.wiring import BasePath, settings_for
+from dazzler.dash.downsample import Downsampler
+from dazzler.dash.figures import FigureCache
+from dazzler.dash.fiware import QuantumLeapSource, columnar_series_frame
 
 
 LOAD_BUTTON_ID = 'load-button'
@@ -28,6 +30,8 @@ class EntitiesFrameDashboard(ABC):
         self._entity_type = entity_type
         self._base_path = BasePath.from_board_app(app)
         self._quantumleap = QuantumLeapSource(app)
+        self._figures = FigureCache()
+        self._downsampler = Downsampler(settings_for(app).downsampling)
 
     @abstractmethod
     def explanation(self) -> str:
@@ -123,7 +127,19 @@ class EntitiesFrameDashboard(ABC):
             if from_time and to_time:
                 frames = self._quantumleap.fetch_entity_type_series(
                     entity_type=self._entity_type,
-                    from_timepoint=from_time, to_timepoint=to_time
+                    from_timepoint=from_time, to_timepoint=to_time,
+                    decoder=columnar_series_frame
                 )
 
-        return self.make_figure(frames)
+        return self._figures.figure(GRAPH_ID, frames,
+                                    lambda: self._downsampled_figure(frames))
+
+    def _downsampled_figure(self, frames: Dict[str, pd.DataFrame]) -> Any:
+        shown, total = self._downsampler.frames(frames)
+        return self._downsampler.annotate(
+            self.make_figure(shown), sum(len(f) for f in shown.values()),
+            total
+        )
+    # NOTE. Long time ranges. Users can load entities over any time range,
+    # possibly with lots more data points than the plot has pixels, so we
+    # only plot about as many points as the plot can show.
@@ -0,0 +1,279 @@
+"""
+Searchable index of the IDs of the entities boards let users pick.
+
+Boards used to fetch the IDs of all the entities of a type whenever the
+user pressed a load button and then stuff them all in a drop-down.
+With tens of thousands of entities, that's a slow query on every click
+and a drop-down nobody can use. So we keep the IDs of each tenant's
+entities of a type in a sorted list, loaded a page at a time, shared by
+all the boards and sessions of the process. Selectors search the list
+by prefix as the user types and only get the first few matches.
+
+The index loads on the first search and then catches up with the
+backend as searches come in: new entities every so often, the whole
+list every now and then.
+"""
+from bisect import bisect_left
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dash import Dash
+
+from dazzler.config import EntityIndexSettings, dazzler_config
+from dazzler.dash.fiware import OrionSource, QuantumLeapSource, \
+    fiware_context_for
+from dazzler.dash.wiring import settings_for
+
+
+IdPageFetch = Callable[[int, int], List[str]]
+"""Fetches a page of entity IDs given the offset and size of the page."""
+
+IndexKey = Tuple
+"""Identifies an index: backend, backend URL, tenant, service path and
+entity type.
+"""
+
+
+class EntityIdIndex:
+    """The IDs of all the entities of a type, in lexicographic order."""
+
+    def __init__(self, fetch_page: IdPageFetch,
+                 settings: EntityIndexSettings,
+                 clock: Callable[[], float] = time.monotonic):
+        """Create a new instance.
+
+        Args:
+            fetch_page: gets a page of IDs from the backend. Pages are in
+                the backend's order, which should put new entities last.
+            settings: how to page and refresh the index.
+            clock: monotonic time source, in seconds.
+        """
+        self._fetch_page = fetch_page
+        self._page_size = settings.page_size
+        self._refresh_interval = settings.refresh_interval
+        self._rebuild_interval = settings.rebuild_interval
+        self._max_options = settings.max_options
+        self._clock = clock
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._ids: Optional[List[str]] = None
+        self._fetched = 0
+        self._refreshed_at = -float('inf')
+        self._rebuilt_at = -float('inf')
+
+    def _fetch_from(self, offset: int) -> List[str]:
+        ids = []
+        while True:
+            page = self._fetch_page(offset + len(ids), self._page_size)
+            ids += page
+            if len(page) < self._page_size:
+                return ids
+
+    def rebuild(self):
+        """Fetch all the IDs again and replace the index with them.
+
+        Raises:
+            Exception: whatever the fetch raised, in which case the index
+                stays the same.
+        """
+        ids = self._fetch_from(0)
+        with self._lock:
+            self._ids, self._fetched = sorted(set(ids)), len(ids)
+            self._rebuilt_at = self._refreshed_at = self._clock()
+
+    def refresh(self):
+        """Fetch the IDs past the last page we've got and add them to the
+        index.
+
+        Raises:
+            Exception: whatever the fetch raised, in which case the index
+                stays the same.
+        """
+        with self._lock:
+            known, offset = self._ids or [], self._fetched
+        new = self._fetch_from(offset)
+        ids = sorted(set(known).union(new)) if new else known
+        with self._lock:
+            self._ids, self._fetched = ids, offset + len(new)
+            self._refreshed_at = self._clock()
+    # NOTE. Incremental refresh. Both Orion and Quantum Leap page entities
+    # in a stable order with new ones last, so the entities created since
+    # the last fetch are past the offset we got to. If entities get deleted
+    # in the meantime, the offset overshoots and we may miss a few new ones
+    # until the next rebuild, which also drops the deleted ones.
+
+    def _claim_update(self, now: float) -> Optional[Callable[[], None]]:
+        if now - self._rebuilt_at >= self._rebuild_interval:
+            self._rebuilt_at = self._refreshed_at = now
+            return self.rebuild
+        if now - self._refreshed_at >= self._refresh_interval:
+            self._refreshed_at = now
+            return self.refresh
+        return None
+
+    def _read(self) -> List[str]:
+        with self._lock:
+            ids = self._ids
+            update = None if ids is None else \
+                self._claim_update(self._clock())
+        if ids is None:
+            with self._load_lock:
+                if self._ids is None:
+                    self.rebuild()
+            return self._ids
+        if update is not None:
+            try:
+                update()
+            except Exception as e:
+                print(f"Entity ID index update failed: {e}")
+        return self._ids
+    # NOTE. Updates. The first reader loads the index, while any other
+    # reader coming in at the same time waits for it. After that, the
+    # reader who finds the index due for an update claims it and runs it,
+    # while everyone else reads the IDs we've got. If the update fails,
+    # we keep the IDs we've got and try again at the next interval. Each
+    # update replaces the list, so readers never see it change under them.
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Find the IDs starting with the given prefix.
+
+        Args:
+            prefix: what the IDs should start with. The empty string
+                matches any ID.
+            limit: how many IDs to return at most. Defaults to the
+                `max_options` setting.
+
+        Returns:
+            The first matching IDs in lexicographic order.
+
+        Raises:
+            Exception: whatever the backend fetch raised, if this is the
+                first search and we had to load the index.
+        """
+        ids = self._read()
+        limit = self._max_options if limit is None else limit
+        start = bisect_left(ids, prefix)
+        matches = []
+        for x in ids[start:start + limit]:
+            if not x.startswith(prefix):
+                break
+            matches.append(x)
+        return matches
+
+    def options(self, search_value: Optional[str],
+                selected: Optional[str] = None) -> List[dict]:
+        """Build the options of a typeahead drop-down.
+
+        Args:
+            search_value: what the user typed in the drop-down so far.
+            selected: the ID the user picked, if any. It stays among the
+                options even if it doesn't match, otherwise the drop-down
+                would clear it.
+
+        Returns:
+            A Dash option for each ID matching the search value.
+        """
+        ids = self.search(search_value or '')
+        if selected and selected not in ids:
+            ids = [selected] + ids
+        return [{'label': x, 'value': x} for x in ids]
+
+    def __len__(self) -> int:
+        return len(self._read())
+
+
+class EntityIdIndexes:
+    """Keeps the entity ID indexes of all the tenants."""
+
+    def __init__(self, settings: EntityIndexSettings,
+                 clock: Callable[[], float] = time.monotonic):
+        self._settings = settings
+        self._clock = clock
+        self._lock = Lock()
+        self._indexes: Dict[IndexKey, EntityIdIndex] = {}
+
+    def index(self, key: IndexKey, fetch_page: IdPageFetch) -> EntityIdIndex:
+        """Get the index with the given key, creating it if needed.
+
+        Args:
+            key: identifies the index.
+            fetch_page: gets a page of IDs from the backend, in case we've
+                got to create the index.
+
+        Returns:
+            The index.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = EntityIdIndex(fetch_page, self._settings, self._clock)
+                self._indexes[key] = index
+            return index
+
+
+_entity_id_indexes: Optional[EntityIdIndexes] = None
+_entity_id_indexes_lock = Lock()
+
+
+def entity_id_indexes() -> EntityIdIndexes:
+    """Get the process-wide entity ID indexes, creating them from the
+    Dazzler settings on first use.
+
+    Returns:
+        The indexes shared by all the boards.
+    """
+    global _entity_id_indexes
+    with _entity_id_indexes_lock:
+        if _entity_id_indexes is None:
+            _entity_id_indexes = EntityIdIndexes(dazzler_config().entity_index)
+        return _entity_id_indexes
+
+
+def reset_entity_id_indexes():
+    """Drop the process-wide entity ID indexes, so the next
+    `entity_id_indexes` call creates new ones from the current Dazzler
+    settings.
+    """
+    global _entity_id_indexes
+    with _entity_id_indexes_lock:
+        _entity_id_indexes = None
+
+
+def quantumleap_entity_ids(app: Dash, entity_type: str) -> EntityIdIndex:
+    """Get the index of the entities of the given type Quantum Leap has
+    series for.
+
+    Args:
+        app: the Dash app of the board. The index has the entities of the
+            board's tenant and service path.
+        entity_type: the type of the entities in the index.
+
+    Returns:
+        The index.
+    """
+    ctx = fiware_context_for(app)
+    key = ('quantumleap', str(settings_for(app).quantumleap_base_url),
+           ctx.service, ctx.service_path, entity_type)
+    fetch_page = lambda offset, limit: QuantumLeapSource(app) \
+        .fetch_entity_ids_page(entity_type, offset, limit)
+    return entity_id_indexes().index(key, fetch_page)
+
+
+def orion_entity_ids(app: Dash, entity_type: str) -> EntityIdIndex:
+    """Get the index of the entities of the given type in Orion.
+
+    Args:
+        app: the Dash app of the board. The index has the entities of the
+            board's tenant and service path.
+        entity_type: the type of the entities in the index.
+
+    Returns:
+        The index.
+    """
+    ctx = fiware_context_for(app)
+    key = ('orion', str(settings_for(app).orion_base_url),
+           ctx.service, ctx.service_path, entity_type)
+    fetch_page = lambda offset, limit: OrionSource(app) \
+        .fetch_entity_ids_page(entity_type, offset, limit)
+    return entity_id_indexes().index(key, fetch_page)
@@ -1,20 +1,25 @@
 from abc import ABC, abstractmethod
 from typing import Any
 
-from dash import Dash, Input, Output, dcc, html
+from dash import Dash, Input, Output, State, dcc, html, no_update
 from dash.development.base_component import Component
 import dash_bootstrap_components as dbc
 import pandas as pd
 
-from dazzler.dash.wiring import BasePath
-from dazzler.dash.fiware import QuantumLeapSource
+from dazzler.dash.wiring import BasePath, settings_for
+from dazzler.dash.downsample import Downsampler
+from dazzler.dash.entityindex import quantumleap_entity_ids
+from dazzler.dash.figures import FigureCache, fingerprint
+from dazzler.dash.fiware import QuantumLeapSource, columnar_series_frame
+from dazzler.dash.push import LiveRefresh
+from dazzler.dash.rolling import RollingSeriesStore
 
 
 INTERVAL_COMPONENT_ID = 'interval-component'
-LOAD_BUTTON_ID = 'load-ids-button'
 ENTITY_SELECT_ID = 'entity-id'
 ENTRIES_INPUT_ID = 'entries-from-latest'
 GRAPH_ID = 'graph'
+GRAPH_FINGERPRINT_ID = 'graph-fingerprint'
 
 
 class EntityMonitorDashboard(ABC):
@@ -29,6 +34,16 @@ class EntityMonitorDashboard(ABC):
         self._refresh_rate = refresh_rate_millis
         self._base_path = BasePath.from_board_app(app)
         self._quantumleap = QuantumLeapSource(app)
+        self._refresh = LiveRefresh(app, INTERVAL_COMPONENT_ID,
+                                    refresh_rate_millis, entity_type)
+        self._series = RollingSeriesStore(
+            source=self._quantumleap, entity_type=entity_type,
+            max_age=refresh_rate_millis / 2000,
+            decoder=columnar_series_frame
+        )
+        self._refresh.watch(self._series)
+        self._figures = FigureCache()
+        self._downsampler = Downsampler(settings_for(app).downsampling)
 
     @abstractmethod
     def empty_data_set(self) -> dict:
@@ -62,8 +77,8 @@ class EntityMonitorDashboard(ABC):
                     ],
                     align="center",
                 ),
-                dcc.Interval(id=INTERVAL_COMPONENT_ID,
-                             interval=self._refresh_rate, n_intervals=0)
+                self._refresh.component(),
+                dcc.Store(id=GRAPH_FINGERPRINT_ID)
             ],
             fluid=True
         )
@@ -80,18 +95,9 @@ class EntityMonitorDashboard(ABC):
                 html.Hr(),
                 dcc.Markdown(self.explanation()),
                 html.Hr(),
-                dbc.Row([
-                    dbc.Col(
-                        dbc.Button('Load Entity IDs', id=LOAD_BUTTON_ID,
-                                    n_clicks=0),
-                        md=4
-                    ),
-                    dbc.Col(
-                        dbc.Select(id=ENTITY_SELECT_ID, options=[],
-                                    placeholder='Select...'),
-                        md=8
-                    )
-                ]),
+                dcc.Dropdown(id=ENTITY_SELECT_ID, options=[],
+                             placeholder='Type an entity ID...',
+                             className='text-dark'),
                 html.P(),
                 dbc.Row([
                     dbc.Col(
@@ -116,26 +122,43 @@ class EntityMonitorDashboard(ABC):
     def _build_callbacks(self):
         self._app.callback(
             Output(ENTITY_SELECT_ID, 'options'),
-            Input(LOAD_BUTTON_ID, 'n_clicks')
+            Input(ENTITY_SELECT_ID, 'search_value'),
+            State(ENTITY_SELECT_ID, 'value')
         )(self._populate_entity_ids)
 
         self._app.callback(
             Output(GRAPH_ID, 'figure'),
-            Input(INTERVAL_COMPONENT_ID, 'n_intervals'),
+            Output(GRAPH_FINGERPRINT_ID, 'data'),
+            self._refresh.input(),
             Input(ENTITY_SELECT_ID, 'value'),
-            Input(ENTRIES_INPUT_ID, 'value')
+            Input(ENTRIES_INPUT_ID, 'value'),
+            State(GRAPH_FINGERPRINT_ID, 'data')
         )(self._update_graph)
 
-    def _populate_entity_ids(self, value) -> Any:
-        xs = self._quantumleap.fetch_entity_ids(entity_type=self._entity_type)
-        return [{'label': x, 'value': x} for x in xs]
-
-    def _update_graph(self, intervals, entity_id, entries_from_latest) -> Any:
-        if not entity_id:
-            return self._empty_fig()
-
-        df = self._quantumleap.fetch_entity_series(
-            entity_id=entity_id, entity_type=self._entity_type,
-            entries_from_latest=entries_from_latest
-        )
-        return self.make_figure(df)
+    def _populate_entity_ids(self, search_value, selected) -> Any:
+        index = quantumleap_entity_ids(self._app, self._entity_type)
+        return index.options(search_value, selected)
+
+    def _update_graph(self, intervals, entity_id, entries_from_latest,
+                      shown_fingerprint) -> Any:
+        if not entity_id or not entries_from_latest:
+            return self._empty_fig(), None
+
+        df = self._series.window(entity_id, int(entries_from_latest))
+        data_fingerprint = fingerprint(df)
+        if data_fingerprint == shown_fingerprint:
+            return no_update, no_update
+
+        figure = self._figures.figure(GRAPH_ID, df,
+                                      lambda: self._downsampled_figure(df),
+                                      data_fingerprint)
+        return figure, data_fingerprint
+    # NOTE. Unchanged data. The browser keeps the fingerprint of the data
+    # behind the figure it shows, so when a refresh comes up with the same
+    # data we don't even send the figure back. When the data is the same
+    # as some other session's, we send the figure that session got.
+
+    def _downsampled_figure(self, df: pd.DataFrame) -> Any:
+        shown, total = self._downsampler.frame(df)
+        return self._downsampler.annotate(self.make_figure(shown),
+                                          len(shown), total)
@@ -0,0 +1,122 @@
+"""
+Reuse of plotly figures across refreshes.
+
+Live boards rebuild their figures on every refresh tick, even when the
+data hasn't changed since the last tick, and building a figure with
+plotly express is expensive. So we fingerprint the data a figure gets
+built from and keep the built figure around, keyed on the fingerprint.
+If the next refresh comes up with the same data, we hand out the figure
+we've already got rather than building it again.
+"""
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+
+FigureData = Union[pd.DataFrame, pd.Series, Dict[str, Any], None]
+"""What boards build figures from: a frame, a series or a dictionary of
+frames, e.g. one for each entity ID.
+"""
+
+
+def _row_hashes(data: Union[pd.DataFrame, pd.Series]) -> bytes:
+    hashes = pd.util.hash_pandas_object(data, index=True, categorize=False)
+    return hashes.values.tobytes()
+
+
+def _digest(h, data: FigureData):
+    if isinstance(data, dict):
+        for key in sorted(data, key=str):
+            h.update(f"key:{key}".encode())
+            _digest(h, data[key])
+    elif isinstance(data, pd.DataFrame):
+        h.update(f"frame:{list(data.columns)}:{list(data.dtypes)}".encode())
+        h.update(_row_hashes(data))
+    elif isinstance(data, pd.Series):
+        h.update(f"series:{data.name}:{data.dtype}".encode())
+        h.update(_row_hashes(data))
+    else:
+        h.update(f"value:{data!r}".encode())
+
+
+def fingerprint(data: FigureData) -> str:
+    """Compute a fingerprint of the given figure data.
+
+    Args:
+        data: the data to fingerprint.
+
+    Returns:
+        A hex digest that changes whenever the data, the index, the column
+        names or the column types change.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    _digest(h, data)
+    return h.hexdigest()
+# NOTE. Hashing structured values. `hash_pandas_object` hashes the string
+# representation of objects it can't hash directly, like the dicts in a
+# structured value column, so those work too, just slower. We've got to
+# turn off categorizing though, since that only works with hashable
+# objects.
+
+
+def _serializable(figure: Any) -> Any:
+    to_dict = getattr(figure, 'to_dict', None)
+    return to_dict() if callable(to_dict) else figure
+
+
+class FigureCache:
+    """Keeps the figures a board built, keyed on the fingerprint of the
+    data they got built from.
+
+    Each board gets its own cache, shared by all its sessions, holding up
+    to `max_entries` figures. The least recently used figure goes when
+    going over that limit. Figures get stored as plain dictionaries, so
+    Dash can serialize them without having to validate a plotly figure
+    object on every response.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._figures: 'OrderedDict[Tuple[str, str], Any]' = OrderedDict()
+
+    def figure(self, kind: str, data: FigureData, build: Callable[[], Any],
+               data_fingerprint: Optional[str] = None) -> Any:
+        """Get the figure of the given kind built from the given data,
+        building it if it isn't in the cache.
+
+        Args:
+            kind: tells apart the figures a board builds from the same
+                data, e.g. a bar and a line chart of the same frame.
+            data: what the figure gets built from.
+            build: function to build the figure from the data.
+            data_fingerprint: the data fingerprint if the caller computed
+                it already, otherwise it gets computed here.
+
+        Returns:
+            The figure, as a dictionary.
+        """
+        key = (kind, data_fingerprint or fingerprint(data))
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                return self._figures[key]
+
+        figure = _serializable(build())
+
+        with self._lock:
+            self._figures[key] = figure
+            while len(self._figures) > self._max_entries:
+                self._figures.popitem(last=False)
+        return figure
+    # NOTE. Concurrent builds. Two sessions refreshing at the same time
+    # may both build the same figure. That's harmless---the last one wins
+    # and both are the same anyway---and cheaper than making sessions wait
+    # on each other.
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._figures)
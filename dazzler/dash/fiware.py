@@ -1,16 +1,25 @@
+import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Literal, \
+    Optional, Tuple, Union
+from urllib.parse import quote
 
 from dash import Dash
 from fipy.ngsi.headers import FiwareContext
 from fipy.ngsi.entity import BaseEntity, Entity
-from fipy.ngsi.orion import OrionClient
-from fipy.ngsi.quantumleap import QuantumLeapClient
+from httpx import HTTPStatusError
+import numpy as np
 import pandas as pd
-from uri import URI
+from pydantic import BaseModel
+from requests import HTTPError
 
 from dazzler.config import dazzler_config
-from dazzler.dash.wiring import BasePath
+from dazzler.dash.bridge import async_bridge
+from dazzler.dash.cache import QueryCache
+from dazzler.dash.http import AsyncFiwareHttp, FiwareHttp, is_not_found
+from dazzler.dash.sharedcache import shared_store
+from dazzler.dash.wiring import BasePath, settings_for
 
 
 def fiware_context_for(app: Dash) -> FiwareContext:
@@ -21,64 +30,716 @@ def fiware_context_for(app: Dash) -> FiwareContext:
     )
 
 
+def _path_segment(value: str) -> str:
+    return quote(value, safe='')
+
+
+def _iso_or_none(timepoint: Optional[datetime]) -> Optional[str]:
+    return timepoint.isoformat() if timepoint else None
+
+
+class Aggregation(BaseModel):
+    """Aggregation Quantum Leap should apply to series before returning
+    them.
+
+    QL aggregates each attribute's values over each `period` with the
+    given `method`, or over the whole series if there's no period. Only
+    numeric attributes can be aggregated, so queries with an aggregation
+    should select the attributes to fetch.
+    """
+    method: Literal['avg', 'min', 'max', 'sum', 'count']
+    period: Optional[Literal['year', 'month', 'day', 'hour', 'minute',
+                             'second']] = None
+
+    class Config:
+        frozen = True
+
+
+Attributes = Optional[List[str]]
+"""Which attributes to fetch, all of them if `None`."""
+
+
+def _attrs_key(attrs: Attributes) -> Optional[Tuple[str, ...]]:
+    return tuple(attrs) if attrs else None
+
+
+def _series_params(entity_type: Optional[str],
+                   entries_from_latest: Optional[int],
+                   from_timepoint: Optional[datetime],
+                   to_timepoint: Optional[datetime],
+                   attrs: Attributes = None,
+                   aggregation: Optional[Aggregation] = None) -> dict:
+    return {
+        'type': entity_type,
+        'lastN': entries_from_latest,
+        'fromDate': _iso_or_none(from_timepoint),
+        'toDate': _iso_or_none(to_timepoint),
+        'attrs': ','.join(attrs) if attrs else None,
+        'aggrMethod': aggregation.method if aggregation else None,
+        'aggrPeriod': aggregation.period if aggregation else None
+    }
+
+
+def series_frame(payload: dict) -> pd.DataFrame:
+    """Convert an entity series Quantum Leap returned to a data frame.
+
+    Args:
+        payload: the parsed JSON of the QL series, i.e. an object with an
+            `index` array of time points and an `attributes` array with,
+            for each attribute, its name and values at those time points.
+
+    Returns:
+        A frame with an `index` column holding the time points and a column
+        for each attribute.
+    """
+    data = {'index': pd.to_datetime(payload.get('index', []), utc=True)}
+    for attr in payload.get('attributes', []):
+        data[attr['attrName']] = attr['values']
+    return pd.DataFrame(data)
+
+
+def _utc_time_points(timepoints: List[str]) -> pd.DatetimeIndex:
+    joined = '\n'.join(timepoints) + '\n'
+    if joined.count('+00:00\n') == len(timepoints):
+        naive = joined.replace('+00:00\n', '\n').split('\n')[:-1]
+        try:
+            utc = np.array(naive, dtype='datetime64[ns]')
+            return pd.DatetimeIndex(utc).tz_localize('UTC')
+        except ValueError:
+            pass
+    return pd.DatetimeIndex(pd.to_datetime(timepoints, utc=True))
+# NOTE. Parsing time points. QL hands out time points in UTC, with a
+# `+00:00` offset. NumPy parses them way faster than pandas once we've
+# stripped the offsets, which we do in one go on the joined strings to
+# avoid a Python call per time point. If any time point has got some
+# other offset, we let pandas deal with the whole lot.
+
+
+def _typed_values(values: list) -> Union[np.ndarray, list]:
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        column = np.array(values)
+        if column.dtype == np.bool_:
+            return column
+    elif isinstance(sample, (int, float)):
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    return values
+# NOTE. Column types. Numbers always become floats, with nulls turned
+# into NaNs, so a column keeps the same dtype no matter whether the
+# values in a given time window happen to be all integers or contain
+# nulls. Bool columns with nulls, strings, structured values and any
+# mix of types we leave to pandas.
+
+
+def columnar_series_frame(payload: dict) -> pd.DataFrame:
+    """Same as `series_frame`, but decode the payload column by column
+    straight into typed NumPy arrays rather than letting pandas infer
+    the column types. The index column is UTC `datetime64`, numeric
+    columns `float64` with NaNs for nulls and bool columns `bool`.
+    Other attributes end up in `object` columns.
+
+    Args:
+        payload: the parsed JSON of the QL series.
+
+    Returns:
+        A frame with an `index` column holding the time points and a column
+        for each attribute.
+    """
+    data = {'index': _utc_time_points(payload.get('index', []))}
+    for attr in payload.get('attributes', []):
+        data[attr['attrName']] = _typed_values(attr['values'])
+    return pd.DataFrame(data, copy=False)
+
+
+class AttributePath:
+    """Path to a value nested inside a structured value attribute.
+
+    A path is a dot-separated string made up of the attribute name followed
+    by the keys to look up, one after the other, in the attribute value,
+    e.g. `workerStates.fatigue.level.value`. Use `extract` to pull the
+    nested value out of all the rows of a series frame in one go.
+    """
+
+    def __init__(self, path: str):
+        """Create a new instance.
+
+        Args:
+            path: the dot-separated path to the value.
+        """
+        self.path = path
+        self.attr_name, *keys = path.split('.')
+        self._keys = tuple(keys)
+
+    def _lookup(self, value: Any) -> Any:
+        for key in self._keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def extract(self, frame: pd.DataFrame,
+                name: Optional[str] = None) -> pd.Series:
+        """Pull the value at the end of the path out of each row of the
+        given frame.
+
+        Args:
+            frame: a series frame with a column for the attribute.
+            name: what to call the returned series. Defaults to the path.
+
+        Returns:
+            A series with the same index as the frame. Numeric values end
+            up in a `float64` series. Rows where the attribute is null or
+            the path leads nowhere get a NaN or `None` if the values aren't
+            numeric. If the frame has no column for the attribute, all rows
+            are NaN.
+        """
+        name = name or self.path
+        if self.attr_name not in frame.columns:
+            return pd.Series(np.nan, index=frame.index, name=name,
+                             dtype=np.float64)
+
+        values = [self._lookup(v) for v in frame[self.attr_name].tolist()]
+        if all(v is None for v in values):
+            values = np.full(len(values), np.nan)
+        return pd.Series(_typed_values(values), index=frame.index,
+                         name=name)
+    # NOTE. Performance. Structured values are plain dicts, so there's no
+    # way around visiting each row in Python. But a tight loop over a list
+    # with a precomputed key sequence is way cheaper than `Series.apply`
+    # with a lambda, and converting the results to a typed array in bulk
+    # saves pandas from having to infer the type row by row.
+
+
+SeriesDecoder = Callable[[dict], pd.DataFrame]
+"""Converts the QL JSON of an entity series to a data frame."""
+
+
+def entity_type_frames(payload: dict,
+                       decoder: SeriesDecoder = series_frame) \
+        -> Dict[str, pd.DataFrame]:
+    """Convert the series of all the entities of a type Quantum Leap
+    returned to data frames.
+
+    Args:
+        payload: the parsed JSON of the QL entity type series.
+        decoder: how to convert each entity series.
+
+    Returns:
+        A frame, as built by the decoder, for each entity ID.
+    """
+    return {
+        series['entityId']: decoder(series)
+        for series in payload.get('entities', [])
+    }
+
+
+def _entity_summaries(xs: List[dict]) -> List[BaseEntity]:
+    return [BaseEntity(id=x['entityId'], type=x['entityType']) for x in xs]
+
+
+SeriesResult = Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+
+
+def _series_size(result: SeriesResult) -> int:
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    return sum(_series_size(frame) for frame in result.values())
+
+
+def _copy_series(result: SeriesResult) -> SeriesResult:
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    return {entity_id: frame.copy() for (entity_id, frame) in result.items()}
+# NOTE. Copying cached frames.
+# Boards are free to mutate the frames we hand them---e.g. FAMS replaces
+# the index column in place. So we give each caller its own copy to make
+# sure nobody ever sees a cached frame someone else has tampered with.
+
+
+_query_cache: Optional[QueryCache] = None
+_query_cache_lock = Lock()
+
+
+def query_cache() -> QueryCache:
+    """Get the process-wide cache of Quantum Leap query results, creating
+    it from the Dazzler settings on first use.
+
+    Returns:
+        The cache shared by all the `QuantumLeapSource` instances.
+    """
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            cfg = dazzler_config().query_cache
+            _query_cache = QueryCache(max_bytes=cfg.max_bytes,
+                                      sizeof=_series_size,
+                                      shared=shared_store(cfg))
+        return _query_cache
+
+
+def reset_query_cache():
+    """Drop the process-wide query cache, so the next `query_cache` call
+    creates a new one from the current Dazzler settings.
+    """
+    global _query_cache
+    with _query_cache_lock:
+        _query_cache = None
+
+
+class SeriesQuery(BaseModel):
+    """A Quantum Leap series query, to run on its own or in a batch.
+
+    With an entity ID, the query fetches that entity's series, otherwise
+    the series of all the entities of the given type. The other fields
+    work the same as the params of `QuantumLeapSource.fetch_entity_series`.
+    """
+    entity_type: str
+    entity_id: Optional[str] = None
+    entries_from_latest: Optional[int] = None
+    from_timepoint: Optional[datetime] = None
+    to_timepoint: Optional[datetime] = None
+    decoder: SeriesDecoder = series_frame
+    attrs: Attributes = None
+    aggregation: Optional[Aggregation] = None
+
+
+BatchResult = Union[SeriesResult, Exception]
+
+
+def _cache_key(base_url: str, ctx: FiwareContext, query: Tuple) -> Tuple:
+    return (base_url, ctx.service, ctx.service_path) + query
+
+
 class QuantumLeapSource:
 
     def __init__(self, app: Dash):
-        cfg = dazzler_config()
-        self._client = QuantumLeapClient(
-            base_url=URI(str(cfg.quantumleap_base_url)),
-            ctx=fiware_context_for(app)
-        )
+        cfg = settings_for(app)
+        self._base_url = str(cfg.quantumleap_base_url)
+        self._ctx = fiware_context_for(app)
+        self._cache_settings = cfg.query_cache
+        self._http = FiwareHttp(self._base_url, self._ctx)
+        self._async = AsyncQuantumLeapSource(app)
+
+    def _cached(self, entity_type: str, query: Tuple,
+                fetch: Callable[[], SeriesResult],
+                cached: bool = True) -> Any:
+        if not cached:
+            return fetch()
+        key = _cache_key(self._base_url, self._ctx, query)
+        ttl = self._cache_settings.ttl_for(entity_type)
+        result = query_cache().get_or_fetch(key, ttl, fetch)
+        return _copy_series(result)
 
     def fetch_entity_series(self,
             entity_id: str, entity_type: str,
             entries_from_latest: Optional[int] = None,
             from_timepoint: Optional[datetime] = None,
-            to_timepoint: Optional[datetime] = None) -> pd.DataFrame:
-        r = self._client.entity_series(
-            entity_id=entity_id, entity_type=entity_type,
-            entries_from_latest=entries_from_latest,
-            from_timepoint=from_timepoint, to_timepoint=to_timepoint
+            to_timepoint: Optional[datetime] = None,
+            decoder: SeriesDecoder = series_frame,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None,
+            cached: bool = True) -> pd.DataFrame:
+        query = ('entity_series', entity_id, entity_type,
+                 entries_from_latest, from_timepoint, to_timepoint, decoder,
+                 _attrs_key(attrs), aggregation)
+        fetch = lambda: self._fetch_entity_series(
+            entity_id, entity_type,
+            entries_from_latest, from_timepoint, to_timepoint, decoder,
+            attrs, aggregation
         )
-        time_indexed_df = pd.DataFrame(r.dict()).set_index('index')
+        return self._cached(entity_type, query, fetch, cached)
+    # NOTE. Uncached queries. Pass `cached=False` to skip the query cache
+    # and get what Quantum Leap has right now, e.g. when we know the data
+    # changed since the last query or when the caller keeps the results
+    # somewhere else already. Same for `fetch_entity_type_series`.
+
+    def _fetch_entity_series(self,
+            entity_id: str, entity_type: str,
+            entries_from_latest: Optional[int],
+            from_timepoint: Optional[datetime],
+            to_timepoint: Optional[datetime],
+            decoder: SeriesDecoder,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) -> pd.DataFrame:
+        payload = self._http.get_json(
+            f"/v2/entities/{_path_segment(entity_id)}",
+            _series_params(entity_type, entries_from_latest,
+                           from_timepoint, to_timepoint, attrs, aggregation)
+        )
+        time_indexed_df = decoder(payload).set_index('index')
         return time_indexed_df
 
     def fetch_entity_type_series(self,
             entity_type: str,
             entries_from_latest: Optional[int] = None,
             from_timepoint: Optional[datetime] = None,
-            to_timepoint: Optional[datetime] = None) -> Dict[str, pd.DataFrame]:
-        rs = self._client.entity_type_series(
-            entity_type=entity_type,
-            entries_from_latest=entries_from_latest,
-            from_timepoint=from_timepoint, to_timepoint=to_timepoint
+            to_timepoint: Optional[datetime] = None,
+            decoder: SeriesDecoder = series_frame,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None,
+            cached: bool = True) -> Dict[str, pd.DataFrame]:
+        query = ('entity_type_series', entity_type,
+                 entries_from_latest, from_timepoint, to_timepoint, decoder,
+                 _attrs_key(attrs), aggregation)
+        fetch = lambda: self._fetch_entity_type_series(
+            entity_type, entries_from_latest, from_timepoint, to_timepoint,
+            decoder, attrs, aggregation
         )
-        frames = {
-            entity_id : (pd.DataFrame(series.dict()))
-            for (entity_id, series) in rs.items()
-        }
-        return frames
+        return self._cached(entity_type, query, fetch, cached)
+
+    def _fetch_entity_type_series(self,
+            entity_type: str,
+            entries_from_latest: Optional[int],
+            from_timepoint: Optional[datetime],
+            to_timepoint: Optional[datetime],
+            decoder: SeriesDecoder,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) \
+            -> Dict[str, pd.DataFrame]:
+        payload = self._http.get_json(
+            f"/v2/types/{_path_segment(entity_type)}",
+            _series_params(None, entries_from_latest,
+                           from_timepoint, to_timepoint, attrs, aggregation)
+        )
+        return entity_type_frames(payload, decoder)
+
+    def fetch_batch(self, queries: List[SeriesQuery],
+                    return_exceptions: bool = False) -> List[BatchResult]:
+        """Run several series queries in parallel.
+
+        The queries run concurrently on the `async_bridge` loop and go
+        through the query cache, just like the other fetch methods.
+
+        Args:
+            queries: what to fetch.
+            return_exceptions: if `True`, a query that fails gets the
+                exception it raised in its result slot, otherwise the
+                first failure gets raised. Either way the other queries
+                run to completion.
+
+        Returns:
+            The query results, in the same order as the queries. An entity
+            query yields a frame, an entity type query a frame for each
+            entity ID.
+        """
+        fetches = [self._async.fetch(q) for q in queries]
+        return async_bridge().gather(*fetches,
+                                     return_exceptions=return_exceptions)
 
     def fetch_entity_summaries(self, entity_type: Optional[str] = None) \
         -> List[BaseEntity]:
-        return self._client.list_entities(entity_type=entity_type)
+        xs = self._http.get_json('/v2/entities', {'type': entity_type})
+        return _entity_summaries(xs)
 
     def fetch_entity_ids(self, entity_type: str) -> List[str]:
         xs = self.fetch_entity_summaries(entity_type=entity_type)
         return [x.id for x in xs]
 
+    def fetch_entity_ids_page(self, entity_type: str, offset: int,
+                              limit: int) -> List[str]:
+        """Fetch a page of the IDs of the entities of the given type.
+
+        Args:
+            entity_type: the type of the entities.
+            offset: how many entities to skip.
+            limit: how many IDs to fetch at most.
+
+        Returns:
+            The IDs in the page, empty if there are no entities past the
+            offset.
+        """
+        try:
+            xs = self._http.get_json('/v2/entities', {
+                'type': entity_type, 'offset': offset, 'limit': limit
+            })
+        except HTTPError as e:
+            if is_not_found(e):
+                return []
+            raise
+        return [x['entityId'] for x in xs]
+    # NOTE. QL returns a 404 rather than an empty list when there are no
+    # entities of the type, or none past the offset.
+
 
 class OrionSource:
 
+    PAGE_SIZE = 1000
+
     def __init__(self, app: Dash):
-        cfg = dazzler_config()
-        self._client = OrionClient(
-            base_url=URI(str(cfg.orion_base_url)),
-            ctx=fiware_context_for(app)
-        )
+        cfg = settings_for(app)
+        self._http = FiwareHttp(str(cfg.orion_base_url),
+                                fiware_context_for(app))
+
+    @staticmethod
+    def _entities_params(entity_type: str, attrs: Optional[List[str]],
+                         order_by: Optional[str]) -> dict:
+        return {
+            'type': entity_type, 'options': 'keyValues',
+            'attrs': ','.join(attrs) if attrs else None,
+            'orderBy': order_by
+        }
+
+    def fetch_entities(self, entity_type: str,
+                       attrs: Optional[List[str]] = None,
+                       order_by: Optional[str] = None) -> List[dict]:
+        """Fetch the current state of all the entities of the given type.
+
+        Args:
+            entity_type: the type of the entities to fetch.
+            attrs: which attributes to fetch, all of them if `None`.
+            order_by: Orion `orderBy` expression to sort the entities by,
+                e.g. `!dateModified` to get the most recently updated ones
+                first.
+
+        Returns:
+            The entities in key-value format. We fetch them a page of
+            `PAGE_SIZE` entities at a time until there are no more.
+        """
+        entities = []
+        params = self._entities_params(entity_type, attrs, order_by)
+        while True:
+            page = self._http.get_json('/v2/entities', {
+                **params, 'limit': self.PAGE_SIZE, 'offset': len(entities)
+            })
+            entities += page
+            if len(page) < self.PAGE_SIZE:
+                return entities
 
     def fetch_entity_ids(self, entity_type: str) -> List[str]:
-        return self._client.list_entity_ids(entity_type)
+        xs = self.fetch_entities(entity_type, attrs=['id'])
+        return [x['id'] for x in xs]
+
+    def fetch_entity_ids_page(self, entity_type: str, offset: int,
+                              limit: int) -> List[str]:
+        """Fetch a page of the IDs of the entities of the given type.
+
+        Args:
+            entity_type: the type of the entities.
+            offset: how many entities to skip, in creation order.
+            limit: how many IDs to fetch at most.
+
+        Returns:
+            The IDs in the page, empty if there are no entities past the
+            offset.
+        """
+        params = self._entities_params(entity_type, ['id'], None)
+        xs = self._http.get_json('/v2/entities', {
+            **params, 'limit': limit, 'offset': offset
+        })
+        return [x['id'] for x in xs]
+
+    def fetch_latest_entity(self, entity_type: str,
+                            attrs: Optional[List[str]] = None) \
+            -> Optional[dict]:
+        """Fetch the entity of the given type that got updated last.
+
+        Args:
+            entity_type: the type of the entity to fetch.
+            attrs: which attributes to fetch, all of them if `None`.
+
+        Returns:
+            The entity in key-value format---i.e. a dictionary with the
+            entity ID, type and attribute values---or `None` if there are
+            no entities of that type.
+        """
+        params = self._entities_params(entity_type, attrs, '!dateModified')
+        page = self._http.get_json('/v2/entities', {**params, 'limit': 1})
+        return page[0] if page else None
+    # NOTE. Latest values. Orion keeps the current state of each entity,
+    # so we can ask it to sort entities by modification time and return
+    # just the first one. That's a single small entity, whereas asking
+    # QL for the last entry of each entity of the type gets us a series
+    # for each entity.
 
     def fetch_entity(self, like: Entity) -> Optional[Entity]:
-        return self._client.fetch_entity(like)
+        try:
+            payload = self._http.get_json(
+                f"/v2/entities/{_path_segment(like.id)}", {'type': like.type}
+            )
+        except HTTPError as e:
+            if is_not_found(e):
+                return None
+            raise
+        return type(like).parse_obj(payload)
+
+
+class AsyncQuantumLeapSource:
+    """Async version of `QuantumLeapSource`.
+
+    Queries go through the same process-wide cache as the sync source's,
+    so sync and async sources share results. Use the `async_bridge` to
+    call these methods from Dash callbacks.
+    """
+
+    def __init__(self, app: Dash):
+        cfg = settings_for(app)
+        self._base_url = str(cfg.quantumleap_base_url)
+        self._ctx = fiware_context_for(app)
+        self._cache_settings = cfg.query_cache
+        self._http = AsyncFiwareHttp(self._base_url, self._ctx)
+
+    async def _cached(self, entity_type: str, query: Tuple,
+                      fetch: Callable[[], Awaitable[SeriesResult]]) -> Any:
+        key = _cache_key(self._base_url, self._ctx, query)
+        ttl = self._cache_settings.ttl_for(entity_type)
+        result = await query_cache().get_or_fetch_async(key, ttl, fetch)
+        return _copy_series(result)
+
+    async def fetch_entity_series(self,
+            entity_id: str, entity_type: str,
+            entries_from_latest: Optional[int] = None,
+            from_timepoint: Optional[datetime] = None,
+            to_timepoint: Optional[datetime] = None,
+            decoder: SeriesDecoder = series_frame,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) -> pd.DataFrame:
+        query = ('entity_series', entity_id, entity_type,
+                 entries_from_latest, from_timepoint, to_timepoint, decoder,
+                 _attrs_key(attrs), aggregation)
+        fetch = lambda: self._fetch_entity_series(
+            entity_id, entity_type,
+            entries_from_latest, from_timepoint, to_timepoint, decoder,
+            attrs, aggregation
+        )
+        return await self._cached(entity_type, query, fetch)
+
+    async def _fetch_entity_series(self,
+            entity_id: str, entity_type: str,
+            entries_from_latest: Optional[int],
+            from_timepoint: Optional[datetime],
+            to_timepoint: Optional[datetime],
+            decoder: SeriesDecoder,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) -> pd.DataFrame:
+        payload = await self._http.get_json(
+            f"/v2/entities/{_path_segment(entity_id)}",
+            _series_params(entity_type, entries_from_latest,
+                           from_timepoint, to_timepoint, attrs, aggregation)
+        )
+        return decoder(payload).set_index('index')
+
+    async def fetch_entity_type_series(self,
+            entity_type: str,
+            entries_from_latest: Optional[int] = None,
+            from_timepoint: Optional[datetime] = None,
+            to_timepoint: Optional[datetime] = None,
+            decoder: SeriesDecoder = series_frame,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) \
+            -> Dict[str, pd.DataFrame]:
+        query = ('entity_type_series', entity_type,
+                 entries_from_latest, from_timepoint, to_timepoint, decoder,
+                 _attrs_key(attrs), aggregation)
+        fetch = lambda: self._fetch_entity_type_series(
+            entity_type, entries_from_latest, from_timepoint, to_timepoint,
+            decoder, attrs, aggregation
+        )
+        return await self._cached(entity_type, query, fetch)
+
+    async def _fetch_entity_type_series(self,
+            entity_type: str,
+            entries_from_latest: Optional[int],
+            from_timepoint: Optional[datetime],
+            to_timepoint: Optional[datetime],
+            decoder: SeriesDecoder,
+            attrs: Attributes = None,
+            aggregation: Optional[Aggregation] = None) \
+            -> Dict[str, pd.DataFrame]:
+        payload = await self._http.get_json(
+            f"/v2/types/{_path_segment(entity_type)}",
+            _series_params(None, entries_from_latest,
+                           from_timepoint, to_timepoint, attrs, aggregation)
+        )
+        return entity_type_frames(payload, decoder)
+
+    async def fetch(self, query: SeriesQuery) -> SeriesResult:
+        """Run a series query.
+
+        Args:
+            query: what to fetch.
+
+        Returns:
+            A frame for an entity query, a frame for each entity ID for an
+            entity type query.
+        """
+        if query.entity_id is None:
+            return await self.fetch_entity_type_series(
+                entity_type=query.entity_type,
+                entries_from_latest=query.entries_from_latest,
+                from_timepoint=query.from_timepoint,
+                to_timepoint=query.to_timepoint,
+                decoder=query.decoder,
+                attrs=query.attrs,
+                aggregation=query.aggregation
+            )
+        return await self.fetch_entity_series(
+            entity_id=query.entity_id, entity_type=query.entity_type,
+            entries_from_latest=query.entries_from_latest,
+            from_timepoint=query.from_timepoint,
+            to_timepoint=query.to_timepoint,
+            decoder=query.decoder,
+            attrs=query.attrs,
+            aggregation=query.aggregation
+        )
+
+    async def fetch_batch(self, queries: List[SeriesQuery],
+                          return_exceptions: bool = False) \
+            -> List[BatchResult]:
+        """Run several series queries concurrently.
+
+        Args:
+            queries: what to fetch.
+            return_exceptions: same as in `QuantumLeapSource.fetch_batch`.
+
+        Returns:
+            The query results, in the same order as the queries.
+        """
+        fetches = [self.fetch(q) for q in queries]
+        results = await asyncio.gather(*fetches,
+                                       return_exceptions=return_exceptions)
+        return list(results)
+
+    async def fetch_entity_summaries(self,
+            entity_type: Optional[str] = None) -> List[BaseEntity]:
+        xs = await self._http.get_json('/v2/entities', {'type': entity_type})
+        return _entity_summaries(xs)
+
+    async def fetch_entity_ids(self, entity_type: str) -> List[str]:
+        xs = await self.fetch_entity_summaries(entity_type=entity_type)
+        return [x.id for x in xs]
+
+
+class AsyncOrionSource:
+    """Async version of `OrionSource`."""
+
+    PAGE_SIZE = OrionSource.PAGE_SIZE
+
+    def __init__(self, app: Dash):
+        cfg = settings_for(app)
+        self._http = AsyncFiwareHttp(str(cfg.orion_base_url),
+                                     fiware_context_for(app))
+
+    async def fetch_entity_ids(self, entity_type: str) -> List[str]:
+        ids = []
+        while True:
+            page = await self._http.get_json('/v2/entities', {
+                'type': entity_type, 'attrs': 'id', 'options': 'keyValues',
+                'limit': self.PAGE_SIZE, 'offset': len(ids)
+            })
+            ids += [x['id'] for x in page]
+            if len(page) < self.PAGE_SIZE:
+                return ids
+
+    async def fetch_entity(self, like: Entity) -> Optional[Entity]:
+        try:
+            payload = await self._http.get_json(
+                f"/v2/entities/{_path_segment(like.id)}", {'type': like.type}
+            )
+        except HTTPStatusError as e:
+            if is_not_found(e):
+                return None
+            raise
+        return type(like).parse_obj(payload)
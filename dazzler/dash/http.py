@@ -0,0 +1,356 @@
+"""
+Pooled HTTP connections to FIWARE backends.
+
+All the boards of all the tenants talk to the same handful of backends,
+so rather than having each data source open its own connections we keep
+one `requests.Session` for each backend base URL and share it among all
+the sources in the process. Only the FIWARE headers differ from source
+to source. Each session comes with a keep-alive connection pool, retries
+with exponential backoff and default timeouts, all configurable through
+`HttpSettings`.
+
+Async data sources get the same treatment: one `httpx.AsyncClient` for
+each backend base URL, except clients are bound to the event loop they
+run on, so each loop gets its own set of clients. On top of that, a
+semaphore caps how many requests an event loop may have in flight to
+the same backend at any one time.
+"""
+import asyncio
+import os
+from threading import Lock
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from fipy.ngsi.headers import FiwareContext
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dazzler.config import HttpSettings, dazzler_config
+from dazzler.dash.metrics import dazzler_metrics
+
+
+def is_not_found(e: Union[requests.HTTPError, httpx.HTTPStatusError]) \
+        -> bool:
+    """Did the backend respond with a 404?
+
+    Args:
+        e: the error raised when the response came back.
+
+    Returns:
+        `True` for yes, `False` for no.
+    """
+    return e.response is not None and e.response.status_code == 404
+
+
+def fiware_headers(ctx: FiwareContext) -> Dict[str, str]:
+    """Build the FIWARE multi-tenancy headers for the given context.
+
+    Args:
+        ctx: the FIWARE service and service path.
+
+    Returns:
+        The headers to send along with a request to a FIWARE backend.
+    """
+    headers = {}
+    if ctx.service:
+        headers['fiware-service'] = ctx.service
+    if ctx.service_path:
+        headers['fiware-servicepath'] = ctx.service_path
+    return headers
+
+
+class SessionPool:
+    """Registry of HTTP sessions, one for each backend base URL."""
+
+    def __init__(self, settings: HttpSettings):
+        self._settings = settings
+        self._lock = Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._pid = os.getpid()
+
+    def _retry(self) -> Retry:
+        return Retry(
+            total=self._settings.retries,
+            backoff_factor=self._settings.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+    # NOTE. Retries. We only retry idempotent requests and let the caller
+    # see the last response if all retries fail, so the usual HTTPError
+    # handling in the boards keeps on working.
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self._settings.pool_maxsize,
+                              max_retries=self._retry())
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self._settings.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def session_for(self, base_url: str) -> requests.Session:
+        """Get the session to talk to the backend at the given URL.
+
+        Args:
+            base_url: the backend's base URL.
+
+        Returns:
+            The session shared by all the sources talking to that backend.
+        """
+        key = base_url.rstrip('/')
+        self._after_fork()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session()
+                self._sessions[key] = session
+            return session
+
+    def _after_fork(self):
+        if self._pid == os.getpid():
+            return
+        self._lock = Lock()
+        self._sessions = {}
+        self._pid = os.getpid()
+    # NOTE. Forking. Boards assembled before the server forks its workers
+    # have already talked to the backends, so each child would inherit
+    # the parent's keep-alive sockets and several processes would end up
+    # reading and writing on the same connections. A child forgets the
+    # inherited sessions, without closing them, since that would close
+    # the connections of the parent too, and starts its own. Ditto for
+    # the lock, which could've been held at fork time.
+
+    def timeout(self) -> tuple:
+        return self._settings.connect_timeout, self._settings.read_timeout
+
+
+_session_pool: Optional[SessionPool] = None
+_session_pool_lock = Lock()
+
+
+def http_sessions() -> SessionPool:
+    """Get the process-wide session registry, creating it from the Dazzler
+    settings on first use.
+
+    Returns:
+        The registry shared by all the data sources.
+    """
+    global _session_pool
+    with _session_pool_lock:
+        if _session_pool is None:
+            _session_pool = SessionPool(dazzler_config().http)
+        return _session_pool
+
+
+def _observe(base_url: str, tenant: str, rel_path: str, started: float,
+             response: Union[requests.Response, httpx.Response, None] = None):
+    elapsed = time.perf_counter() - started
+    if response is None:
+        dazzler_metrics().observe_backend(base_url, tenant, rel_path,
+                                          elapsed, status='connection')
+        return
+    failed = response.status_code >= 400
+    dazzler_metrics().observe_backend(
+        base_url, tenant, rel_path, elapsed, size=len(response.content),
+        status=str(response.status_code) if failed else None
+    )
+
+
+class FiwareHttp:
+    """Sends requests to a FIWARE backend on behalf of a tenant, using the
+    session shared by all the sources talking to that backend.
+    """
+
+    def __init__(self, base_url: str, ctx: FiwareContext):
+        """Create a new instance.
+
+        Args:
+            base_url: the backend's base URL.
+            ctx: the tenant's FIWARE service and service path.
+        """
+        self._base_url = base_url.rstrip('/')
+        self._tenant = ctx.service
+        self._headers = fiware_headers(ctx)
+        self._pool = http_sessions()
+
+    def get(self, rel_path: str,
+            params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """GET a resource from the backend.
+
+        Args:
+            rel_path: the path of the resource relative to the base URL.
+            params: optional query parameters. Parameters whose value is
+                `None` don't get sent.
+
+        Returns:
+            The backend's response.
+
+        Raises:
+            HTTPError: if the backend responded with an error status.
+        """
+        query = {k: v for (k, v) in (params or {}).items() if v is not None}
+        started = time.perf_counter()
+        try:
+            session = self._pool.session_for(self._base_url)
+            response = session.get(f"{self._base_url}{rel_path}",
+                                   params=query, headers=self._headers,
+                                   timeout=self._pool.timeout())
+        except requests.RequestException:
+            _observe(self._base_url, self._tenant, rel_path, started)
+            raise
+        _observe(self._base_url, self._tenant, rel_path, started, response)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, rel_path: str,
+                 params: Optional[Dict[str, Any]] = None) -> Any:
+        """Same as `get` but return the parsed JSON response body."""
+        return self.get(rel_path, params).json()
+
+
+class AsyncClientPool:
+    """Registry of async HTTP clients, one for each backend base URL, all
+    bound to the same event loop.
+    """
+
+    def __init__(self, settings: HttpSettings):
+        self._settings = settings
+        self._clients: Dict[str, Tuple[httpx.AsyncClient,
+                                       asyncio.Semaphore]] = {}
+
+    def _new_client(self) -> httpx.AsyncClient:
+        cfg = self._settings
+        keep_alive = cfg.pool_maxsize if cfg.keep_alive else 0
+        limits = httpx.Limits(max_connections=cfg.pool_maxsize,
+                              max_keepalive_connections=keep_alive)
+        timeout = httpx.Timeout(cfg.read_timeout,
+                                connect=cfg.connect_timeout)
+        transport = httpx.AsyncHTTPTransport(retries=cfg.retries,
+                                             limits=limits)
+        return httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    def client_for(self, base_url: str) \
+            -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Get the client to talk to the backend at the given URL.
+
+        Args:
+            base_url: the backend's base URL.
+
+        Returns:
+            The client shared by all the async sources running on this
+            loop and talking to that backend, along with the semaphore
+            that limits how many requests they may send concurrently.
+        """
+        key = base_url.rstrip('/')
+        entry = self._clients.get(key)
+        if entry is None:
+            entry = (self._new_client(),
+                     asyncio.Semaphore(self._settings.max_concurrency))
+            self._clients[key] = entry
+        return entry
+    # NOTE. Thread safety. There's one pool for each event loop and only
+    # the loop's thread ever touches it, so no need for locking. For the
+    # same reason, we create the semaphores lazily, from within the loop.
+
+    async def aclose(self):
+        """Close all the clients in the pool."""
+        clients = [client for (client, _) in self._clients.values()]
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+_async_pools: 'WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClientPool]' \
+    = WeakKeyDictionary()
+_async_pools_lock = Lock()
+
+
+def async_http_clients() -> AsyncClientPool:
+    """Get the client registry of the running event loop, creating it from
+    the Dazzler settings on first use. Must be called from a coroutine.
+
+    Returns:
+        The registry shared by all the async data sources on this loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_pools_lock:
+        pool = _async_pools.get(loop)
+        if pool is None:
+            pool = AsyncClientPool(dazzler_config().http)
+            _async_pools[loop] = pool
+        return pool
+
+
+def reset_http_sessions():
+    """Drop the process-wide session registry and the client registries
+    of all event loops, so they get created again from the current
+    Dazzler settings on next use.
+    """
+    global _session_pool
+    with _session_pool_lock:
+        _session_pool = None
+    with _async_pools_lock:
+        _async_pools.clear()
+# NOTE. Old connections. We don't close the sessions and clients we drop
+# since requests may still be using them. They close their connections
+# when they get garbage collected.
+
+
+class AsyncFiwareHttp:
+    """Async version of `FiwareHttp`."""
+
+    def __init__(self, base_url: str, ctx: FiwareContext):
+        """Create a new instance.
+
+        Args:
+            base_url: the backend's base URL.
+            ctx: the tenant's FIWARE service and service path.
+        """
+        self._base_url = base_url.rstrip('/')
+        self._tenant = ctx.service
+        self._headers = fiware_headers(ctx)
+
+    async def get(self, rel_path: str,
+                  params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """GET a resource from the backend.
+
+        Args:
+            rel_path: the path of the resource relative to the base URL.
+            params: optional query parameters. Parameters whose value is
+                `None` don't get sent.
+
+        Returns:
+            The backend's response.
+
+        Raises:
+            HTTPStatusError: if the backend responded with an error status.
+        """
+        client, limit = async_http_clients().client_for(self._base_url)
+        query = {k: v for (k, v) in (params or {}).items() if v is not None}
+        async with limit:
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"{self._base_url}{rel_path}",
+                                            params=query,
+                                            headers=self._headers)
+            except httpx.TransportError:
+                _observe(self._base_url, self._tenant, rel_path, started)
+                raise
+        _observe(self._base_url, self._tenant, rel_path, started, response)
+        response.raise_for_status()
+        return response
+    # NOTE. Timing. We start the clock once the semaphore lets the request
+    # through, so the latency we record is the backend's, not the time the
+    # request spent queueing up on our side.
+
+    async def get_json(self, rel_path: str,
+                       params: Optional[Dict[str, Any]] = None) -> Any:
+        """Same as `get` but return the parsed JSON response body."""
+        response = await self.get(rel_path, params)
+        return response.json()
@@ -0,0 +1,172 @@
+"""
+Images boards render on the server and browsers fetch over HTTP.
+
+Rather than inlining rendered images in callback responses as base64
+data URIs, boards put them in the image store and hand the browser the
+image URL. Images are addressed by a digest of their content, so a URL
+always points to the same bytes and browsers can cache images forever:
+a board that keeps on showing the same image costs nothing after the
+first download.
+
+With several worker processes, the browser's request for an image may
+land on a worker other than the one that rendered it. So workers share
+their images through the same shared store as the query cache, if the
+query cache settings ask for one.
+
+The FastAPI endpoint that serves the images lives in `dazzler.main`,
+the store it reads from lives here.
+"""
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+from typing import Optional
+
+from dazzler.config import dazzler_config
+from dazzler.dash.sharedcache import SharedStore, shared_store
+
+
+IMAGES_PATH = '/dazzler/-/images'
+"""URL path under which the image store content gets served."""
+
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+"""Cache directive for browsers. Images never change, so cache them for
+as long as possible and never revalidate.
+"""
+
+SHARED_IMAGE_TTL = 24 * 60 * 60
+"""How long, in seconds, images stay in the shared store."""
+
+
+def content_digest(content: bytes) -> str:
+    """Compute the digest we use to address an image.
+
+    Args:
+        content: the image bytes.
+
+    Returns:
+        A hex digest of the content.
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def image_url(digest: str) -> str:
+    """Build the URL browsers can fetch an image from.
+
+    Args:
+        digest: the image's content digest.
+
+    Returns:
+        The image URL path.
+    """
+    return f"{IMAGES_PATH}/{digest}.jpg"
+
+
+def etag_for(digest: str) -> str:
+    return f'"{digest}"'
+
+
+class ImageStore:
+    """Bounded, thread-safe store of JPEG images, keyed on content digest.
+
+    The least recently stored or touched image goes when going over
+    `max_entries`. Boards should `put` the images they hand out on every
+    refresh, even if they've put them before, to keep them from getting
+    evicted while browsers still need them. With a shared store, images
+    we haven't got get looked up there and new images go there too.
+    """
+
+    def __init__(self, max_entries: int = 1024,
+                 shared: Optional[SharedStore] = None):
+        self._max_entries = max_entries
+        self._shared = shared
+        self._lock = Lock()
+        self._images: 'OrderedDict[str, bytes]' = OrderedDict()
+
+    @staticmethod
+    def _shared_key(digest: str) -> str:
+        return f"image-{digest}"
+
+    def _add(self, digest: str, content: bytes) -> bool:
+        with self._lock:
+            if digest in self._images:
+                self._images.move_to_end(digest)
+                return False
+            self._images[digest] = content
+            while len(self._images) > self._max_entries:
+                self._images.popitem(last=False)
+            return True
+
+    def put(self, content: bytes, digest: Optional[str] = None) -> str:
+        """Add an image to the store, if not there already.
+
+        Args:
+            content: the JPEG bytes.
+            digest: the content digest, if the caller has it already.
+
+        Returns:
+            The image URL.
+        """
+        digest = digest or content_digest(content)
+        if self._add(digest, content) and self._shared is not None:
+            try:
+                self._shared.put(self._shared_key(digest), content,
+                                 SHARED_IMAGE_TTL)
+            except Exception as e:
+                print(f"Shared image store update failed: {e}")
+        return image_url(digest)
+    # NOTE. Shared puts. We only copy an image to the shared store the
+    # first time it gets put in here, since boards put the same images on
+    # every refresh. Images big enough to go over the shared store budget
+    # don't make it there, so other workers answer 404 for those.
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Look up an image.
+
+        Args:
+            digest: the image's content digest.
+
+        Returns:
+            The JPEG bytes or `None` if there's no such image.
+        """
+        with self._lock:
+            content = self._images.get(digest)
+        if content is not None or self._shared is None:
+            return content
+
+        try:
+            found = self._shared.get(self._shared_key(digest))
+        except Exception as e:
+            print(f"Shared image store lookup failed: {e}")
+            return None
+        if found is None:
+            return None
+        content, _ = found
+        self._add(digest, content)
+        return content
+
+
+_image_store: Optional[ImageStore] = None
+_image_store_lock = Lock()
+
+
+def image_store() -> ImageStore:
+    """Get the process-wide image store, creating it on first use.
+
+    Returns:
+        The store shared by all the boards and the images endpoint.
+    """
+    global _image_store
+    with _image_store_lock:
+        if _image_store is None:
+            cfg = dazzler_config().query_cache
+            _image_store = ImageStore(shared=shared_store(cfg))
+        return _image_store
+
+
+def reset_image_store():
+    """Drop the process-wide image store, so the next `image_store` call
+    creates a new one from the current Dazzler settings.
+    """
+    global _image_store
+    with _image_store_lock:
+        _image_store = None
@@ -0,0 +1,382 @@
+"""
+Latency, payload and error metrics in the Prometheus text format.
+
+When a board is slow, we'd like to know whether it's the board's own
+callbacks or the backend queries they run. So we time every Dash
+callback request of every board, labelled by tenant, service path and
+board, as well as every request to a FIWARE backend, labelled by backend,
+tenant and endpoint, and count what fails. The query cache counters go
+along with them. Dazzler serves all of it at `/metrics`, in the text
+exposition format Prometheus scrapes:
+
+- https://prometheus.io/docs/instrumenting/exposition_formats/
+
+We keep our own tiny registry rather than pulling in a client library
+since all we need is counters, histograms and rendering them as text.
+"""
+from bisect import bisect_left
+import math
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from dash import Dash
+from flask import g, request
+
+from dazzler.config import MetricsSettings, dazzler_config
+from dazzler.dash.cache import CacheStats
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216)
+"""Upper bounds, in bytes, of the payload size histogram buckets."""
+
+LabelValues = Tuple[str, ...]
+
+
+def _escaped(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = [f'{n}="{_escaped(str(v))}"' for (n, v) in zip(names, values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A running total for each combination of label values."""
+
+    def __init__(self, name: str, description: str,
+                 labelnames: Sequence[str]):
+        self.name = name
+        self._description = description
+        self._labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def exposition(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self._description}",
+                 f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self._labelnames, ls)} {_number(v)}"
+                  for (ls, v) in values]
+        return lines
+
+
+class Gauge:
+    """The latest value set for each combination of label values."""
+
+    def __init__(self, name: str, description: str,
+                 labelnames: Sequence[str]):
+        self.name = name
+        self._description = description
+        self._labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels: str) -> Optional[float]:
+        with self._lock:
+            return self._values.get(labels)
+
+    def exposition(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self._description}",
+                 f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_labels(self._labelnames, ls)} {_number(v)}"
+                  for (ls, v) in values]
+        return lines
+
+
+class Histogram:
+    """Counts observations in buckets for each combination of label
+    values, along with their sum.
+    """
+
+    def __init__(self, name: str, description: str,
+                 labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self._description = description
+        self._labelnames = tuple(labelnames)
+        self._bounds = sorted(buckets) + [math.inf]
+        self._lock = Lock()
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        slot = bisect_left(self._bounds, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                labels, ([0] * len(self._bounds), [0.0])
+            )
+            counts[slot] += 1
+            total[0] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(labels, ([0], [0.0]))
+            return sum(counts)
+
+    def exposition(self) -> List[str]:
+        with self._lock:
+            values = [(ls, list(counts), total[0])
+                      for (ls, (counts, total)) in self._values.items()]
+        lines = [f"# HELP {self.name} {self._description}",
+                 f"# TYPE {self.name} histogram"]
+        names = self._labelnames + ('le',)
+        for (ls, counts, total) in values:
+            cumulative = 0
+            for (bound, count) in zip(self._bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket"
+                             f"{_labels(names, ls + (_number(bound),))} "
+                             f"{cumulative}")
+            labels = _labels(self._labelnames, ls)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+    # NOTE. Buckets. Each observation goes in the first bucket whose upper
+    # bound is at least as big, then we add up the counts when rendering
+    # since Prometheus buckets are cumulative.
+
+
+class CacheCollector:
+    """Renders the counters of a cache, as of the time of the scrape."""
+
+    COUNTERS = ('hits', 'misses', 'coalesced', 'shared_hits', 'evictions',
+                'expirations')
+    GAUGES = ('entries', 'size_bytes', 'max_bytes')
+
+    def __init__(self, prefix: str, stats: Callable[[], CacheStats]):
+        self._prefix = prefix
+        self._stats = stats
+
+    def exposition(self) -> List[str]:
+        stats = self._stats()
+        lines = []
+        for field in self.COUNTERS:
+            name = f"{self._prefix}_{field}_total"
+            lines += [f"# TYPE {name} counter",
+                      f"{name} {getattr(stats, field)}"]
+        for field in self.GAUGES:
+            name = f"{self._prefix}_{field}"
+            lines += [f"# TYPE {name} gauge",
+                      f"{name} {getattr(stats, field)}"]
+        return lines
+
+
+class MetricsRegistry:
+    """Keeps the metrics to render, in the order they got registered."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._collectors: List = []
+
+    def register(self, collector):
+        """Add a metric or anything else with an `exposition` method
+        returning the lines to render.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def counter(self, name: str, description: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str,
+                  labelnames: Sequence[str],
+                  buckets: Sequence[float]) -> Histogram:
+        return self.register(Histogram(name, description, labelnames,
+                                       buckets))
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text format."""
+        with self._lock:
+            collectors = list(self._collectors)
+        lines = []
+        for collector in collectors:
+            lines += collector.exposition()
+        return '\n'.join(lines) + '\n'
+
+
+ASSEMBLY_LABELS = ('tenant', 'service_path', 'board')
+BOARD_LABELS = ASSEMBLY_LABELS + ('callback',)
+BACKEND_LABELS = ('backend', 'tenant', 'endpoint')
+
+
+class DazzlerMetrics:
+    """The metrics Dazzler collects about its boards and backends."""
+
+    def __init__(self, settings: MetricsSettings):
+        self.enabled = settings.enabled
+        self.registry = MetricsRegistry()
+        r = self.registry
+        self.callback_seconds = r.histogram(
+            'dazzler_callback_seconds', 'Time to run a board callback.',
+            BOARD_LABELS, settings.latency_buckets
+        )
+        self.callback_errors = r.counter(
+            'dazzler_callback_errors_total', 'Board callbacks that failed.',
+            BOARD_LABELS
+        )
+        self.board_assembly_seconds = r.gauge(
+            'dazzler_board_assembly_seconds',
+            'Time it took to assemble a board the last time.',
+            ASSEMBLY_LABELS
+        )
+        self.backend_seconds = r.histogram(
+            'dazzler_backend_request_seconds',
+            'Time to get a response from a FIWARE backend.',
+            BACKEND_LABELS, settings.latency_buckets
+        )
+        self.backend_bytes = r.histogram(
+            'dazzler_backend_response_bytes',
+            'Size of FIWARE backend response bodies.',
+            BACKEND_LABELS, SIZE_BUCKETS
+        )
+        self.backend_errors = r.counter(
+            'dazzler_backend_errors_total',
+            'FIWARE backend requests that failed, by HTTP status or '
+            '"connection" if there was no response.',
+            BACKEND_LABELS + ('status',)
+        )
+
+    def observe_backend(self, backend: str, tenant: str, rel_path: str,
+                        seconds: float, size: Optional[int] = None,
+                        status: Optional[str] = None):
+        """Record a backend request.
+
+        Args:
+            backend: the backend's base URL.
+            tenant: the FIWARE service the request was for.
+            rel_path: the path of the resource relative to the base URL.
+            seconds: how long it took to get a response, or to fail.
+            size: how many bytes the response body had, if we got one.
+            status: what went wrong, `None` if nothing did.
+        """
+        if not self.enabled:
+            return
+        labels = (backend, tenant or '', endpoint_of(rel_path))
+        self.backend_seconds.observe(seconds, *labels)
+        if size is not None:
+            self.backend_bytes.observe(size, *labels)
+        if status is not None:
+            self.backend_errors.inc(*labels, status)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+def endpoint_of(rel_path: str) -> str:
+    """Collapse a backend resource path to the endpoint it belongs to.
+
+    Entity IDs and types make for too many label values, so we replace
+    anything past the collection with a placeholder, e.g.
+    `/v2/entities/urn:x:1` becomes `/v2/entities/{id}`.
+
+    Args:
+        rel_path: the path of the resource relative to the base URL.
+
+    Returns:
+        The endpoint.
+    """
+    segments = rel_path.strip('/').split('/')
+    if len(segments) <= 2:
+        return '/' + '/'.join(segments)
+    return '/' + '/'.join(segments[:2]) + '/{id}'
+
+
+DASH_UPDATE_PATH = '/_dash-update-component'
+
+UNKNOWN_CALLBACK = 'unknown'
+"""The callback label of requests for outputs the board doesn't have."""
+
+
+def instrument_board(app: Dash, tenant: str, service_path: str,
+                     board: str):
+    """Time the Dash callbacks of a board and count their failures.
+
+    Args:
+        app: the board's Dash app.
+        tenant: the tenant the board is for.
+        service_path: the board's service path.
+        board: the board's path.
+    """
+    metrics = dazzler_metrics()
+    if not metrics.enabled:
+        return
+
+    server = app.server
+
+    @server.before_request
+    def start_timer():
+        if request.path.endswith(DASH_UPDATE_PATH):
+            g.dazzler_callback_started = time.perf_counter()
+
+    @server.teardown_request
+    def observe_callback(error: Optional[BaseException]):
+        started = g.pop('dazzler_callback_started', None)
+        if started is None:
+            return
+        body = request.get_json(silent=True) or {}
+        output = body.get('output')
+        if not isinstance(output, str) or output not in app.callback_map:
+            output = UNKNOWN_CALLBACK
+        labels = (tenant, service_path, board, output)
+        metrics.callback_seconds.observe(time.perf_counter() - started,
+                                         *labels)
+        if error is not None:
+            metrics.callback_errors.inc(*labels)
+# NOTE. Callback labels. Dash sends all callbacks to the same endpoint,
+# so we tell them apart by the outputs in the request body, e.g.
+# `graph.figure`, which Dash uses as the callback ID too. Anyone can post
+# whatever outputs they like though, so we only use the outputs of the
+# board's own callbacks as label values, to keep the number of series
+# bounded. Flask runs the teardown function even if the callback raised,
+# in which case it hands it the exception.
+
+
+_dazzler_metrics: Optional[DazzlerMetrics] = None
+_dazzler_metrics_lock = Lock()
+
+
+def dazzler_metrics() -> DazzlerMetrics:
+    """Get the process-wide metrics, creating them from the Dazzler
+    settings on first use.
+
+    Returns:
+        The metrics shared by all the boards and data sources.
+    """
+    global _dazzler_metrics
+    with _dazzler_metrics_lock:
+        if _dazzler_metrics is None:
+            _dazzler_metrics = DazzlerMetrics(dazzler_config().metrics)
+        return _dazzler_metrics
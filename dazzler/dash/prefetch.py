@@ -0,0 +1,410 @@
+"""
+Background prefetching of the entity series boards share.
+
+Several boards plot the recent series of all the entities of a type,
+e.g. both FAMS boards show the fatigue of all the Workers. Each open
+browser tab refreshes on its own timer and, with the query cache only
+holding results for a couple of seconds, the backend load grows with the
+number of viewers. So boards register the series they need with the
+prefetch scheduler instead. For each tenant and entity type, the
+scheduler runs one Quantum Leap query per period, on a background thread
+of the tenant's own, covering the widest time window any board asked
+for. Board callbacks read their window out of the latest result held in
+memory, so the backend sees the same query rate regardless of how many
+people are looking at the boards.
+"""
+from datetime import timedelta
+import math
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Optional, Tuple
+
+from dash import Dash
+import pandas as pd
+
+from dazzler.config import PrefetchSettings, dazzler_config
+from dazzler.dash.fiware import Attributes, QuantumLeapSource, \
+    SeriesDecoder, fiware_context_for, series_frame
+from dazzler.dash.wiring import settings_for
+
+
+TenantKey = Tuple[str, str, str]
+"""Identifies a tenant's backend: QL URL, tenant and service path."""
+
+JobKey = Tuple[str, SeriesDecoder, Optional[Tuple[str, ...]]]
+"""Identifies a tenant's job: entity type, series decoder and attributes.
+"""
+
+SeriesFrames = Dict[str, pd.DataFrame]
+"""The series of all the entities of a type, keyed on entity ID."""
+
+
+class PrefetchJob:
+    """Recurring query for the series of all the entities of a type.
+
+    The job's window and period adapt to the boards that read it: the
+    query covers the widest window and runs as often as the shortest
+    period any of them registered.
+    """
+
+    def __init__(self, fetch: Callable[[timedelta], SeriesFrames],
+                 clock: Callable[[], float] = time.monotonic):
+        """Create a new instance.
+
+        Args:
+            fetch: runs the query for the given window, counting back
+                from the current time.
+            clock: monotonic time source, in seconds.
+        """
+        self._fetch = fetch
+        self._clock = clock
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._frames: Optional[SeriesFrames] = None
+        self.window = timedelta(0)
+        self.period = math.inf
+        self.fetched_at: Optional[float] = None
+        self.read_at = clock()
+
+    def widen(self, window: timedelta, period: float):
+        with self._lock:
+            self.window = max(self.window, window)
+            self.period = min(self.period, period)
+
+    def due(self, now: float) -> bool:
+        return self.fetched_at is None or now - self.fetched_at >= self.period
+
+    def next_due(self) -> float:
+        if self.fetched_at is None:
+            return -math.inf
+        return self.fetched_at + self.period
+
+    def _load(self):
+        frames = self._fetch(self.window)
+        with self._lock:
+            self._frames = frames
+            self.fetched_at = self._clock()
+
+    def run(self):
+        """Run the query and replace the job's result with the new one.
+
+        Raises:
+            Exception: whatever the query raised, in which case the job
+                keeps its previous result.
+        """
+        with self._load_lock:
+            self._load()
+
+    def read(self, window: timedelta) -> SeriesFrames:
+        """Get the entity series in the given window.
+
+        Args:
+            window: how far back from now to go.
+
+        Returns:
+            A copy of the rows in the window of each series, keyed on
+            entity ID. Entities without rows in the window are left out.
+        """
+        with self._lock:
+            self.read_at = self._clock()
+            frames = self._frames
+        if frames is None:
+            with self._load_lock:
+                if self._frames is None:
+                    self._load()
+                frames = self._frames
+
+        since = pd.Timestamp.now('utc') - window
+        windows = {entity_id: frame[frame['index'] >= since]
+                   for (entity_id, frame) in frames.items()}
+        return {entity_id: frame.copy()
+                for (entity_id, frame) in windows.items() if not frame.empty}
+    # NOTE. First read. A board may read a job before the tenant's thread
+    # got around to running it. In that case the reader runs the query,
+    # while other readers wait for it rather than running it too.
+
+
+class TenantPrefetch:
+    """Runs the prefetch jobs of a tenant on a daemon thread.
+
+    The thread starts with the tenant's first job and wakes up whenever
+    the next job is due. Jobs nobody read in the last `idle_expiry`
+    seconds get dropped. If the process forks, the child starts a thread
+    of its own the next time it gets a job since threads don't survive
+    a fork. Pausing stops the thread until the next job comes along,
+    which is what you want to do before forking.
+    """
+
+    def __init__(self, name: str, idle_expiry: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self._name = name
+        self._idle_expiry = idle_expiry
+        self._clock = clock
+        self._lock = Lock()
+        self._jobs: Dict[JobKey, PrefetchJob] = {}
+        self._wakeup = Event()
+        self._stopped = False
+        self._pid: Optional[int] = None
+        self._running: Optional[Tuple[Thread, Event]] = None
+
+    def _ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        halt = Event()
+        thread = Thread(target=self._run, args=(halt,), daemon=True,
+                        name=f"dazzler-prefetch-{self._name}")
+        self._running = (thread, halt)
+        thread.start()
+
+    def _run(self, halt: Event):
+        while not (self._stopped or halt.is_set()):
+            self._wakeup.wait(self.run_due())
+            self._wakeup.clear()
+
+    def job(self, key: JobKey, fetch: Callable[[timedelta], SeriesFrames],
+            window: timedelta, period: float) -> PrefetchJob:
+        """Get the job with the given key, creating it if needed, and make
+        sure it covers the given window and period.
+
+        Args:
+            key: identifies the job.
+            fetch: runs the job's query, in case we've got to create it.
+            window: the time window the caller needs.
+            period: how often, in seconds, the caller needs fresh data.
+
+        Returns:
+            The job.
+        """
+        with self._lock:
+            self._ensure_running()
+            job = self._jobs.get(key)
+            if job is None:
+                job = PrefetchJob(fetch, self._clock)
+                self._jobs[key] = job
+            widened = window > job.window or period < job.period
+            if widened:
+                job.widen(window, period)
+        if widened:
+            self._wakeup.set()
+        return job
+    # NOTE. Wider windows. If the job now covers a wider window, it only
+    # gets the new data on its next run, so readers asking for more than
+    # what the job used to cover may get a partial window until then.
+
+    def run_due(self) -> float:
+        """Drop idle jobs and run the jobs that are due.
+
+        A failed run leaves the job's result as it was and gets retried
+        on the next period.
+
+        Returns:
+            How many seconds until the next job is due.
+        """
+        now = self._clock()
+        with self._lock:
+            for key in [k for (k, j) in self._jobs.items()
+                        if now - j.read_at > self._idle_expiry]:
+                del self._jobs[key]
+            jobs = list(self._jobs.values())
+
+        for job in jobs:
+            if not job.due(now):
+                continue
+            try:
+                job.run()
+            except Exception as e:
+                job.fetched_at = self._clock()
+                print(f"Prefetch of {self._name} failed: {e}")
+
+        if not jobs:
+            return self._idle_expiry
+        return max(0.0, min(j.next_due() for j in jobs) - self._clock())
+
+    def pause(self):
+        """Stop the tenant's thread and wait for it to exit.
+
+        The jobs stay as they are and the next `job` call starts a new
+        thread to run them.
+        """
+        with self._lock:
+            running = self._running
+            self._running = None
+            self._pid = None
+        if running is None:
+            return
+        (thread, halt) = running
+        halt.set()
+        self._wakeup.set()
+        if thread.is_alive():
+            thread.join()
+    # NOTE. Forking. Once paused, no thread of ours holds the tenant's
+    # locks, a job's locks or the query cache's, so a forked child can't
+    # inherit them locked and hang on its first job.
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+
+class Prefetch:
+    """A board's handle on a prefetched entity series.
+
+    Boards create it once and read it on every refresh.
+    """
+
+    def __init__(self, scheduler: 'PrefetchScheduler', app: Dash,
+                 entity_type: str, window: timedelta, period: float,
+                 decoder: SeriesDecoder, attrs: Attributes):
+        self._scheduler = scheduler
+        self._app = app
+        self._source = QuantumLeapSource(app)
+        self._entity_type = entity_type
+        self._window = window
+        self._period = period
+        self._decoder = decoder
+        self._attrs = attrs
+
+    def _fetch(self, window: timedelta) -> SeriesFrames:
+        to_ = pd.Timestamp.now('utc')
+        return self._source.fetch_entity_type_series(
+            self._entity_type, from_timepoint=to_ - window, to_timepoint=to_,
+            decoder=self._decoder, attrs=self._attrs, cached=False
+        )
+    # NOTE. Query cache. Each run queries a different time window, so
+    # caching the result would only fill up the query cache with entries
+    # nobody ever looks up again. The job holds on to the result anyway.
+
+    def frames(self) -> SeriesFrames:
+        """Get the series of all the entities of the type in the board's
+        window.
+
+        Returns:
+            A frame, as built by the decoder, for each entity ID with data
+            in the window. Each caller gets its own copy.
+
+        Raises:
+            Exception: whatever the query raised if we had to run it to
+                serve this call.
+        """
+        key = (self._entity_type, self._decoder,
+               tuple(self._attrs) if self._attrs else None)
+        job = self._scheduler.job(self._app, key, self._fetch,
+                                  self._window, self._period)
+        return job.read(self._window)
+    # NOTE. Expired jobs. We look up the job on every read, rather than
+    # holding on to it, since the tenant drops jobs that sat idle for a
+    # while. If that happens, the read creates the job again.
+
+
+class PrefetchScheduler:
+    """Keeps the prefetch jobs of all the tenants."""
+
+    def __init__(self, settings: PrefetchSettings,
+                 clock: Callable[[], float] = time.monotonic):
+        self._idle_expiry = settings.idle_expiry
+        self._clock = clock
+        self._lock = Lock()
+        self._tenants: Dict[TenantKey, TenantPrefetch] = {}
+
+    def _tenant(self, app: Dash) -> TenantPrefetch:
+        ctx = fiware_context_for(app)
+        key = (str(settings_for(app).quantumleap_base_url),
+               ctx.service, ctx.service_path)
+        with self._lock:
+            tenant = self._tenants.get(key)
+            if tenant is None:
+                tenant = TenantPrefetch(f"{ctx.service}{ctx.service_path}",
+                                        self._idle_expiry, self._clock)
+                self._tenants[key] = tenant
+            return tenant
+
+    def job(self, app: Dash, key: JobKey,
+            fetch: Callable[[timedelta], SeriesFrames],
+            window: timedelta, period: float) -> PrefetchJob:
+        return self._tenant(app).job(key, fetch, window, period)
+
+    def register(self, app: Dash, entity_type: str, window: timedelta,
+                 period: float, decoder: SeriesDecoder = series_frame,
+                 attrs: Attributes = None) -> Prefetch:
+        """Register a recurring query for the series of all the entities
+        of a type.
+
+        Args:
+            app: the Dash app of the board. The query runs against the
+                board's tenant and service path.
+            entity_type: the type of the entities to fetch.
+            window: how far back from now the board wants data.
+            period: how often, in seconds, the board wants fresh data.
+                Usually its refresh interval.
+            decoder: how to convert the QL series to frames.
+            attrs: which attributes to fetch, all of them if `None`.
+
+        Returns:
+            The handle the board reads the series with.
+        """
+        return Prefetch(self, app, entity_type, window, period, decoder,
+                        attrs)
+    # NOTE. Lazy jobs. Registering doesn't query anything, the query only
+    # starts running the first time a board reads it and stops once no
+    # board read it for `idle_expiry` seconds. Boards that read it to lay
+    # out their first view, like the FAMS ones, read it when they get
+    # assembled though, which is at startup unless `lazy_boards` is on.
+    # So at worst a board nobody opens keeps the query running until it
+    # expires.
+
+    def pause(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+        for tenant in tenants:
+            tenant.pause()
+
+    def stop(self):
+        with self._lock:
+            for tenant in self._tenants.values():
+                tenant.stop()
+
+
+_prefetch_scheduler: Optional[PrefetchScheduler] = None
+_prefetch_scheduler_lock = Lock()
+
+
+def prefetch_scheduler() -> PrefetchScheduler:
+    """Get the process-wide prefetch scheduler, creating it from the
+    Dazzler settings on first use.
+
+    Returns:
+        The scheduler shared by all the boards.
+    """
+    global _prefetch_scheduler
+    with _prefetch_scheduler_lock:
+        if _prefetch_scheduler is None:
+            _prefetch_scheduler = PrefetchScheduler(dazzler_config().prefetch)
+        return _prefetch_scheduler
+
+
+def reset_prefetch_scheduler():
+    """Stop the process-wide prefetch scheduler and drop it, so the next
+    `prefetch_scheduler` call creates a new one from the current Dazzler
+    settings.
+    """
+    global _prefetch_scheduler
+    with _prefetch_scheduler_lock:
+        if _prefetch_scheduler is not None:
+            _prefetch_scheduler.stop()
+        _prefetch_scheduler = None
+
+
+def pause_prefetch_scheduler():
+    """Stop the threads of the process-wide prefetch scheduler, if any,
+    and wait for them to exit. They start again on the next board read.
+    """
+    with _prefetch_scheduler_lock:
+        scheduler = _prefetch_scheduler
+    if scheduler is not None:
+        scheduler.pause()
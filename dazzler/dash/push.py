@@ -0,0 +1,380 @@
+"""
+Server push of entity updates to live boards.
+
+Live boards normally refresh on a `dcc.Interval` timer, so every open
+browser tab polls Dazzler which in turn polls the backend. In push mode,
+Dazzler subscribes to Orion once for each tenant, service path and entity
+type a board displays. Orion notifies Dazzler whenever a matching entity
+changes and Dazzler fans the notification out to the browsers watching
+that entity type over Server-Sent Events (SSE). On the browser side, a
+small script (`assets/push.js`) listens to the SSE stream and clicks a
+hidden button to trigger the board callbacks that used to hang off the
+interval timer. It clicks once more a little later, in case the browser
+asked for the new data before it got to Quantum Leap.
+
+The FastAPI endpoints that receive Orion notifications and stream SSE
+events live in `dazzler.main`, the plumbing they rely on lives here.
+"""
+import asyncio
+import json
+from threading import Lock
+from typing import Any, AsyncGenerator, Callable, Dict, List, \
+    NamedTuple, Optional, Set
+from urllib.parse import urlencode
+from weakref import WeakSet
+
+from dash import Dash, Input, dcc, html
+from dash.development.base_component import Component
+import requests
+from starlette.concurrency import run_in_threadpool
+
+from dazzler.config import PushSettings, dazzler_config
+from dazzler.dash.http import http_sessions
+from dazzler.dash.wiring import BasePath, settings_for
+
+
+NOTIFY_PATH = '/dazzler/-/push/notify'
+"""URL path of the endpoint where Orion sends notifications."""
+
+EVENTS_PATH = '/dazzler/-/push/events'
+"""URL path of the endpoint browsers connect to to get SSE events."""
+
+EVENTS_URL_ATTR = 'data-dazzler-events'
+"""HTML attribute `assets/push.js` looks for to find the trigger buttons."""
+
+FOLLOW_UP_ATTR = 'data-dazzler-follow-up'
+"""HTML attribute telling `assets/push.js` how many milliseconds after an
+event to click the trigger button again.
+"""
+
+KEEP_ALIVE_SECONDS = 15
+
+
+def normalize_service_path(service_path: Optional[str]) -> str:
+    """Convert a FIWARE service path to the format Orion uses in the
+    notifications it sends out, i.e. no trailing slash except for the root
+    service path.
+
+    Args:
+        service_path: the path to convert, possibly `None` or empty.
+
+    Returns:
+        The normalized service path.
+    """
+    path = (service_path or '/').rstrip('/')
+    return path if path.startswith('/') else f"/{path}"
+
+
+class Topic(NamedTuple):
+    """What a browser listens to: updates to entities of a given type
+    within a tenant's service path.
+    """
+    tenant: str
+    service_path: str
+    entity_type: str
+
+    @staticmethod
+    def of(tenant: str, service_path: Optional[str],
+           entity_type: str) -> 'Topic':
+        return Topic(tenant, normalize_service_path(service_path),
+                     entity_type)
+
+
+class Listener:
+    """Queue of events for a browser connection.
+
+    We only ever keep one pending event in the queue since a browser just
+    needs to know it's time to refresh, not how many times entities got
+    updated since the last refresh.
+    """
+
+    def __init__(self, topics: List[Topic]):
+        self.topics = topics
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    def _offer(self, event: dict):
+        if not self._queue.full():
+            self._queue.put_nowait(event)
+
+    def notify(self, event: dict):
+        self._loop.call_soon_threadsafe(self._offer, event)
+
+    async def next_event(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+Subscribe = Callable[[Topic], None]
+
+
+class OrionSubscriber:
+    """Creates Orion subscriptions to get notified of entity updates."""
+
+    def __init__(self, orion_base_url: str, settings: PushSettings):
+        orion_url = orion_base_url.rstrip('/')
+        dazzler_url = str(settings.notify_base_url).rstrip('/')
+        self._subscriptions_url = f"{orion_url}/v2/subscriptions"
+        self._notify_url = f"{dazzler_url}{NOTIFY_PATH}"
+        self._throttling = settings.throttling
+        self._orion_url = orion_url
+        self._timeout = http_sessions().timeout()
+
+    def _session(self) -> requests.Session:
+        return http_sessions().session_for(self._orion_url)
+
+    @staticmethod
+    def _headers(topic: Topic) -> dict:
+        return {
+            'fiware-service': topic.tenant,
+            'fiware-servicepath': topic.service_path
+        }
+
+    def _is_ours(self, topic: Topic, subscription: dict) -> bool:
+        url = subscription.get('notification', {}) \
+                          .get('http', {}).get('url')
+        entities = subscription.get('subject', {}).get('entities', [])
+        types = [e.get('type') for e in entities]
+        return url == self._notify_url and topic.entity_type in types
+
+    def _exists(self, topic: Topic) -> bool:
+        response = self._session().get(self._subscriptions_url,
+                                       headers=self._headers(topic),
+                                       timeout=self._timeout)
+        response.raise_for_status()
+        return any(self._is_ours(topic, s) for s in response.json())
+
+    def _payload(self, topic: Topic) -> dict:
+        return {
+            'description': f"Dazzler push updates: {topic.entity_type}",
+            'subject': {
+                'entities': [{'idPattern': '.*',
+                              'type': topic.entity_type}]
+            },
+            'notification': {
+                'http': {'url': self._notify_url},
+                'attrsFormat': 'normalized'
+            },
+            'throttling': self._throttling
+        }
+
+    def __call__(self, topic: Topic):
+        if self._exists(topic):
+            return
+        response = self._session().post(self._subscriptions_url,
+                                        headers=self._headers(topic),
+                                        json=self._payload(topic),
+                                        timeout=self._timeout)
+        response.raise_for_status()
+    # NOTE. Subscriptions outlive Dazzler. So we look for a subscription
+    # we created in a previous run before making a new one, otherwise
+    # Orion would notify us multiple times for the same update.
+
+
+class NotificationHub:
+    """Fans Orion notifications out to the browsers listening to them.
+
+    The hub makes sure there's an Orion subscription for a topic before
+    the first browser starts listening to it and then routes every Orion
+    notification to the listeners of the topics it's about. Before that,
+    it tells the watchers of those topics which entities got updated, so
+    they can drop data they hold about them.
+    """
+
+    def __init__(self, subscribe: Subscribe):
+        """Create a new instance.
+
+        Args:
+            subscribe: function to ask Orion to notify us of updates
+                about a topic.
+        """
+        self._subscribe = subscribe
+        self._lock = Lock()
+        self._listeners: Dict[Topic, Set[Listener]] = {}
+        self._watchers: Dict[Topic, WeakSet] = {}
+        self._subscribed: Set[Topic] = set()
+
+    def ensure_subscribed(self, topic: Topic):
+        with self._lock:
+            if topic in self._subscribed:
+                return
+        self._subscribe(topic)
+        with self._lock:
+            self._subscribed.add(topic)
+
+    def listen(self, topics: List[Topic]) -> Listener:
+        listener = Listener(topics)
+        with self._lock:
+            for topic in topics:
+                self._listeners.setdefault(topic, set()).add(listener)
+        return listener
+
+    def unlisten(self, listener: Listener):
+        with self._lock:
+            for topic in listener.topics:
+                listeners = self._listeners.get(topic, set())
+                listeners.discard(listener)
+                if not listeners:
+                    self._listeners.pop(topic, None)
+
+    def watch(self, topic: Topic, watcher: Any):
+        """Tell the given watcher about updates to the topic.
+
+        Args:
+            topic: what to watch.
+            watcher: anything with a `mark_updated` method taking the IDs
+                of the updated entities, e.g. a `RollingSeriesStore`. The
+                hub only keeps a weak reference to it, so the watcher goes
+                away with the board it belongs to.
+        """
+        with self._lock:
+            self._watchers.setdefault(topic, WeakSet()).add(watcher)
+
+    def listener_count(self, topic: Topic) -> int:
+        with self._lock:
+            return len(self._listeners.get(topic, set()))
+
+    def publish(self, tenant: Optional[str], service_path: Optional[str],
+                entities: List[dict]) -> int:
+        """Route the entities Orion sent in a notification to the listeners
+        of the corresponding topics.
+
+        Args:
+            tenant: the value of the FIWARE service header.
+            service_path: the value of the FIWARE service path header.
+            entities: the `data` field of the Orion notification.
+
+        Returns:
+            How many listeners got notified.
+        """
+        ids_by_type: Dict[str, List[str]] = {}
+        for e in entities:
+            ids_by_type.setdefault(e.get('type'), []).append(e.get('id'))
+
+        notified = 0
+        for (entity_type, ids) in ids_by_type.items():
+            topic = Topic.of(tenant or '', service_path, entity_type)
+            with self._lock:
+                listeners = list(self._listeners.get(topic, set()))
+                watchers = list(self._watchers.get(topic, ()))
+            for watcher in watchers:
+                watcher.mark_updated(ids)
+            event = {'entity_type': entity_type, 'ids': ids}
+            for listener in listeners:
+                listener.notify(event)
+            notified += len(listeners)
+
+        return notified
+
+    async def stream(self, topics: List[Topic]) \
+            -> AsyncGenerator[str, None]:
+        """Stream SSE events for the given topics until the browser goes
+        away.
+
+        Args:
+            topics: what to stream events about.
+
+        Yields:
+            SSE-formatted messages.
+        """
+        for topic in topics:
+            await run_in_threadpool(self.ensure_subscribed, topic)
+        listener = self.listen(topics)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = await listener.next_event(KEEP_ALIVE_SECONDS)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            self.unlisten(listener)
+
+
+_push_hub: Optional[NotificationHub] = None
+_push_hub_lock = Lock()
+
+
+def push_hub() -> NotificationHub:
+    """Get the process-wide notification hub, creating it from the Dazzler
+    settings on first use.
+
+    Returns:
+        The hub shared by all the boards.
+    """
+    global _push_hub
+    with _push_hub_lock:
+        if _push_hub is None:
+            cfg = dazzler_config()
+            subscriber = OrionSubscriber(str(cfg.orion_base_url), cfg.push)
+            _push_hub = NotificationHub(subscriber)
+        return _push_hub
+
+
+class LiveRefresh:
+    """Triggers the periodic refresh of a board's widgets, either through
+    an interval timer or, in push mode, whenever Orion notifies us of an
+    update to the entities the board displays.
+
+    Boards put the `component` in their layout and hang their refresh
+    callbacks off the `input`, so the same board code works in both modes.
+    """
+
+    def __init__(self, app: Dash, component_id: str, interval_millis: int,
+                 *entity_types: str):
+        """Create a new instance.
+
+        Args:
+            app: the Dash app of the board.
+            component_id: the ID of the trigger component.
+            interval_millis: how often to refresh when not in push mode.
+            entity_types: the types of the entities whose updates should
+                trigger a refresh in push mode.
+        """
+        self._component_id = component_id
+        self._interval = interval_millis
+        self._entity_types = list(entity_types)
+        self._base_path = BasePath.from_board_app(app)
+        self._push = settings_for(app).push.enabled
+        self._follow_up = settings_for(app).push.follow_up
+
+    def _topics(self) -> List[Topic]:
+        return [Topic.of(self._base_path.tenant(),
+                         self._base_path.service_path(), t)
+                for t in self._entity_types]
+
+    def _events_url(self) -> str:
+        query = urlencode({
+            'tenant': self._base_path.tenant(),
+            'service_path': self._base_path.service_path(),
+            'entity_type': self._entity_types
+        }, doseq=True)
+        return f"{EVENTS_PATH}?{query}"
+
+    def component(self) -> Component:
+        if self._push:
+            attrs = {EVENTS_URL_ATTR: self._events_url(),
+                     FOLLOW_UP_ATTR: str(int(self._follow_up * 1000))}
+            return html.Button(id=self._component_id, n_clicks=0,
+                               style={'display': 'none'}, **attrs)
+        return dcc.Interval(id=self._component_id,
+                            interval=self._interval, n_intervals=0)
+
+    def input(self) -> Input:
+        prop = 'n_clicks' if self._push else 'n_intervals'
+        return Input(self._component_id, prop)
+
+    def watch(self, watcher: Any):
+        """In push mode, tell the given watcher whenever Orion notifies us
+        of updates to the board's entities. See `NotificationHub.watch`.
+
+        Args:
+            watcher: what to tell, e.g. the board's `RollingSeriesStore`.
+        """
+        if self._push:
+            hub = push_hub()
+            for topic in self._topics():
+                hub.watch(topic, watcher)
@@ -0,0 +1,183 @@
+"""
+Incremental fetching of live entity series.
+
+Live boards plot a window of the most recent data points of an entity
+series and refresh it every few seconds. Only a handful of new points
+arrive between refreshes, so instead of downloading the whole window on
+every tick we keep the window in memory and only ask Quantum Leap for
+the points that came in after the last one we've got.
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+from typing import Callable, Iterable, Optional
+
+import pandas as pd
+from requests import HTTPError
+
+from dazzler.dash.fiware import QuantumLeapSource, SeriesDecoder, \
+    series_frame
+from dazzler.dash.http import is_not_found
+
+
+REFRESHES_AFTER_UPDATE = 2
+"""How many refreshes of a window go straight to Quantum Leap after we
+hear its entity got updated.
+"""
+
+
+class RollingSeries:
+    """Window of the most recent data points of an entity series."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.frame: Optional[pd.DataFrame] = None
+        self.size = 0
+        self.refreshed_at = 0.0
+        self.updates_due = 0
+
+
+class RollingSeriesStore:
+    """Keeps rolling windows of entity series, one for each entity ID,
+    shared among all the sessions of a board.
+
+    The first time a window gets requested, we fetch it in full. From
+    then on, we only fetch the points newer than the last index in the
+    window, append them and drop the oldest points to keep the window
+    size constant. Sessions asking for a window while another session
+    refreshed it less than `max_age` seconds ago get served straight from
+    memory, unless we've been told the entity got updated in the meantime.
+    """
+
+    def __init__(self, source: QuantumLeapSource, entity_type: str,
+                 max_age: float, max_entities: int = 256,
+                 clock: Callable[[], float] = time.monotonic,
+                 decoder: SeriesDecoder = series_frame):
+        """Create a new instance.
+
+        Args:
+            source: where to fetch entity series from.
+            entity_type: the type of the entities whose series to fetch.
+            max_age: how long, in seconds, a window stays fresh after
+                a refresh.
+            max_entities: how many windows to keep at most. The least
+                recently used window goes when going over this limit.
+            clock: monotonic time source, in seconds.
+            decoder: how to convert the QL series to frames.
+        """
+        self._source = source
+        self._entity_type = entity_type
+        self._max_age = max_age
+        self._max_entities = max_entities
+        self._clock = clock
+        self._decoder = decoder
+        self._lock = Lock()
+        self._series: 'OrderedDict[str, RollingSeries]' = OrderedDict()
+
+    def _series_for(self, entity_id: str) -> RollingSeries:
+        with self._lock:
+            series = self._series.get(entity_id)
+            if series is None:
+                series = RollingSeries()
+                self._series[entity_id] = series
+                if len(self._series) > self._max_entities:
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end(entity_id)
+            return series
+
+    def _fetch_window(self, entity_id: str, series: RollingSeries,
+                      size: int, cached: bool):
+        series.frame = self._source.fetch_entity_series(
+            entity_id=entity_id, entity_type=self._entity_type,
+            entries_from_latest=size, decoder=self._decoder, cached=cached
+        )
+        series.size = size
+
+    def _fetch_newer(self, entity_id: str, series: RollingSeries,
+                     cached: bool):
+        last_index = series.frame.index[-1]
+        try:
+            df = self._source.fetch_entity_series(
+                entity_id=entity_id, entity_type=self._entity_type,
+                entries_from_latest=series.size,
+                from_timepoint=last_index, decoder=self._decoder,
+                cached=cached
+            )
+        except HTTPError as e:
+            if is_not_found(e):
+                return
+            raise
+
+        newer = df[df.index > last_index]
+        if not newer.empty:
+            merged = pd.concat([series.frame, newer])
+            series.frame = merged.iloc[-series.size:]
+    # NOTE. Quantum Leap's from date is inclusive, so the latest point we
+    # have comes back again and we've got to filter it out. Also, QL returns
+    # a 404 when there are no data points matching the query, which is what
+    # happens most of the time when asking for the points after the latest
+    # one we've got.
+
+    @staticmethod
+    def _latest(series: RollingSeries):
+        if series.frame is None or series.frame.empty:
+            return None
+        return series.frame.index[-1]
+
+    def mark_updated(self, entity_ids: Iterable[str]):
+        """Make the next refreshes of the given entities' windows fetch
+        newer points from Quantum Leap, no matter how fresh the windows.
+
+        Args:
+            entity_ids: the IDs of the entities that got updated.
+        """
+        with self._lock:
+            updated = [self._series[x] for x in entity_ids
+                       if x in self._series]
+        for series in updated:
+            with series.lock:
+                series.updates_due = REFRESHES_AFTER_UPDATE
+
+    def window(self, entity_id: str, size: int) -> pd.DataFrame:
+        """Get the most recent data points of an entity series.
+
+        Args:
+            entity_id: the ID of the entity whose series to get.
+            size: how many data points to get, counting back from the
+                most recent one.
+
+        Returns:
+            A time-indexed frame with at most `size` rows. The frame is
+            the caller's own copy.
+        """
+        series = self._series_for(entity_id)
+        with series.lock:
+            now = self._clock()
+            updated = series.updates_due > 0
+            stale = updated or now - series.refreshed_at >= self._max_age
+            latest = self._latest(series)
+            if series.frame is None or series.size < size or \
+                    (series.frame.empty and stale):
+                self._fetch_window(entity_id, series, size,
+                                   cached=not updated)
+                series.refreshed_at = now
+            elif stale:
+                self._fetch_newer(entity_id, series, cached=not updated)
+                series.refreshed_at = now
+
+            if updated:
+                newest = self._latest(series)
+                got_newer = newest is not None and \
+                    (latest is None or newest > latest)
+                series.updates_due = 0 if got_newer \
+                    else series.updates_due - 1
+            return series.frame.iloc[-size:].copy()
+    # NOTE. Updates. When Orion tells us an entity changed, the window we
+    # have is out of date even if we refreshed it a moment ago, and so may
+    # be the query cache, so we go straight to Quantum Leap. Orion notifies
+    # Quantum Leap at the same time as us though, so the new point may not
+    # be there yet. If it isn't, we try again on the next refresh, which in
+    # push mode is the follow-up refresh `LiveRefresh` schedules after each
+    # notification. After `REFRESHES_AFTER_UPDATE` tries we give up and go
+    # back to serving from memory.
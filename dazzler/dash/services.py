@@ -0,0 +1,96 @@
+"""
+Process-wide services and reloading of their settings.
+
+Boards share a few process-wide services, like the query cache or the
+HTTP session pool, each created from the Dazzler settings on first use.
+When the settings get reloaded, we drop the services whose settings
+changed, so they get created again from the new settings the next time
+someone asks for them. Boards hold on to some of the services, e.g. the
+prefetch scheduler, but remounting reassembles all the boards whenever
+a setting other than the board descriptions changes, so the new boards
+get the new services.
+
+Some services can't be swapped out while Dazzler runs. The metrics
+registry has the board instrumentation and the collected metrics, the
+push hub has the browsers listening for updates and the compression
+middleware is part of the FastAPI app. Changes to the settings only
+those services read take effect on restart, same as the settings that
+decide how Dazzler mounts the boards.
+
+A few services run background threads, which can be paused before
+forking worker processes and start again on their own once used.
+"""
+from functools import reduce
+from typing import Callable, Dict, List, Tuple
+
+from dazzler.config import Settings
+from dazzler.dash.bridge import pause_async_bridge
+from dazzler.dash.entityindex import reset_entity_id_indexes
+from dazzler.dash.fiware import reset_query_cache
+from dazzler.dash.http import reset_http_sessions
+from dazzler.dash.images import reset_image_store
+from dazzler.dash.prefetch import pause_prefetch_scheduler, \
+    reset_prefetch_scheduler
+from dazzler.dash.snapshot import pause_snapshot_tables, \
+    reset_snapshot_tables
+from dazzler.dash.suites import reset_component_suites
+
+
+SERVICE_RESETS: Dict[str, Tuple[Callable[[], None], ...]] = {
+    'query_cache': (reset_query_cache, reset_image_store),
+    'http': (reset_http_sessions,),
+    'snapshots': (reset_snapshot_tables,),
+    'prefetch': (reset_prefetch_scheduler,),
+    'entity_index': (reset_entity_id_indexes,),
+    'component_suites': (reset_component_suites,)
+}
+"""The functions to drop services with, keyed on the settings field the
+services get created from.
+"""
+
+RESTART_SETTINGS = (
+    'lazy_boards', 'dispatch_boards', 'hot_reload_interval', 'metrics',
+    'push.notify_base_url', 'push.throttling',
+    'compression.min_size', 'compression.gzip_level',
+    'compression.brotli_quality'
+)
+"""The settings that only take effect on restart."""
+
+
+def _value(settings: Settings, path: str):
+    return reduce(getattr, path.split('.'), settings)
+
+
+def apply_settings(old: Settings, new: Settings) -> List[str]:
+    """Bring the process-wide services in line with reloaded settings.
+
+    Call this function after `reload_config` and before remounting the
+    boards, so the boards get assembled with the new services.
+
+    Args:
+        old: the settings Dazzler ran with until now.
+        new: the reloaded settings.
+
+    Returns:
+        The settings in `RESTART_SETTINGS` that changed, if any.
+    """
+    for (field, resets) in SERVICE_RESETS.items():
+        if getattr(old, field) != getattr(new, field):
+            for reset in resets:
+                reset()
+    return [path for path in RESTART_SETTINGS
+            if _value(old, path) != _value(new, path)]
+
+
+def pause_services():
+    """Stop the background threads of the process-wide services and wait
+    for them to exit.
+
+    Each service starts its thread again the next time a board uses it,
+    in whichever process that happens. Call this function right before
+    forking, so the child doesn't inherit locks our threads happened to
+    hold at the time of the fork.
+    """
+    pause_prefetch_scheduler()
+    pause_snapshot_tables()
+    pause_async_bridge()
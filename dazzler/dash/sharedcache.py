@@ -0,0 +1,263 @@
+"""
+Query results shared by all the Dazzler worker processes.
+
+When Dazzler runs several worker processes, each has its own query cache,
+so with N workers the backends may get the same query up to N times. A
+shared store sits behind the query caches of all the workers: the worker
+that misses in its own cache looks in the shared store before querying
+the backend and puts what it fetched in there for the other workers.
+
+We've got two stores: one keeping each result in a file in shared memory,
+i.e. `/dev/shm` on Linux, for workers running on the same machine, and
+one keeping results in Redis, or anything else speaking its protocol,
+for when that's not enough. Results get pickled, so only workers running
+the same Dazzler version should share a store.
+"""
+from abc import ABC, abstractmethod
+import hashlib
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import time
+from threading import Lock
+from typing import Any, Hashable, Optional, Tuple
+
+from dazzler.config import QueryCacheSettings
+
+
+def _stable_repr(value: Any) -> str:
+    if isinstance(value, tuple):
+        return '(' + ','.join(_stable_repr(x) for x in value) + ')'
+    if callable(value) and hasattr(value, '__qualname__'):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
+
+
+def key_digest(key: Hashable) -> str:
+    """Compute a digest of a query cache key that's the same in every
+    process.
+
+    Args:
+        key: the key, a tuple of plain values, datetimes, pydantic models
+            and functions, e.g. series decoders.
+
+    Returns:
+        A hex digest of the key.
+    """
+    h = hashlib.blake2b(_stable_repr(key).encode(), digest_size=16)
+    return h.hexdigest()
+# NOTE. Stable keys. Python salts string hashes differently in each
+# process and the `repr` of a function has its address in it, so we name
+# functions by module and qualified name and hash the rest of the key
+# through its `repr`.
+
+
+SharedValue = Tuple[Any, float]
+"""A value in the shared store along with how many seconds it's got left
+to live.
+"""
+
+
+class SharedStore(ABC):
+    """Stores query results for all the workers to see."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[SharedValue]:
+        """Look up the value associated to the given key.
+
+        Args:
+            key: the key digest.
+
+        Returns:
+            The value and how many seconds until it expires, or `None` if
+            there's no such value or it expired already.
+        """
+        pass
+
+    @abstractmethod
+    def put(self, key: str, value: Any, ttl: float):
+        """Associate a value to the given key for `ttl` seconds.
+
+        Args:
+            key: the key digest.
+            value: anything we can pickle.
+            ttl: how long, in seconds, the value should stay in the store.
+        """
+        pass
+
+
+def check_private_dir(directory: str):
+    """Make sure only the current user can read and write the given
+    directory.
+
+    Args:
+        directory: the directory to check.
+
+    Raises:
+        PermissionError: if the directory is a symlink, is owned by
+            another user or grants any permissions to group or others.
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{directory} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is owned by another user")
+    if info.st_mode & 0o077:
+        raise PermissionError(
+            f"{directory} is accessible to other users, "
+            f"mode {stat.S_IMODE(info.st_mode):o}"
+        )
+# NOTE. Unpickling. We unpickle whatever we find in the shared memory
+# directory, and unpickling runs code. `/dev/shm` is world-writable, so
+# anyone could create the directory before us and plant files in it. So
+# we create it accessible to us only and refuse to use it if it's there
+# already but someone else could write to it.
+
+
+class ShmStore(SharedStore):
+    """Keeps each value in a file of its own in a shared memory directory.
+
+    Every `prune_every` puts, we delete the expired files and, if the
+    files still take up more than `max_bytes`, the oldest ones. The
+    directory must be ours alone, see `check_private_dir`.
+    """
+
+    HEADER = struct.Struct('!d')
+
+    def __init__(self, directory: str, max_bytes: int,
+                 prune_every: int = 64):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._prune_every = prune_every
+        self._lock = Lock()
+        self._puts = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_private_dir(directory)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key)
+
+    def get(self, key: str) -> Optional[SharedValue]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        (expires_at,) = self.HEADER.unpack_from(data)
+        left = expires_at - time.time()
+        if left <= 0:
+            return None
+        return pickle.loads(data[self.HEADER.size:]), left
+
+    def put(self, key: str, value: Any, ttl: float):
+        data = self.HEADER.pack(time.time() + ttl) + \
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._max_bytes:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % self._prune_every == 0
+        if prune:
+            self.prune()
+    # NOTE. Atomic writes. We write the value to a temporary file and then
+    # rename it, so readers in other processes either see the whole old
+    # file or the whole new one, never half a file.
+
+    def prune(self):
+        """Delete expired values, then the oldest ones if the store takes
+        up more than `max_bytes`.
+        """
+        now = time.time()
+        files = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    (expires_at,) = self.HEADER.unpack(
+                        f.read(self.HEADER.size)
+                    )
+                size = entry.stat().st_size
+            except (OSError, struct.error):
+                continue
+            if expires_at <= now:
+                self._unlink(entry.path)
+            else:
+                files.append((expires_at, size, entry.path))
+
+        total = sum(size for (_, size, _) in files)
+        for (_, size, path) in sorted(files):
+            if total <= self._max_bytes:
+                break
+            self._unlink(path)
+            total -= size
+    # NOTE. Pruning. Values expiring first go first, which for values with
+    # the same TTL means the oldest. We leave temporary files alone since
+    # some other worker may be writing them. Another worker may be pruning
+    # at the same time too, hence we put up with files vanishing under us.
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class RedisStore(SharedStore):
+    """Keeps values in Redis, letting Redis expire them."""
+
+    PREFIX = 'dazzler:query:'
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "The Redis query cache needs the redis package: "
+                "pip install redis"
+            ) from e
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[SharedValue]:
+        pipe = self._redis.pipeline()
+        pipe.get(self.PREFIX + key)
+        pipe.pttl(self.PREFIX + key)
+        data, pttl = pipe.execute()
+        if data is None or pttl is None or pttl <= 0:
+            return None
+        return pickle.loads(data), pttl / 1000
+
+    def put(self, key: str, value: Any, ttl: float):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._redis.set(self.PREFIX + key, data, px=max(1, int(ttl * 1000)))
+
+
+def shared_store(settings: QueryCacheSettings) -> Optional[SharedStore]:
+    """Create the shared store the settings ask for.
+
+    Args:
+        settings: the query cache settings.
+
+    Returns:
+        The store or `None` if the query caches shouldn't share results.
+    """
+    if settings.shared == 'shm':
+        try:
+            return ShmStore(settings.shm_dir, settings.max_bytes)
+        except OSError as e:
+            print(f"Not sharing query results, can't use {settings.shm_dir}: "
+                  f"{e}")
+            return None
+    if settings.shared == 'redis':
+        return RedisStore(settings.redis_url)
+    return None
@@ -0,0 +1,289 @@
+"""
+In-memory snapshots of the current state of Orion entities.
+
+Lots of boards only show the latest value of some entities, e.g. the last
+task assigned to a line. Querying Quantum Leap for the last entry of an
+entity series to get that means scanning the series in CrateDB, on every
+refresh of every session. But Orion has the current state of all the
+entities already, so we fetch all the entities of a type from Orion in
+one go, keep them in memory and refresh them in the background. Board
+callbacks read the snapshot and never wait on a backend, except the
+first time a snapshot gets read.
+
+Boards opt in through the `orion_snapshots` flag of their assembly.
+"""
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dash import Dash
+
+from dazzler.config import SnapshotSettings, dazzler_config
+from dazzler.dash.fiware import OrionSource, fiware_context_for
+from dazzler.dash.wiring import settings_for
+
+
+SnapshotKey = Tuple
+"""Identifies a snapshot: Orion URL, tenant, service path, entity type
+and attributes.
+"""
+
+
+class SnapshotTable:
+    """The current state of all the entities of a type, as of the last
+    refresh.
+
+    Entities are in key-value format and sorted by modification time,
+    most recently updated first. Readers get their own copy of each
+    entity, so they can't tamper with the snapshot.
+    """
+
+    def __init__(self, fetch: Callable[[], List[dict]],
+                 clock: Callable[[], float] = time.monotonic):
+        """Create a new instance.
+
+        Args:
+            fetch: gets the current entities from the backend.
+            clock: monotonic time source, in seconds.
+        """
+        self._fetch = fetch
+        self._clock = clock
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._entities: Optional[List[dict]] = None
+        self._by_id: Dict[str, dict] = {}
+        self.refreshed_at: Optional[float] = None
+        self.read_at = clock()
+
+    def refresh(self):
+        """Fetch the entities again and replace the snapshot with them.
+
+        Raises:
+            Exception: whatever the fetch raised, in which case the
+                snapshot stays the same.
+        """
+        entities = self._fetch()
+        by_id = {x['id']: x for x in entities}
+        with self._lock:
+            self._entities, self._by_id = entities, by_id
+            self.refreshed_at = self._clock()
+
+    def _read(self) -> Tuple[List[dict], Dict[str, dict]]:
+        with self._lock:
+            self.read_at = self._clock()
+            if self._entities is not None:
+                return self._entities, self._by_id
+        with self._load_lock:
+            if self._entities is None:
+                self.refresh()
+        with self._lock:
+            return self._entities, self._by_id
+    # NOTE. First read. There's nothing to read until the first refresh, so
+    # the first reader fetches the entities. The load lock makes any other
+    # reader coming in at the same time wait for that fetch rather than
+    # fetch the same entities again.
+
+    def entities(self) -> List[dict]:
+        """Get all the entities in the snapshot, most recently updated
+        first.
+        """
+        entities, _ = self._read()
+        return [dict(x) for x in entities]
+
+    def latest(self) -> Optional[dict]:
+        """Get the most recently updated entity, `None` if there are no
+        entities.
+        """
+        entities, _ = self._read()
+        return dict(entities[0]) if entities else None
+
+    def get(self, entity_id: str) -> Optional[dict]:
+        """Get the entity with the given ID, `None` if there's no such
+        entity.
+        """
+        _, by_id = self._read()
+        entity = by_id.get(entity_id)
+        return dict(entity) if entity is not None else None
+
+
+class SnapshotTables:
+    """Keeps the snapshots boards read and refreshes them in the background.
+
+    A daemon thread refreshes all the snapshots every `interval` seconds
+    and drops those nobody read in the last `idle_expiry` seconds. The
+    thread starts with the first snapshot. If the process forks after
+    that, the child starts a thread of its own the next time it gets a
+    snapshot since threads don't survive a fork. Pausing stops the thread
+    until the next snapshot lookup, which is what you want to do before
+    forking.
+    """
+
+    def __init__(self, settings: SnapshotSettings,
+                 clock: Callable[[], float] = time.monotonic):
+        self._interval = settings.interval
+        self._idle_expiry = settings.idle_expiry
+        self._clock = clock
+        self._lock = Lock()
+        self._tables: Dict[SnapshotKey, SnapshotTable] = {}
+        self._stopped = Event()
+        self._pid: Optional[int] = None
+        self._running: Optional[Tuple[Thread, Event]] = None
+
+    def _ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        halt = Event()
+        if self._stopped.is_set():
+            halt.set()
+        thread = Thread(target=self._run, args=(halt,), daemon=True,
+                        name='dazzler-snapshots')
+        self._running = (thread, halt)
+        thread.start()
+
+    def _run(self, halt: Event):
+        while not halt.wait(self._interval):
+            self.refresh()
+
+    def table(self, key: SnapshotKey,
+              fetch: Callable[[], List[dict]]) -> SnapshotTable:
+        """Get the snapshot with the given key, creating it if needed.
+
+        Args:
+            key: identifies the snapshot.
+            fetch: gets the snapshot entities from the backend, in case
+                we've got to create the snapshot.
+
+        Returns:
+            The snapshot.
+        """
+        with self._lock:
+            self._ensure_running()
+            table = self._tables.get(key)
+            if table is None:
+                table = SnapshotTable(fetch, self._clock)
+                self._tables[key] = table
+            return table
+
+    def refresh(self):
+        """Drop idle snapshots and refresh the others.
+
+        A failed refresh leaves the snapshot as it was, so boards keep on
+        showing the last known state until the backend comes back.
+        """
+        now = self._clock()
+        with self._lock:
+            for key in [k for (k, t) in self._tables.items()
+                        if now - t.read_at > self._idle_expiry]:
+                del self._tables[key]
+            tables = list(self._tables.values())
+
+        for table in tables:
+            if table.refreshed_at is None:
+                continue
+            try:
+                table.refresh()
+            except Exception as e:
+                print(f"Orion snapshot refresh failed: {e}")
+    # NOTE. Unread snapshots. We skip snapshots that haven't been loaded
+    # yet since their first reader is about to load them anyway.
+
+    def pause(self):
+        """Stop the refresh thread and wait for it to exit.
+
+        The snapshots stay as they are and the next `table` call starts
+        a new thread to refresh them.
+        """
+        with self._lock:
+            running = self._running
+            self._running = None
+            self._pid = None
+        if running is None:
+            return
+        (thread, halt) = running
+        halt.set()
+        if thread.is_alive():
+            thread.join()
+    # NOTE. Forking. Once paused, no thread of ours holds the locks of the
+    # snapshots or of the HTTP session pool, so a forked child can't
+    # inherit them locked and hang on its first read.
+
+    def stop(self):
+        with self._lock:
+            self._stopped.set()
+            if self._running is not None:
+                self._running[1].set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tables)
+
+
+_snapshot_tables: Optional[SnapshotTables] = None
+_snapshot_tables_lock = Lock()
+
+
+def snapshot_tables() -> SnapshotTables:
+    """Get the process-wide snapshots, creating them from the Dazzler
+    settings on first use.
+
+    Returns:
+        The snapshots shared by all the boards.
+    """
+    global _snapshot_tables
+    with _snapshot_tables_lock:
+        if _snapshot_tables is None:
+            _snapshot_tables = SnapshotTables(dazzler_config().snapshots)
+        return _snapshot_tables
+
+
+def reset_snapshot_tables():
+    """Stop refreshing the process-wide snapshots and drop them, so the
+    next `snapshot_tables` call creates new ones from the current Dazzler
+    settings.
+    """
+    global _snapshot_tables
+    with _snapshot_tables_lock:
+        if _snapshot_tables is not None:
+            _snapshot_tables.stop()
+        _snapshot_tables = None
+
+
+def pause_snapshot_tables():
+    """Stop the refresh thread of the process-wide snapshots, if any, and
+    wait for it to exit. It starts again on the next snapshot lookup.
+    """
+    with _snapshot_tables_lock:
+        tables = _snapshot_tables
+    if tables is not None:
+        tables.pause()
+
+
+def snapshot_table(app: Dash, entity_type: str,
+                   attrs: Optional[List[str]] = None) -> SnapshotTable:
+    """Get the snapshot of the entities of the given type for a board.
+
+    Boards should call this function every time they read the snapshot,
+    rather than holding on to the table, since idle snapshots get dropped.
+
+    Args:
+        app: the Dash app of the board. The snapshot has the entities of
+            the board's tenant and service path.
+        entity_type: the type of the entities in the snapshot.
+        attrs: which attributes to keep, all of them if `None`.
+
+    Returns:
+        The snapshot.
+    """
+    ctx = fiware_context_for(app)
+    key = (str(settings_for(app).orion_base_url), ctx.service,
+           ctx.service_path, entity_type, tuple(attrs or ()))
+    fetch = lambda: OrionSource(app).fetch_entities(
+        entity_type, attrs=attrs, order_by='!dateModified'
+    )
+    return snapshot_tables().table(key, fetch)
+# NOTE. Pagination. Orion pages by offset, so if entities get updated
+# while we fetch the pages, an entity may move from a page we've yet to
+# fetch to one we've fetched already and miss this refresh. It'll be
+# there on the next one.
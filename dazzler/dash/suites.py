@@ -0,0 +1,208 @@
+"""
+Component suites shared by all the dashboards.
+
+Every Dash app serves the JavaScript bundles of the component libraries
+it uses, the "component suites"---React, the Dash renderer, Plotly.js,
+Dash Bootstrap Components, etc.---below its own base path. Since each
+dashboard has its own base path, browsers download the same few
+megabytes of bundles again for each dashboard of each tenant. So instead
+we point the dashboards at the same URLs, below `SUITES_PATH`, where we
+serve the bundles once for all of them.
+
+Dash fingerprints bundle file names with the version and modification
+time of the bundle, so browsers can keep a fingerprinted bundle forever.
+We compress each bundle once, on the first request for it, with gzip
+and, if the `brotli` package is installed, Brotli, then keep the
+compressed bundles in memory.
+"""
+import gzip
+import hashlib
+import mimetypes
+import pkgutil
+import posixpath
+from threading import Lock, Thread
+from typing import Dict, Optional, Tuple
+
+from dash.development.base_component import ComponentRegistry
+from dash.fingerprint import check_fingerprint
+
+from dazzler.config import ComponentSuiteSettings, dazzler_config
+from dazzler.dash.compression import brotli_module
+
+
+DASH_SUITES_PATH = '_dash-component-suites/'
+SUITES_PATH = '/dazzler/-/_dash-component-suites'
+"""Where we serve the bundles. The path has to keep Dash's own suites
+directory in it, since the Dash Core Components bundle only fingerprints
+the chunks it loads lazily, e.g. the Plotly.js one, if its own URL has
+`/_dash-component-suites/` in it.
+"""
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+SUITE_EXTENSIONS = ('.js', '.css', '.map')
+"""File types we serve from component libraries. Packages have Python
+sources and other stuff in there too we shouldn't give out.
+"""
+
+
+def shared_suite_url(url: str, base_path: str) -> str:
+    """Turn the URL of a bundle below a dashboard's base path into the
+    URL of the same bundle below `SUITES_PATH`.
+
+    Args:
+        url: the URL of a script or stylesheet in the dashboard's index.
+        base_path: the dashboard's base path.
+
+    Returns:
+        The shared URL if `url` is the URL of a component suite bundle,
+        `url` as is otherwise.
+    """
+    board_suites = base_path + DASH_SUITES_PATH
+    if url.startswith(board_suites):
+        return f"{SUITES_PATH}/{url[len(board_suites):]}"
+    return url
+
+
+class SuiteFile:
+    """A bundle along with its compressed versions."""
+
+    def __init__(self, content: bytes, media_type: str):
+        self.media_type = media_type
+        self.etag = '"' + hashlib.blake2b(content,
+                                          digest_size=16).hexdigest() + '"'
+        self._bodies: Dict[str, bytes] = {'identity': content}
+
+    def add_encoding(self, encoding: str, body: bytes):
+        self._bodies = {encoding: body, **self._bodies}
+
+    def encodings(self) -> Tuple[str, ...]:
+        return tuple(self._bodies)
+
+    def body(self, encoding: str) -> bytes:
+        return self._bodies[encoding]
+    # NOTE. Encoding order. We put each new encoding in front of the ones
+    # we've got already and add Brotli last, so `encodings` lists them from
+    # the most to the least compact. We swap in a new dict rather than
+    # updating the old one, so readers never see a dict in flux.
+
+
+class ComponentSuites:
+    """Serves component suite bundles, compressing each once."""
+
+    def __init__(self, settings: ComponentSuiteSettings):
+        self._settings = settings
+        self._brotli = brotli_module()
+        self._lock = Lock()
+        self._files: Dict[Tuple[str, str], SuiteFile] = {}
+        self._loading: Dict[Tuple[str, str], Lock] = {}
+
+    @staticmethod
+    def _allowed(namespace: str, path: str) -> bool:
+        normalized = posixpath.normpath(path)
+        return namespace in ComponentRegistry.registry and \
+            normalized == path and not path.startswith(('/', '..')) and \
+            path.endswith(SUITE_EXTENSIONS)
+
+    def _load(self, namespace: str, path: str) -> Optional[SuiteFile]:
+        try:
+            content = pkgutil.get_data(namespace, path)
+        except OSError:
+            return None
+        if content is None:
+            return None
+
+        extension = posixpath.splitext(path)[1]
+        media_type = mimetypes.types_map.get(extension,
+                                             'application/octet-stream')
+        suite = SuiteFile(content, media_type)
+        suite.add_encoding('gzip', gzip.compress(
+            content, compresslevel=self._settings.gzip_level, mtime=0
+        ))
+        if self._brotli is not None:
+            Thread(target=self._add_brotli, args=(suite, content),
+                   daemon=True).start()
+        return suite
+    # NOTE. Brotli. At its best quality, Brotli takes seconds to compress
+    # Plotly.js, so we do it in the background and send gzip until it's
+    # done.
+
+    def _add_brotli(self, suite: SuiteFile, content: bytes):
+        try:
+            body = self._brotli.compress(
+                content, quality=self._settings.brotli_quality
+            )
+            suite.add_encoding('br', body)
+        except Exception as e:
+            print(f"Brotli compression of component suite failed: {e}")
+
+    def get(self, namespace: str, fingerprinted_path: str) \
+            -> Optional[Tuple[SuiteFile, bool]]:
+        """Look up a component suite bundle.
+
+        Args:
+            namespace: the Python package of the component library.
+            fingerprinted_path: the path of the bundle within the package,
+                possibly with a Dash fingerprint.
+
+        Returns:
+            The bundle and whether the path had a fingerprint, or `None`
+            if there's no such bundle.
+        """
+        path, has_fingerprint = check_fingerprint(fingerprinted_path)
+        if not self._allowed(namespace, path):
+            return None
+
+        key = (namespace, path)
+        with self._lock:
+            suite = self._files.get(key)
+            if suite is not None:
+                return suite, has_fingerprint
+            load_lock = self._loading.setdefault(key, Lock())
+
+        with load_lock:
+            suite = self._files.get(key)
+            if suite is None:
+                suite = self._load(namespace, path)
+                with self._lock:
+                    if suite is not None:
+                        self._files[key] = suite
+                    self._loading.pop(key, None)
+        if suite is None:
+            return None
+        return suite, has_fingerprint
+    # NOTE. Loading. Compressing a big bundle like Plotly.js takes a while,
+    # so we only make the requests for that same bundle wait, on a lock of
+    # its own, rather than all the requests for any bundle. We drop the
+    # lock once done, so paths of missing bundles don't pile up locks.
+
+
+_component_suites: Optional[ComponentSuites] = None
+_component_suites_lock = Lock()
+
+
+def component_suites() -> ComponentSuites:
+    """Get the process-wide component suites, creating them from the
+    Dazzler settings on first use.
+
+    Returns:
+        The component suites shared by all the boards.
+    """
+    global _component_suites
+    with _component_suites_lock:
+        if _component_suites is None:
+            _component_suites = ComponentSuites(
+                dazzler_config().component_suites
+            )
+        return _component_suites
+
+
+def reset_component_suites():
+    """Drop the process-wide component suites, so the next
+    `component_suites` call creates new ones from the current Dazzler
+    settings.
+    """
+    global _component_suites
+    with _component_suites_lock:
+        _component_suites = None
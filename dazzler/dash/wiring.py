@@ -11,15 +11,20 @@ root. That's done through `WSGIMiddleware`s:
 
 And that's basically what we do here. We put every Dash app into its
 own Flask container instance and then wrap the Flask instance with a
-WSGIMiddleware we then connect to the FastAPI Web container.
+WSGIMiddleware we then connect to the FastAPI Web container. Or, with
+many dashboards, we route all of them through a single `BoardDispatcher`
+rather than mounting each on its own---see the `dispatch` module.
 
 See also:
 - https://github.com/rusnyder/fastapi-plotly-dash
 - https://towardsdatascience.com/embed-multiple-dash-apps-in-flask-with-microsoft-authenticatio-44b734f74532
 """
 from itertools import dropwhile, islice, takewhile
-from pathlib import PurePosixPath
-from typing import Callable, Generator
+from pathlib import Path, PurePosixPath
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, Optional, \
+    Tuple
 
 from dash import Dash
 import dash_bootstrap_components as dbc
@@ -27,8 +32,13 @@ from dash_bootstrap_templates import load_figure_template
 from fastapi import FastAPI
 from fastapi.middleware.wsgi import WSGIMiddleware
 from flask import Flask
+from starlette.routing import Mount
 
-from dazzler.config import BoardAssembly, Settings
+from dazzler.config import BoardAssembly, Settings, dazzler_config
+from dazzler.dash.dispatch import BoardDispatcher, BoardRoutes, PathTrie, \
+    WsgiApp
+from dazzler.dash.metrics import dazzler_metrics, instrument_board
+from dazzler.dash.suites import shared_suite_url
 
 
 DashBuilder = Callable[[Dash], Dash]
@@ -40,6 +50,7 @@ and dashboard logic.
 """
 
 THEME = [dbc.themes.SLATE]
+ASSETS_DIR = Path(__file__).parent / 'assets'
 load_figure_template("slate")  # (*) see NOTE below.
 # NOTE. Theming.
 # We load our themed figure template from dash-bootstrap-templates, add
@@ -47,6 +58,99 @@ load_figure_template("slate")  # (*) see NOTE below.
 # a matching Bootstrap theme for best UI results---see DashboardSubApp.
 
 
+class BoardDash(Dash):
+    """Dash app loading component suites from the URLs all boards share.
+    See the `suites` module.
+    """
+
+    def _collect_and_register_resources(self, resources):
+        srcs = super()._collect_and_register_resources(resources)
+        base_path = self.config.requests_pathname_prefix
+        return [shared_suite_url(src, base_path) if isinstance(src, str)
+                else src for src in srcs]
+# NOTE. Script URLs. Dash renders the script and stylesheet tags of the
+# index page from the URLs this method returns, so that's where we swap
+# in the shared ones. Dash loads the lazy chunks of a bundle, e.g. the
+# Plotly.js graph chunk, relative to the bundle's URL, so they come from
+# the shared URLs too. The Bootstrap theme is a CDN URL, which browsers
+# already share across boards.
+
+
+SETTINGS_CONFIG_KEY = 'DAZZLER_SETTINGS'
+SNAPSHOTS_CONFIG_KEY = 'DAZZLER_ORION_SNAPSHOTS'
+
+
+def settings_for(app: Dash) -> Settings:
+    """Get the settings the given dashboard got assembled with.
+
+    Args:
+        app: the Dash app of the dashboard.
+
+    Returns:
+        The settings `DashboardSubApp` injected into the dashboard's Flask
+        container or the process-wide settings if the dashboard wasn't
+        assembled through `DashboardSubApp`.
+    """
+    return app.server.config.get(SETTINGS_CONFIG_KEY) or dazzler_config()
+
+
+def orion_snapshots_for(app: Dash) -> bool:
+    """Tell if the given dashboard should read latest values from Orion
+    snapshots.
+
+    Args:
+        app: the Dash app of the dashboard.
+
+    Returns:
+        The `orion_snapshots` flag of the dashboard's assembly, `False` if
+        the dashboard wasn't assembled through `DashboardSubApp`.
+    """
+    return bool(app.server.config.get(SNAPSHOTS_CONFIG_KEY))
+
+
+class LazyBoard:
+    """WSGI app that assembles a dashboard on the first request it gets,
+    then hands that and any later request over to the dashboard's Flask
+    container.
+    """
+
+    def __init__(self, assemble: Callable[[], Dash]):
+        """Create a new instance.
+
+        Args:
+            assemble: function to assemble the dashboard.
+        """
+        self._assemble = assemble
+        self._lock = Lock()
+        self._server: Optional[Flask] = None
+
+    def assembled(self) -> bool:
+        return self._server is not None
+
+    def server(self) -> Flask:
+        """Get the dashboard's Flask container, assembling the dashboard
+        if this is the first call.
+
+        Returns:
+            The Flask container.
+        """
+        server = self._server
+        if server is None:
+            with self._lock:
+                if self._server is None:
+                    self._server = self._assemble().server
+                server = self._server
+        return server
+    # NOTE. Thread safety. `WSGIMiddleware` runs WSGI apps in a thread pool,
+    # so a few first requests may well come in at the same time. Only one
+    # of them gets to assemble the board, the others wait for it to finish
+    # and then use the same board. If assembling fails, the next request
+    # has another go.
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable:
+        return self.server()(environ, start_response)
+
+
 class DashboardSubApp:
     """Wires Dash apps into a FastAPI container."""
 
@@ -62,23 +166,82 @@ class DashboardSubApp:
         """
         self._app = app
         self._flask_app_name = flask_app_name
-
-    def _make_board(self, base_path: str) -> Dash:
+        self._config: Optional[Settings] = None
+        self._boards: Dict[str, Tuple[dict, Any]] = {}
+        self._dispatcher: Optional[BoardDispatcher] = None
+        self._compression = PathTrie()
+        self._assembly_times: Dict[str, float] = {}
+        self._assembly_times_lock = Lock()
+
+    def _make_board(self, base_path: str,
+                    orion_snapshots: bool = False) -> Dash:
         flask_app = Flask(self._flask_app_name)
-        return Dash(
+        flask_app.config[SETTINGS_CONFIG_KEY] = self._config
+        flask_app.config[SNAPSHOTS_CONFIG_KEY] = orion_snapshots
+        settings = self._config or dazzler_config()
+        board_class = BoardDash if settings.component_suites.shared else Dash
+        dashapp = board_class(
             server=flask_app,
             # url_base_pathname=base_path,
             requests_pathname_prefix=base_path,
             suppress_callback_exceptions=False,
             prevent_initial_callbacks=True,
-            external_stylesheets=THEME
+            external_stylesheets=THEME,
+            assets_folder=str(ASSETS_DIR)
         )
+        path = BasePath.from_board_app(dashapp)
+        instrument_board(dashapp, path.tenant(), path.service_path(),
+                         path.dashboard_path())
+        return dashapp
+
+    def _build_board(self, builder: DashBuilder, base_path: str,
+                     orion_snapshots: bool) -> Dash:
+        started = time.perf_counter()
+        try:
+            dashapp = builder(self._make_board(base_path, orion_snapshots))
+        except Exception as e:
+            print(f"Assembly of board {base_path} failed: {e}")
+            raise
+        seconds = time.perf_counter() - started
+
+        with self._assembly_times_lock:
+            self._assembly_times[base_path] = seconds
+        print(f"Assembled board {base_path} in {seconds:.3f}s")
+        metrics = dazzler_metrics()
+        if metrics.enabled:
+            path = BasePath.from_board_app(dashapp)
+            metrics.board_assembly_seconds.set(
+                seconds, path.tenant(), path.service_path(),
+                path.dashboard_path()
+            )
+        return dashapp
+
+    def assembly_times(self) -> Dict[str, float]:
+        """Tell how long it took to assemble each dashboard the last time.
+
+        Returns:
+            The seconds it took to assemble each dashboard, by base path.
+            Dashboards that never got assembled yet, since they're still
+            waiting for their first request, aren't in there.
+        """
+        with self._assembly_times_lock:
+            return {p: t for (p, t) in self._assembly_times.items()
+                    if p in self._boards}
+
+    def _lazy(self, warm_up: bool) -> bool:
+        return self._config is not None and self._config.lazy_boards and \
+            not warm_up
 
     def assemble(self, builder: DashBuilder, tenant_name: str,
-                service_path: str = '/', board_path: str = '/'):
+                service_path: str = '/', board_path: str = '/',
+                orion_snapshots: bool = False, warm_up: bool = False,
+                 compress: Optional[bool] = None):
         """Instantiate a Dash dashboard, delegate its filling with app logic
         and widgets, then wire it into FastAPI.
         The Dash app base path will be in the format detailed in `BasePath`.
+        If the settings say to assemble boards lazily, only wire the
+        dashboard into FastAPI and put off the rest until the first request
+        for it comes in.
 
         Args:
             builder: factory function to populate the dashboard with widgets
@@ -87,10 +250,77 @@ class DashboardSubApp:
             service_path: Optional FIWARE service path.
             board_path: Optional dashboard path. Use this to run different
                 dashboard apps for the same tenant.
+            orion_snapshots: Optional flag to make the dashboard read
+                latest values from Orion snapshots.
+            warm_up: Optional flag to assemble the dashboard right away
+                even if the settings say to assemble boards lazily.
+            compress: Optional flag to turn response compression on or off
+                for the dashboard, overriding the compression settings.
         """
         base_path = str(BasePath(tenant_name, service_path, board_path))
-        dashapp = builder(self._make_board(base_path))
-        self._app.mount(base_path, WSGIMiddleware(dashapp.server))
+        args = {
+            'builder': builder, 'tenant_name': tenant_name,
+            'service_path': service_path, 'board_path': board_path,
+            'orion_snapshots': orion_snapshots, 'warm_up': warm_up,
+            'compress': compress
+        }
+        if self._lazy(warm_up):
+            board = LazyBoard(
+                lambda: self._build_board(builder, base_path, orion_snapshots)
+            )
+            self._mount(base_path, args, board)
+        else:
+            dashapp = self._build_board(builder, base_path, orion_snapshots)
+            self._mount(base_path, args, dashapp.server)
+
+    def _mount(self, base_path: str, args: dict, board: WsgiApp):
+        if args['compress'] is None:
+            self._compression.remove(base_path)
+        else:
+            self._compression.add(base_path, args['compress'])
+
+        if self._dispatcher is not None:
+            self._dispatcher.add(base_path, board)
+            self._boards[base_path] = (args, board)
+            return
+
+        route = Mount(base_path, app=WSGIMiddleware(board))
+        routes = self._app.router.routes
+        if base_path in self._boards:
+            old_route = self._boards[base_path][1]
+            routes[routes.index(old_route)] = route
+        else:
+            routes.append(route)
+        self._boards[base_path] = (args, route)
+    # NOTE. Remounting. Replacing the old route in place, rather than
+    # removing it and then appending the new one, means there's no window
+    # of time in which requests for the board would get a 404.
+
+    def _unmount(self, base_path: str):
+        _, mounted = self._boards.pop(base_path)
+        self._compression.remove(base_path)
+        if self._dispatcher is not None:
+            self._dispatcher.remove(base_path)
+        else:
+            self._app.router.routes.remove(mounted)
+
+    def compresses(self, path: str) -> bool:
+        """Tell whether to compress responses to requests for the given
+        path.
+
+        Args:
+            path: the request path.
+
+        Returns:
+            The `compress` flag of the dashboard the path belongs to, if
+            the dashboard has one, the `enabled` flag of the compression
+            settings otherwise.
+        """
+        found = self._compression.longest_prefix(path)
+        if found is not None:
+            return found[1]
+        config = self._config or dazzler_config()
+        return config.compression.enabled
 
     def mount_dashboards(self, config: Settings):
         """Create and mount a Dash dashboard app on FastAPI for each dashboard
@@ -99,8 +329,55 @@ class DashboardSubApp:
         Args:
             config: Dazzler configuration settings.
         """
+        self._config = config
+        if config.dispatch_boards and self._dispatcher is None:
+            self._dispatcher = BoardDispatcher()
+            self._app.router.routes.append(BoardRoutes(self._dispatcher))
         for args in DashboardsConfig(config).assemble_args():
             self.assemble(**args)
+    # NOTE. Dispatching. We only pick how to wire the dashboards the first
+    # time around, so changing `dispatch_boards` takes a restart. Remounting
+    # keeps wiring dashboards the way we started out with.
+
+    def remount_dashboards(self, config: Settings):
+        """Bring the mounted dashboards in line with the given settings.
+        Assemble and mount new dashboards, unmount the ones no longer in
+        the settings and reassemble the ones whose assembly description
+        changed. If anything other than the dashboard descriptions changed,
+        e.g. a backend URL, reassemble all dashboards since they may depend
+        on it.
+
+        Args:
+            config: the new Dazzler configuration settings.
+        """
+        exclude = {'boards'}
+        others_changed = self._config is None or \
+            self._config.dict(exclude=exclude) != config.dict(exclude=exclude)
+        self._config = config
+
+        wanted = {self._base_path_of(args): args
+                  for args in DashboardsConfig(config).assemble_args()}
+
+        for base_path in set(self._boards) - set(wanted):
+            self._unmount(base_path)
+        for (base_path, args) in wanted.items():
+            mounted = self._boards.get(base_path)
+            if others_changed or mounted is None or \
+                    self._normalized(mounted[0]) != self._normalized(args):
+                self.assemble(**args)
+
+    @staticmethod
+    def _normalized(args: dict) -> dict:
+        defaults = {'service_path': '/', 'board_path': '/',
+                    'orion_snapshots': False, 'warm_up': False,
+                    'compress': None}
+        return {**defaults, **args}
+
+    @staticmethod
+    def _base_path_of(args: dict) -> str:
+        xs = DashboardSubApp._normalized(args)
+        return str(BasePath(xs['tenant_name'], xs['service_path'],
+                            xs['board_path']))
 
 
 class DashboardsConfig:
@@ -124,6 +401,12 @@ class DashboardsConfig:
             args['service_path'] = board_spec.service_path
         if board_spec.board_path:
             args['board_path'] = board_spec.board_path
+        if board_spec.orion_snapshots:
+            args['orion_snapshots'] = board_spec.orion_snapshots
+        if board_spec.warm_up:
+            args['warm_up'] = board_spec.warm_up
+        if board_spec.compress is not None:
+            args['compress'] = board_spec.compress
 
         return args
 
@@ -1,13 +1,58 @@
-from fastapi import FastAPI
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 import uvicorn
 
 from dazzler import __version__
-from dazzler.config import dazzler_config
+from dazzler.config import ConfigWatcher, Settings, dazzler_config
+from dazzler.dash.compression import CompressionMiddleware, \
+    preferred_encoding
+from dazzler.dash.fiware import query_cache
+from dazzler.dash.images import IMAGE_CACHE_CONTROL, IMAGES_PATH, etag_for, \
+    image_store
+from dazzler.dash.metrics import CONTENT_TYPE, CacheCollector, \
+    dazzler_metrics
+from dazzler.dash.push import EVENTS_PATH, NOTIFY_PATH, Topic, push_hub
+from dazzler.dash.services import apply_settings
+from dazzler.dash.suites import IMMUTABLE_CACHE_CONTROL, \
+    REVALIDATE_CACHE_CONTROL, SUITES_PATH, component_suites
 from dazzler.dash.wiring import DashboardSubApp
 
 
 app = FastAPI()
-DashboardSubApp(app, __name__).mount_dashboards(dazzler_config())
+config = dazzler_config()
+dashboards = DashboardSubApp(app, __name__)
+dashboards.mount_dashboards(config)
+dazzler_metrics().registry.register(
+    CacheCollector('dazzler_query_cache', lambda: query_cache().stats())
+)
+app.add_middleware(CompressionMiddleware, settings=config.compression,
+                   policy=dashboards.compresses)
+# NOTE. Compression. The middleware is always there, but only compresses
+# what `compresses` says to, so boards can opt in and out through hot
+# reloads. Responses that are already compressed, like component suite
+# bundles, go through as they are.
+
+
+def reload_dashboards(settings: Settings):
+    global config
+    pending = apply_settings(config, settings)
+    if pending:
+        print("Restart Dazzler to apply the new settings of: " +
+              ', '.join(pending))
+    config = settings
+    dashboards.remount_dashboards(settings)
+
+
+@app.on_event('startup')
+def start_config_watcher():
+    if config.hot_reload_interval:
+        ConfigWatcher(config.hot_reload_interval, reload_dashboards).start()
+# NOTE. Workers. When `dazzler.serve` forks workers, each has its own copy
+# of the mounted dashboards, so each needs a watcher of its own to remount
+# them. Threads don't survive a fork, hence we start the watcher when the
+# server starts rather than when importing the module.
 
 
 @app.get('/')
@@ -20,5 +65,74 @@ def read_version():
     return read_root()
 
 
+@app.get("/cache/stats")
+def read_cache_stats():
+    return query_cache().stats()
+
+
+@app.get("/metrics")
+def read_metrics():
+    return Response(content=dazzler_metrics().render(),
+                    media_type=CONTENT_TYPE)
+
+
+@app.post(NOTIFY_PATH)
+def receive_notification(notification: dict,
+                         fiware_service: Optional[str] = Header(None),
+                         fiware_servicepath: Optional[str] = Header(None)):
+    entities = notification.get('data', [])
+    push_hub().publish(fiware_service, fiware_servicepath, entities)
+
+
+@app.get(EVENTS_PATH)
+def stream_events(tenant: str, service_path: str = '/',
+                  entity_type: List[str] = Query(...)):
+    topics = [Topic.of(tenant, service_path, t) for t in entity_type]
+    return StreamingResponse(push_hub().stream(topics),
+                             media_type='text/event-stream')
+
+
+@app.get(IMAGES_PATH + '/{digest}.jpg')
+def read_image(digest: str, if_none_match: Optional[str] = Header(None)):
+    headers = {'ETag': etag_for(digest), 'Cache-Control': IMAGE_CACHE_CONTROL}
+    if if_none_match and etag_for(digest) in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    content = image_store().get(digest)
+    if content is None:
+        raise HTTPException(status_code=404)
+    return Response(content=content, media_type='image/jpeg',
+                    headers=headers)
+# NOTE. Conditional requests. Images are addressed by content digest, so
+# if the browser's got an image with the digest it's asking for, then it's
+# got the right image and we can answer 304 without even looking it up.
+
+
+@app.get(SUITES_PATH + '/{namespace}/{path:path}')
+def read_component_suite(namespace: str, path: str,
+                         accept_encoding: Optional[str] = Header(None),
+                         if_none_match: Optional[str] = Header(None)):
+    found = component_suites().get(namespace, path)
+    if found is None:
+        raise HTTPException(status_code=404)
+
+    suite, fingerprinted = found
+    cache_control = IMMUTABLE_CACHE_CONTROL if fingerprinted \
+        else REVALIDATE_CACHE_CONTROL
+    headers = {'ETag': suite.etag, 'Cache-Control': cache_control,
+               'Vary': 'Accept-Encoding'}
+    if if_none_match and suite.etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    encoding = preferred_encoding(accept_encoding, suite.encodings())
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(content=suite.body(encoding),
+                    media_type=suite.media_type, headers=headers)
+# NOTE. Compressed bundles. We send each bundle in the most compact
+# encoding the browser accepts, so caches in between have to keep a copy
+# for each encoding, hence the `Vary` header.
+
+
 if __name__ == '__main__':
     uvicorn.run(app)
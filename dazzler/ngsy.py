@@ -77,6 +77,9 @@ class WorkerEntity(BaseEntity):
     workerStates: Optional[StructuredValueAttr]
 
 
+WORKER_FATIGUE_PATH = 'workerStates.fatigue.level.value'
+
+
 TASK_EXECUTION_TYPE = 'TaskExecution'
 
 
@@ -96,3 +99,6 @@ EQUIPMENT_IOT_MEASUREMENT = 'EquipmentIoTMeasurement'
 class EquipmentIoTMeasurementEntity(BaseEntity):
     type = EQUIPMENT_IOT_MEASUREMENT
     fields: Optional[StructuredValueAttr]
+
+
+EQUIPMENT_BUFFER_LEVEL_PATH = 'fields.bufferLevel.value1'
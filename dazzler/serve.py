@@ -0,0 +1,179 @@
+"""
+Pre-fork launcher to serve Dazzler with several worker processes.
+
+A single Uvicorn process runs all the Dash callbacks of all the tenants
+on the same interpreter, so CPU-bound work like building plotly figures
+can only ever use one core. This launcher binds the server socket and
+assembles the dashboards once, in the parent process, then forks worker
+processes that all accept connections on that socket. Since assembling
+the dashboards happens before the fork, the workers share the memory it
+took copy-on-write rather than each building its own copy. Boards may
+read data while getting assembled, which starts the background threads
+of services like prefetching, so the parent stops those threads before
+forking and each worker starts its own on first use. The parent keeps
+an eye on the workers and starts a new one whenever one dies.
+
+Run it with
+
+    $ python -m dazzler.serve --workers 4
+
+Workers can share query results and rendered images through the query
+cache `shared` store, otherwise each worker queries the backends on its
+own and the images some boards render can only be fetched from the worker
+that rendered them. Each worker also
+keeps its own metrics. Push mode needs a single worker though, since an
+Orion notification only reaches the worker that accepts the connection.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from dazzler.config import dazzler_config
+from dazzler.dash.services import pause_services
+
+
+WORKERS_ENV_VAR_NAME = 'DAZZLER_WORKERS'
+
+RESPAWN_DELAY = 1.0
+"""How many seconds to wait before replacing a worker that died."""
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Forks Uvicorn workers sharing a socket and the assembled app."""
+
+    def __init__(self, app: str, host: str, port: int, workers: int,
+                 log_level: str = 'info'):
+        """Create a new instance.
+
+        Args:
+            app: the import string of the ASGI app, e.g. `dazzler.main:app`.
+            host: the address to bind to.
+            port: the port to listen on.
+            workers: how many worker processes to run.
+            log_level: the Uvicorn log level.
+        """
+        self._app_path = app
+        self._host = host
+        self._port = port
+        self._workers = workers
+        self._log_level = log_level
+        self._pids: Dict[int, int] = {}
+        self._stopping = False
+
+    def _load_app(self) -> Any:
+        app = import_from_string(self._app_path)
+        pause_services()
+        gc.collect()
+        gc.freeze()
+        return app
+    # NOTE. Background threads. Only the forking thread makes it to the
+    # child, but the child gets all the locks as they were at the time of
+    # the fork. So if a prefetch thread held, say, the query cache lock
+    # when we forked, the child would hang as soon as it touched the
+    # cache. Pausing the services joins their threads first, which also
+    # stops the parent from polling the backends while it supervises.
+    # NOTE. Freezing. CPython writes to every object's header when the
+    # garbage collector scans it, which would make each worker copy most
+    # of the memory pages it shares with the parent. Moving everything
+    # we've got after assembly to the permanent generation keeps the
+    # collector away from it.
+
+    def _spawn(self, slot: int, app: Any, sock: socket.socket):
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = slot
+            return
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        status = 0
+        try:
+            config = uvicorn.Config(app, log_level=self._log_level)
+            uvicorn.Server(config).run(sockets=[sock])
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _stop(self, signum: int, frame: Any):
+        self._stopping = True
+        for pid in list(self._pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start the workers and supervise them until we get a SIGTERM or
+        SIGINT, then stop them and wait for them to exit.
+        """
+        if self._workers > 1 and dazzler_config().push.enabled:
+            print("Push mode only works with one worker, live boards in "
+                  "other workers may miss updates.")
+        sock = bind_socket(self._host, self._port)
+        app = self._load_app()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self._workers):
+            self._spawn(slot, app, sock)
+
+        while self._pids:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self._pids.pop(pid, None)
+            if slot is not None and not self._stopping:
+                print(f"Dazzler worker {pid} died, starting a new one.")
+                time.sleep(RESPAWN_DELAY)
+                self._spawn(slot, app, sock)
+        sock.close()
+    # NOTE. Signals. Workers go back to the default signal handlers since
+    # Uvicorn installs its own for graceful shutdown. The parent forwards
+    # SIGTERM to each worker, and lets them finish serving what they've got
+    # in flight, on SIGINT too since Ctrl+C in a terminal sends SIGINT to
+    # the workers directly as well.
+
+
+def default_workers() -> int:
+    return int(os.environ.get(WORKERS_ENV_VAR_NAME, '1'))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description='Serve Dazzler with several worker processes.'
+    )
+    parser.add_argument('--app', default='dazzler.main:app')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help=f"defaults to ${WORKERS_ENV_VAR_NAME} or 1")
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args(argv)
+
+    PreforkServer(args.app, args.host, args.port, args.workers,
+                  args.log_level).run()
+
+
+if __name__ == '__main__':
+    main()
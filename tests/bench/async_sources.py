@@ -0,0 +1,87 @@
+"""
+Throughput of board callbacks fetching several series from a slow QL.
+
+Simulates a pool of WSGI worker threads each running callbacks that need
+a handful of entity series. The baseline fetches them one after the other
+through `QuantumLeapSource`, the contender fetches them concurrently
+through `AsyncQuantumLeapSource` and the `AsyncBridge`. Query caching is
+off so every fetch hits the stub. Keep in mind the async sources send
+at most `http.max_concurrency` requests to QL at the same time.
+
+Run with
+
+    $ python -m tests.bench.async_sources [delay] [series] [threads]
+
+where `delay` is how many seconds QL takes to answer a query, `series`
+how many series each callback fetches and `threads` how many worker
+threads run callbacks at the same time.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
+from typing import Callable
+
+from dash import Dash
+from fastapi import FastAPI
+
+from dazzler.config import QueryCacheSettings, Settings
+from dazzler.dash.bridge import async_bridge
+from dazzler.dash.fiware import AsyncQuantumLeapSource, QuantumLeapSource
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+from tests.util.qlstub import QlStub
+
+
+CALLBACKS = 64
+
+
+def board_app(ql_base_url: str) -> Dash:
+    cfg = Settings(quantumleap_base_url=ql_base_url,
+                   query_cache=QueryCacheSettings(default_ttl=0))
+    wiring = DashboardSubApp(FastAPI(), 'bench')
+    wiring._config = cfg
+    return wiring._make_board(str(BasePath(tenant_name='bench')))
+
+
+def serial_callback(app: Dash, series: int) -> Callable[[], list]:
+    source = QuantumLeapSource(app)
+    return lambda: [
+        source.fetch_entity_series(f"e{k}", 'T', entries_from_latest=10)
+        for k in range(series)
+    ]
+
+
+def concurrent_callback(app: Dash, series: int) -> Callable[[], list]:
+    source = AsyncQuantumLeapSource(app)
+    return lambda: async_bridge().gather(*[
+        source.fetch_entity_series(f"e{k}", 'T', entries_from_latest=10)
+        for k in range(series)
+    ])
+
+
+def throughput(callback: Callable[[], list], threads: int) -> float:
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.monotonic()
+        list(pool.map(lambda _: callback(), range(CALLBACKS)))
+        elapsed = time.monotonic() - start
+    return CALLBACKS / elapsed
+
+
+def run(delay: float, series: int, threads: int):
+    ql = QlStub(delay=delay).start()
+    try:
+        app = board_app(ql.base_url)
+        print(f"QL delay: {delay}s, series per callback: {series}, "
+              f"worker threads: {threads}, callbacks: {CALLBACKS}")
+        for (name, make) in [('serial', serial_callback),
+                             ('concurrent', concurrent_callback)]:
+            rate = throughput(make(app, series), threads)
+            print(f"{name:>12}: {rate:8.1f} callbacks/s")
+    finally:
+        ql.stop()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(delay=float(args[0]) if len(args) > 0 else 0.1,
+        series=int(args[1]) if len(args) > 1 else 4,
+        threads=int(args[2]) if len(args) > 2 else 8)
@@ -0,0 +1,104 @@
+"""
+Routing cost with many dashboards: a Starlette mount per dashboard vs
+routing all of them through a `BoardDispatcher`.
+
+For each wiring, mounts the given number of dashboards, spread across
+tenants ten to a tenant, then measures
+- how long it takes the FastAPI router to find the route of a request
+  for the first and last dashboard mounted;
+- the latency of a whole Dash layout request for the last dashboard,
+  through Starlette's test client;
+- how much memory mounting the dashboards took, as traced by
+  `tracemalloc`, after a warm-up round so one-off allocations, e.g. of
+  Dash's component registry, don't count.
+
+Run with
+
+    $ python -m tests.bench.board_routing [boards] [requests]
+
+where `boards` defaults to 500 and `requests` to 200.
+"""
+from contextlib import redirect_stdout
+import gc
+import io
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from dash import Dash, html
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.routing import Match
+
+from dazzler.config import BoardAssembly, Settings
+from dazzler.dash.wiring import DashboardSubApp
+
+
+def builder(app: Dash) -> Dash:
+    app.layout = html.Div('bench')
+    return app
+
+
+def config(boards: int, dispatch: bool) -> Settings:
+    tenants = {}
+    for k in range(boards):
+        tenants.setdefault(f"tenant{k // 10}", []).append(
+            BoardAssembly(builder='tests.bench.board_routing.builder',
+                          board_path=f"board{k % 10}")
+        )
+    return Settings(boards=tenants, dispatch_boards=dispatch)
+
+
+def mounted(cfg: Settings) -> (FastAPI, float):
+    gc.collect()
+    tracemalloc.start()
+    app = FastAPI()
+    with redirect_stdout(io.StringIO()):
+        DashboardSubApp(app, 'bench').mount_dashboards(cfg)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return app, size / 2**20
+
+
+def route_lookup(app: FastAPI, path: str, rounds: int = 2000) -> float:
+    scope = {'type': 'http', 'path': path, 'root_path': '', 'method': 'POST'}
+    routes = app.router.routes
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for route in routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                break
+    return (time.perf_counter() - start) / rounds
+
+
+def request_latency(app: FastAPI, path: str, requests: int) -> float:
+    client = TestClient(app)
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        assert client.get(path).status_code == 200
+    return (time.perf_counter() - start) / requests
+
+
+def run(boards: int, requests: int):
+    last = boards - 1
+    first_path = '/dazzler/tenant0/-/board0/_dash-update-component'
+    last_path = f"/dazzler/tenant{last // 10}/-/board{last % 10}/"
+    mounted(config(10, True))
+    print(f"{boards} boards")
+    for (name, dispatch) in [('mounts', False), ('dispatcher', True)]:
+        app, mib = mounted(config(boards, dispatch))
+        first = route_lookup(app, first_path)
+        routed = route_lookup(app, last_path + '_dash-update-component')
+        latency = request_latency(app, last_path + '_dash-layout', requests)
+        print(f"{name:>10}: route first {first * 1e6:7.1f} us, "
+              f"last {routed * 1e6:7.1f} us, "
+              f"layout request {latency * 1e3:6.2f} ms, "
+              f"mounting {mib:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    args: List[int] = [int(x) for x in sys.argv[1:]]
+    run(args[0] if args else 500, args[1] if len(args) > 1 else 200)
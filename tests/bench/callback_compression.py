@@ -0,0 +1,124 @@
+"""
+Payload size and server CPU time of a Dash callback sending a figure,
+with and without response compression.
+
+Mounts a board whose callback returns a line chart of `series` entity
+attributes with `points` points each, like the time series boards do,
+then posts callback requests straight to the ASGI app, so the CPU time
+we measure is all the server's: routing, running the callback,
+serialising the figure and compressing it. The board builds the figure
+once up front, as if it came from the figure cache, so building it
+doesn't drown out the rest. Compares sending the figure as is with gzip
+and Brotli at the default compression settings.
+
+Run with
+
+    $ python -m tests.bench.callback_compression [series] [points] [calls]
+
+which default to 5 series of 2000 points and 50 calls.
+"""
+import asyncio
+from contextlib import redirect_stdout
+import io
+import json
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+from dash import Dash, Input, Output, dcc, html
+from fastapi import FastAPI
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from dazzler.config import CompressionSettings, Settings
+from dazzler.dash.compression import CompressionMiddleware
+from dazzler.dash.wiring import DashboardSubApp
+
+
+def figure_board(series: int, points: int) -> Callable[[Dash], Dash]:
+    index = pd.date_range('2022-01-01', periods=points, freq='S')
+    rng = np.random.default_rng(42)
+    frame = pd.DataFrame({f"attr{k}": rng.normal(size=points).cumsum()
+                          for k in range(series)}, index=index)
+    figure = px.line(frame)
+
+    def builder(app: Dash) -> Dash:
+        app.layout = html.Div([html.Div(id='in'), dcc.Graph(id='graph')])
+        app.callback(Output('graph', 'figure'), Input('in', 'children'))(
+            lambda _: figure
+        )
+        return app
+    return builder
+
+
+def mk_app(builder: Callable[[Dash], Dash],
+           encoding: Optional[str]) -> FastAPI:
+    app = FastAPI()
+    target = DashboardSubApp(app, 'bench')
+    with redirect_stdout(io.StringIO()):
+        target.mount_dashboards(Settings())
+        target.assemble(builder, 'bench', compress=encoding is not None)
+    app.add_middleware(CompressionMiddleware, settings=CompressionSettings(),
+                       policy=target.compresses)
+    return app
+
+
+BODY = json.dumps({
+    'output': 'graph.figure',
+    'outputs': {'id': 'graph', 'property': 'figure'},
+    'inputs': [{'id': 'in', 'property': 'children', 'value': 1}],
+    'changedPropIds': ['in.children']
+}).encode()
+
+
+async def call(app: FastAPI, encoding: Optional[str]) -> Tuple[int, str]:
+    headers = [(b'content-type', b'application/json'),
+               (b'content-length', str(len(BODY)).encode()),
+               (b'accept-encoding', (encoding or 'identity').encode())]
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'POST',
+             'scheme': 'http', 'path': '/dazzler/bench/-/_dash-update-'
+             'component', 'raw_path': b'', 'root_path': '',
+             'query_string': b'', 'headers': headers,
+             'server': ('bench', 80), 'client': ('bench', 1234)}
+    sent: List[dict] = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': BODY, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    assert sent[0]['status'] == 200
+    start = dict(sent[0]['headers'])
+    size = sum(len(m.get('body', b'')) for m in sent[1:])
+    return size, start.get(b'content-encoding', b'identity').decode()
+
+
+async def measure(builder: Callable[[Dash], Dash], encoding: Optional[str],
+                  calls: int) -> Tuple[int, float]:
+    app = mk_app(builder, encoding)
+    size, sent_as = await call(app, encoding)
+    assert sent_as == (encoding or 'identity')
+
+    start = time.process_time()
+    for _ in range(calls):
+        await call(app, encoding)
+    return size, (time.process_time() - start) / calls
+
+
+def run(series: int, points: int, calls: int):
+    builder = figure_board(series, points)
+    print(f"{series} series x {points} points, {calls} calls")
+    plain = None
+    for encoding in (None, 'gzip', 'br'):
+        size, cpu = asyncio.run(measure(builder, encoding, calls))
+        plain = plain or size
+        print(f"{encoding or 'none':>5}: {size / 1024:8.1f} KiB "
+              f"({size / plain:4.0%}), CPU {cpu * 1e3:6.1f} ms per call")
+
+
+if __name__ == '__main__':
+    args = [int(x) for x in sys.argv[1:]] + [5, 2000, 50][len(sys.argv) - 1:]
+    run(*args[:3])
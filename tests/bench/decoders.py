@@ -0,0 +1,69 @@
+"""
+Cost of converting Quantum Leap series to data frames.
+
+Decodes the QL JSON of an entity type query, i.e. a series for each of
+many entities, with both the default decoder, which lets pandas infer
+column types, and the columnar one, which builds typed NumPy arrays.
+
+Run with
+
+    $ python -m tests.bench.decoders [entities] [points]
+
+where `entities` is how many entity series to decode and `points` how
+many data points each series has.
+"""
+import json
+import sys
+import time
+
+from dazzler.dash.fiware import columnar_series_frame, entity_type_frames, \
+    series_frame
+
+
+ROUNDS = 5
+
+
+def ql_payload(entities: int, points: int) -> dict:
+    index = [f"2022-08-06T{(k // 3600) % 24:02d}:{(k // 60) % 60:02d}:"
+             f"{k % 60:02d}.{k % 1000:03d}+00:00" for k in range(points)]
+    series = {
+        'index': index,
+        'attributes': [
+            {'attrName': 'roughness',
+             'values': [k * 0.1 for k in range(points)]},
+            {'attrName': 'count',
+             'values': [None if k % 10 == 0 else k for k in range(points)]},
+            {'attrName': 'ok', 'values': [k % 2 == 0 for k in range(points)]}
+        ]
+    }
+    return {
+        'entityType': 'T',
+        'entities': [dict(series, entityId=f"e{k}") for k in range(entities)]
+    }
+
+
+def best_time(decoder, raw: str) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        payload = json.loads(raw)
+        start = time.perf_counter()
+        entity_type_frames(payload, decoder)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(entities: int, points: int):
+    raw = json.dumps(ql_payload(entities, points))
+    print(f"entities: {entities}, points per series: {points}, "
+          f"best of {ROUNDS}")
+    baseline = best_time(series_frame, raw)
+    columnar = best_time(columnar_series_frame, raw)
+    print(f"{'pandas':>10}: {baseline * 1000:8.1f} ms")
+    print(f"{'columnar':>10}: {columnar * 1000:8.1f} ms "
+          f"({baseline / columnar:.1f}x)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(entities=int(args[0]) if len(args) > 0 else 200,
+        points=int(args[1]) if len(args) > 1 else 1000)
@@ -0,0 +1,82 @@
+"""
+Cost of aggregating worker fatigue into line fatigue on a FAMS refresh.
+
+Compares what the board used to do---resample each worker's series, then
+concat the resampled frames one at a time and group by minute---with
+the single-pass group-by pipeline `FatigueDashboard` runs now, on
+a 10-minute window of Worker series. Also checks both come up with the
+same line fatigue.
+
+Run with
+
+    $ python -m tests.bench.fams_workers [samples] [workers ...]
+
+where `samples` is how many samples each worker has in the window and
+the worker counts default to 10, 100, 1000 and 5000.
+"""
+import sys
+import time
+from typing import Dict, List
+
+from dash import Dash
+import numpy as np
+import pandas as pd
+
+from dazzler.dash.board.fams import FATIGUE, FatigueDashboard
+
+
+def worker_frames(workers: int, samples: int,
+                  dti: pd.DatetimeIndex) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(42)
+    index = pd.date_range(dti[0], dti[-1], periods=samples)
+    return {
+        f"urn:ngsi-ld:Worker:{k}": pd.DataFrame({
+            'index': index,
+            'workerStates': [{'fatigue': {'level': {'value': v}}}
+                             for v in rng.uniform(0, 10, samples)]
+        })
+        for k in range(workers)
+    }
+
+
+def concat_loop(board: FatigueDashboard, dti: pd.DatetimeIndex,
+                r: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    worker_data = {
+        k: FATIGUE.extract(r[k].set_index('index')).resample('T').mean()
+        .to_frame(name=f'Line{board._worker_line(k) + 1}')
+        for k in r if r[k]['workerStates'].any()
+    }
+    fatigue_df = board._empty_dataset(dti)
+    for worker_df in worker_data.values():
+        fatigue_df = pd.concat([fatigue_df, worker_df])
+    return fatigue_df.groupby(fatigue_df.index).mean()
+
+
+def single_pass(board: FatigueDashboard, dti: pd.DatetimeIndex,
+                r: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    return board._fetch_workers_data(dti, r)[1]
+
+
+def timed(pipeline, board, dti, r) -> (float, pd.DataFrame):
+    start = time.perf_counter()
+    result = pipeline(board, dti, r)
+    return time.perf_counter() - start, result
+
+
+def run(samples: int, worker_counts: List[int]):
+    board = FatigueDashboard.__new__(FatigueDashboard)
+    dti = board._date_time_index_utc()
+    print(f"samples per worker: {samples}")
+    for workers in worker_counts:
+        r = worker_frames(workers, samples, dti)
+        old, want = timed(concat_loop, board, dti, r)
+        new, got = timed(single_pass, board, dti, r)
+        pd.testing.assert_frame_equal(got, want, check_freq=False)
+        print(f"{workers:>6} workers: old {old * 1e3:9.1f} ms, "
+              f"new {new * 1e3:8.1f} ms ({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(samples=int(args[0]) if args else 60,
+        worker_counts=[int(x) for x in args[1:]] or [10, 100, 1000, 5000])
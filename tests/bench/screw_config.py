@@ -0,0 +1,60 @@
+"""
+Per-tick cost of rendering the smart collaboration configuration image.
+
+Compares what the board used to do on every tick---read the photo from
+disk, draw the screw boxes, JPEG and base64-encode the result---with
+looking up the image URL in `ScrewConfigImages`, cycling through a
+handful of configurations like a live board would. Also prints how many
+bytes each tick sends down the wire: the whole data URI before, just the
+URL now since browsers cache the image itself.
+
+Run with
+
+    $ python -m tests.bench.screw_config [ticks]
+"""
+import base64
+import sys
+import time
+from typing import Tuple
+
+import cv2
+
+from dazzler.dash.board.screwconfig import FRAME_IMAGE_PATH, \
+    SCREW_COORDS, ScrewConfigImages
+
+
+CONFIGURATIONS = [[(k >> s) & 1 for s in range(len(SCREW_COORDS))]
+                  for k in (0b101010101, 0b111000111, 0b000111000)]
+
+
+def render_from_scratch(configuration) -> str:
+    img = cv2.imread(FRAME_IMAGE_PATH)
+    for position, present in zip(SCREW_COORDS, configuration):
+        color = (0, 255, 0) if present == 1 else (0, 0, 255)
+        cv2.rectangle(img, (position[0], position[1]),
+                      (position[2], position[3]), color, 5)
+    jpeg = cv2.imencode('.jpg', img)[1]
+    return f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('ascii')}"
+
+
+def per_tick(render, ticks: int) -> Tuple[float, float]:
+    sent = 0
+    start = time.perf_counter()
+    for k in range(ticks):
+        sent += len(render(CONFIGURATIONS[k % len(CONFIGURATIONS)]))
+    return (time.perf_counter() - start) / ticks, sent / ticks
+
+
+def run(ticks: int):
+    images = ScrewConfigImages()
+    old, old_sent = per_tick(render_from_scratch, ticks)
+    new, new_sent = per_tick(images.url, ticks)
+    print(f"ticks: {ticks}")
+    print(f"{'old':>6}: {old * 1e6:10.1f} us/tick {old_sent:10.0f} B/tick")
+    print(f"{'new':>6}: {new * 1e6:10.1f} us/tick {new_sent:10.0f} B/tick "
+          f"({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(ticks=int(args[0]) if args else 300)
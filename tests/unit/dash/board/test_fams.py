@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+import numpy as np
+import pandas as pd
+
+from dazzler.config import Settings
+from dazzler.dash.board.fams import FatigueDashboard
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+
+
+def board():
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings()
+    app = wiring._make_board(str(BasePath(tenant_name='t1')))
+    return FatigueDashboard(app)
+
+
+def worker_frame(minute, samples):
+    return pd.DataFrame({
+        'index': [minute + pd.Timedelta(seconds=s) for (s, _) in samples],
+        'workerStates': [
+            None if v is None else {'fatigue': {'level': {'value': v}}}
+            for (_, v) in samples
+        ]
+    })
+
+
+def test_line_fatigue_averages_worker_means():
+    dashboard = board()
+    dti = dashboard._date_time_index_utc()
+    minute = dti[-1].floor('T')
+    r = {
+        'w0': worker_frame(minute, [(5, 2), (10, 4)]),
+        'w3': worker_frame(minute, [(1, 6)]),
+        'w1': worker_frame(minute, [(0, 1)]),
+        'w2': worker_frame(minute, [(0, None)])
+    }
+
+    workers, fatigue = dashboard._fetch_workers_data(dti, r)
+
+    assert workers['workers'].to_dict() == {'Line1': 2, 'Line2': 1}
+    assert list(fatigue.columns) == ['Line1', 'Line2', 'Line3']
+    assert len(fatigue) == len(dti)
+    assert fatigue.loc[minute].tolist()[:2] == [4.5, 1.0]
+    assert np.isnan(fatigue.loc[minute, 'Line3'])
+    assert fatigue.drop(index=minute).isna().all().all()
+
+
+def test_line_fatigue_without_workers():
+    dashboard = board()
+    dti = dashboard._date_time_index_utc()
+
+    workers, fatigue = dashboard._fetch_workers_data(dti, {})
+
+    assert workers.empty
+    assert fatigue.isna().all().all()
+    assert len(fatigue) == len(dti)
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+
+from dazzler.dash.board.screwconfig import ScrewConfigImages, \
+    draw_configuration, screw_mask
+from dazzler.dash.images import IMAGES_PATH, ImageStore, content_digest
+
+
+@pytest.mark.parametrize('configuration, want', [
+    (None, None),
+    ([], 0),
+    ([1, 0, 1], 0b101),
+    ([0, 0, 0, 0, 0, 0, 0, 0, 1], 0b100000000),
+    ([1] * 12, 0b111111111)
+])
+def test_screw_mask(configuration, want):
+    assert screw_mask(configuration) == want
+
+
+def test_draw_configuration_leaves_photo_alone():
+    photo = np.zeros((500, 600, 3), dtype=np.uint8)
+    drawn = draw_configuration(photo, 0b1)
+
+    assert not photo.any()
+    assert tuple(drawn[127, 15]) == (0, 255, 0)
+    assert tuple(drawn[54, 126]) == (0, 0, 255)
+
+
+def test_render_each_configuration_once():
+    store = ImageStore()
+    images = ScrewConfigImages(store=store)
+    first = images.url([1, 0, 1])
+
+    assert images.url([1, 0, 1, 0]) == first
+    assert images.url([0, 1, 1]) != first
+    assert images.url() != first
+    assert images._encoded(screw_mask([1, 0, 1])) is \
+        images._encoded(screw_mask([1, 0, 1, 0]))
+
+
+def test_images_are_jpegs_in_the_store():
+    store = ImageStore()
+    url = ScrewConfigImages(store=store).url([1, 1])
+    digest = url.rsplit('/', 1)[-1][:-len('.jpg')]
+    content = store.get(digest)
+    jpeg = np.frombuffer(content, np.uint8)
+
+    assert url.startswith(IMAGES_PATH)
+    assert content_digest(content) == digest
+    assert cv2.imdecode(jpeg, cv2.IMREAD_COLOR) is not None
+
+
+def test_put_back_evicted_images():
+    store = ImageStore(max_entries=1)
+    images = ScrewConfigImages(store=store)
+    url = images.url([1])
+    digest = url.rsplit('/', 1)[-1][:-len('.jpg')]
+    images.url([0, 1])
+
+    assert store.get(digest) is None
+    assert images.url([1]) == url
+    assert store.get(digest) is not None
+
+
+def test_bounded_cache():
+    images = ScrewConfigImages(max_entries=2, store=ImageStore())
+    first = images._encoded(screw_mask([1]))
+    images.url([0, 1])
+    images.url([0, 0, 1])
+
+    assert images._encoded(screw_mask([1])) is not first
@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+
+from dazzler.config import Settings
+from dazzler.dash.board.smart_collaboration_light import \
+    SmartCollaborationLightDashboard
+from dazzler.dash.fiware import OrionSource
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+
+
+class FakeHttp:
+
+    def __init__(self, page):
+        self.page = page
+        self.calls = []
+
+    def get_json(self, rel_path, params=None):
+        self.calls.append((rel_path, params))
+        return self.page
+
+
+def board_app():
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings()
+    return wiring._make_board(str(BasePath(tenant_name='t1')))
+
+
+def test_fetch_latest_entity():
+    source = OrionSource(board_app())
+    source._http = FakeHttp([{'id': 'x2', 'type': 'T', 'a': 1}])
+    entity = source.fetch_latest_entity('T', attrs=['a', 'b'])
+
+    assert entity == {'id': 'x2', 'type': 'T', 'a': 1}
+    assert source._http.calls == [('/v2/entities', {
+        'type': 'T', 'options': 'keyValues', 'orderBy': '!dateModified',
+        'limit': 1, 'attrs': 'a,b'
+    })]
+
+
+def test_fetch_latest_entity_without_entities():
+    source = OrionSource(board_app())
+    source._http = FakeHttp([])
+
+    assert source.fetch_latest_entity('T') is None
+
+
+def test_light_board_fetches_config_once_per_tick():
+    board = SmartCollaborationLightDashboard(board_app())
+    board._orion._http = FakeHttp([{
+        'id': 'te1', 'type': 'TaskExecution',
+        'additionalParameters': {'sequence': [1, 0, 1, 1]}
+    }])
+    src, number = board._update_config_and_number(1)
+
+    assert len(board._orion._http.calls) == 1
+    assert src == board._config_images.url([1, 0, 1, 1])
+    assert number[0].children == 'Assigned screws: 3'
+
+
+def test_light_board_without_config():
+    board = SmartCollaborationLightDashboard(board_app())
+    board._orion._http = FakeHttp([])
+    src, number = board._update_config_and_number(1)
+
+    assert src == board._config_images.url()
+    assert number[0].children == 'Assigned screws: -'
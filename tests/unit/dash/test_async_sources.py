@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+from dash import Dash
+from fastapi import FastAPI
+import pytest
+
+from dazzler.config import QueryCacheSettings, Settings
+from dazzler.dash.bridge import AsyncBridge
+from dazzler.dash.cache import QueryCache
+from dazzler.dash.fiware import AsyncQuantumLeapSource, QuantumLeapSource, \
+    SeriesQuery
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+from tests.util.qlstub import QlStub
+
+
+@pytest.fixture
+def ql():
+    stub = QlStub(delay=0.2).start()
+    yield stub
+    stub.stop()
+
+
+def board_app(ql: QlStub, ttl: float = 0) -> Dash:
+    cfg = Settings(quantumleap_base_url=ql.base_url,
+                   query_cache=QueryCacheSettings(default_ttl=ttl))
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = cfg
+    return wiring._make_board(str(BasePath(tenant_name='t1')))
+
+
+def test_bridge_runs_coroutines_concurrently():
+    bridge = AsyncBridge()
+
+    async def nap(x):
+        await asyncio.sleep(0.2)
+        return x
+
+    start = time.monotonic()
+    got = bridge.gather(nap(1), nap(2), nap(3))
+    elapsed = time.monotonic() - start
+
+    assert got == [1, 2, 3]
+    assert elapsed < 0.5
+
+
+def test_bridge_propagates_errors():
+    bridge = AsyncBridge()
+
+    async def boom():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        bridge.run(boom())
+
+
+def test_bridge_refuses_calls_from_its_own_loop():
+    bridge = AsyncBridge()
+
+    async def nested():
+        async def noop():
+            pass
+        bridge.run(noop())
+
+    with pytest.raises(RuntimeError):
+        bridge.run(nested())
+
+
+def test_paused_bridge_starts_new_loop():
+    bridge = AsyncBridge()
+
+    async def loop():
+        return asyncio.get_running_loop()
+
+    first = bridge.run(loop())
+    bridge.pause()
+
+    assert first.is_closed()
+    assert bridge.run(loop()) is not first
+    bridge.pause()
+
+
+def test_async_cache_coalesces_with_threads():
+    cache = QueryCache(max_bytes=1024, sizeof=lambda _: 1)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'v'
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.get_or_fetch_async('k', 10, fetch) for _ in range(5)]
+        )
+
+    assert AsyncBridge().run(run()) == ['v'] * 5
+    assert cache.get_or_fetch('k', 10, lambda: 'other') == 'v'
+    assert len(calls) == 1
+    assert cache.stats().coalesced == 4
+
+
+def test_async_source_fetches_series_concurrently(ql):
+    source = AsyncQuantumLeapSource(board_app(ql))
+    bridge = AsyncBridge()
+
+    start = time.monotonic()
+    e1, e2, by_id = bridge.gather(
+        source.fetch_entity_series('e1', 'T', entries_from_latest=5),
+        source.fetch_entity_series('e2', 'T', entries_from_latest=5),
+        source.fetch_entity_type_series('T')
+    )
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert ql.max_in_flight == 3
+    assert e1['roughness'].tolist() == e2['roughness'].tolist()
+    assert str(e1.index.tz) == 'UTC'
+    assert sorted(by_id) == ['e1', 'e2']
+    assert {tenant for (_, _, tenant) in ql.requests} == {'t1'}
+
+
+def test_async_and_sync_sources_agree(ql):
+    app = board_app(ql)
+    want = QuantumLeapSource(app).fetch_entity_series('e 1', 'T')
+    got = AsyncBridge().run(
+        AsyncQuantumLeapSource(app).fetch_entity_series('e 1', 'T')
+    )
+
+    assert got.equals(want)
+    paths = [path for (path, _, _) in ql.requests]
+    assert paths == ['/v2/entities/e%201'] * 2
+
+
+def test_batch_runs_queries_in_parallel_and_keeps_order(ql):
+    source = QuantumLeapSource(board_app(ql))
+    queries = [
+        SeriesQuery(entity_type='T'),
+        SeriesQuery(entity_type='T', entity_id='e2', entries_from_latest=3),
+        SeriesQuery(entity_type='T', entity_id='e1')
+    ]
+
+    start = time.monotonic()
+    by_id, e2, e1 = source.fetch_batch(queries)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert sorted(by_id) == ['e1', 'e2']
+    assert e2.equals(e1)
+    assert {path for (path, _, _) in ql.requests} == {
+        '/v2/types/T', '/v2/entities/e1', '/v2/entities/e2'
+    }
+
+
+def test_batch_can_return_exceptions(ql):
+    source = QuantumLeapSource(board_app(ql))
+    queries = [
+        SeriesQuery(entity_type='T', entity_id='e1'),
+        SeriesQuery(entity_type='T', entity_id='missing')
+    ]
+
+    e1, error = source.fetch_batch(queries, return_exceptions=True)
+
+    assert not e1.empty
+    assert isinstance(error, Exception)
+    with pytest.raises(Exception):
+        source.fetch_batch(queries)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from dazzler.dash.fiware import AttributePath
+
+
+def worker_states(*levels) -> pd.DataFrame:
+    states = [None if x is None else {'fatigue': {'level': {'value': x}}}
+              for x in levels]
+    index = pd.date_range('2022-08-06', periods=len(levels), freq='S')
+    return pd.DataFrame({'workerStates': states}, index=index)
+
+
+def test_extract_numbers():
+    frame = worker_states(1, 2.5, 3)
+    got = AttributePath('workerStates.fatigue.level.value').extract(frame)
+
+    assert got.dtype == np.float64
+    assert got.tolist() == [1.0, 2.5, 3.0]
+    assert got.index.equals(frame.index)
+    assert got.name == 'workerStates.fatigue.level.value'
+
+
+def test_nulls_and_dead_ends_become_nan():
+    frame = worker_states(1, None, 3)
+    frame['workerStates'][2] = {'fatigue': {}}
+    got = AttributePath('workerStates.fatigue.level.value') \
+        .extract(frame, name='fatigue')
+
+    assert got.name == 'fatigue'
+    assert got.isna().tolist() == [False, True, True]
+
+
+def test_all_nulls():
+    frame = worker_states(None, None)
+    got = AttributePath('workerStates.fatigue.level.value').extract(frame)
+
+    assert got.dtype == np.float64
+    assert got.isna().all()
+
+
+def test_missing_attribute():
+    frame = worker_states(1, 2)
+    got = AttributePath('fields.bufferLevel.value1').extract(frame)
+
+    assert got.dtype == np.float64
+    assert got.isna().all()
+    assert len(got) == 2
+
+
+def test_non_numeric_values():
+    frame = pd.DataFrame({'fields': [{'state': 'on'}, None]})
+    got = AttributePath('fields.state').extract(frame)
+
+    assert got.tolist() == ['on', None]
@@ -0,0 +1,139 @@
+import gzip
+import json
+
+from dash import Dash, Input, Output, html
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+import pytest
+
+from dazzler.config import BoardAssembly, CompressionSettings, Settings
+from dazzler.dash.compression import CompressionMiddleware
+from dazzler.dash.wiring import DashboardSubApp
+
+
+BIG = json.dumps({'y': list(range(2000))})
+
+
+def mk_app(policy=lambda path: True, **settings) -> TestClient:
+    app = FastAPI()
+
+    @app.get('/big')
+    def big():
+        return Response(BIG, media_type='application/json')
+
+    @app.get('/small')
+    def small():
+        return PlainTextResponse('tiny')
+
+    @app.get('/image')
+    def image():
+        return Response(b'x' * 5000, media_type='image/jpeg')
+
+    @app.get('/encoded')
+    def encoded():
+        return Response(gzip.compress(BIG.encode()),
+                        media_type='application/json',
+                        headers={'Content-Encoding': 'gzip'})
+
+    @app.get('/events')
+    def events():
+        return Response('data: x\n\n' * 500, media_type='text/event-stream')
+
+    app.add_middleware(CompressionMiddleware,
+                       settings=CompressionSettings(**settings),
+                       policy=policy)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip', 'gzip'), ('gzip, br', 'br'), ('identity', None)
+])
+def test_compress_big_responses(accept, encoding):
+    response = mk_app().get('/big', headers={'Accept-Encoding': accept})
+
+    assert response.headers.get('content-encoding') == encoding
+    assert response.text == BIG
+    if encoding:
+        assert int(response.headers['content-length']) < len(BIG) / 2
+        assert response.headers['vary'] == 'Accept-Encoding'
+
+
+@pytest.mark.parametrize('path', ['/small', '/image', '/encoded', '/events'])
+def test_leave_other_responses_alone(path):
+    client = mk_app()
+    plain = client.get(path, headers={'Accept-Encoding': 'identity'})
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+
+    assert response.content == plain.content
+    assert response.headers.get('content-encoding') == \
+        plain.headers.get('content-encoding')
+
+
+def test_policy_decides():
+    client = mk_app(policy=lambda path: path != '/big')
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'content-encoding' not in response.headers
+
+
+def test_threshold():
+    client = mk_app(min_size=len(BIG) + 1)
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'content-encoding' not in response.headers
+    assert response.headers['vary'] == 'Accept-Encoding'
+
+
+def builder(app: Dash) -> Dash:
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+    app.callback(Output('out', 'children'), Input('in', 'children'))(
+        lambda x: BIG
+    )
+    return app
+
+
+builder_pypath = 'tests.unit.dash.test_compression.builder'
+
+
+def mk_config(enabled: bool, **compress) -> Settings:
+    boards = [BoardAssembly(builder=builder_pypath, board_path=p,
+                            compress=c)
+              for (p, c) in compress.items()]
+    return Settings(boards={'t': boards},
+                    compression=CompressionSettings(enabled=enabled))
+
+
+def test_board_flags_override_settings():
+    target = DashboardSubApp(FastAPI(), 'test')
+    target.mount_dashboards(mk_config(False, a=True, b=None))
+
+    assert target.compresses('/dazzler/t/-/a/_dash-update-component')
+    assert not target.compresses('/dazzler/t/-/b/_dash-update-component')
+    assert not target.compresses('/metrics')
+
+    target.remount_dashboards(mk_config(True, a=False, b=None))
+    assert not target.compresses('/dazzler/t/-/a/_dash-update-component')
+    assert target.compresses('/dazzler/t/-/b/_dash-update-component')
+    assert target.compresses('/metrics')
+
+
+def test_compress_board_callbacks():
+    app = FastAPI()
+    target = DashboardSubApp(app, 'test')
+    target.mount_dashboards(mk_config(False, a=True))
+    app.add_middleware(CompressionMiddleware, settings=CompressionSettings(),
+                       policy=target.compresses)
+
+    response = TestClient(app).post(
+        '/dazzler/t/-/a/_dash-update-component',
+        headers={'Accept-Encoding': 'gzip'},
+        json={'output': 'out.children',
+              'outputs': {'id': 'out', 'property': 'children'},
+              'inputs': [{'id': 'in', 'property': 'children', 'value': 1}],
+              'changedPropIds': ['in.children']}
+    )
+
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json()['response']['out']['children'] == BIG
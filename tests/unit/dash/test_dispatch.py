@@ -0,0 +1,92 @@
+from typing import Tuple
+
+from dash import Dash, html
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from dazzler.config import BoardAssembly, Settings
+from dazzler.dash.dispatch import BoardDispatcher, BoardRoutes
+from dazzler.dash.wiring import DashboardSubApp
+
+
+def echo(name: str):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        body = f"{name} {environ['SCRIPT_NAME']} {environ['PATH_INFO']}"
+        return [body.encode()]
+    return app
+
+
+def call(dispatcher: BoardDispatcher, path: str) -> Tuple[str, str]:
+    status = []
+    body = dispatcher({'PATH_INFO': path, 'SCRIPT_NAME': ''},
+                      lambda s, hs: status.append(s))
+    return status[0], b''.join(body).decode()
+
+
+def test_longest_base_path_wins():
+    target = BoardDispatcher()
+    target.add('/dazzler/t/-/', echo('root'))
+    target.add('/dazzler/t/-/b/', echo('b'))
+
+    assert call(target, '/dazzler/t/-/b/_dash-layout') == \
+        ('200 OK', 'b /dazzler/t/-/b /_dash-layout')
+    assert call(target, '/dazzler/t/-/bb/') == \
+        ('200 OK', 'root /dazzler/t/- /bb/')
+    assert call(target, '/dazzler/t/-') == ('200 OK', 'root /dazzler/t/- /')
+    assert call(target, '/dazzler/u/-/')[0] == '404 Not Found'
+
+
+def test_remove_prunes_trie():
+    target = BoardDispatcher()
+    target.add('/dazzler/t/-/', echo('root'))
+    target.add('/dazzler/t/s/-/b/', echo('b'))
+    target.remove('/dazzler/t/s/-/b/')
+    target.remove('/dazzler/t/s/-/x/')
+
+    assert target.resolve('/dazzler/t/s/-/b/') is None
+    root = target._boards._root
+    assert set(root.children['dazzler'].children['t'].children) == {'-'}
+    assert target.resolve('/dazzler/t/-/')[0] == '/dazzler/t/-'
+
+
+def builder(app: Dash) -> Dash:
+    app.layout = html.Div(app.config.requests_pathname_prefix)
+    return app
+
+
+builder_pypath = 'tests.unit.dash.test_dispatch.builder'
+
+
+def mk_config(*board_paths: str, **kwargs) -> Settings:
+    boards = [BoardAssembly(builder=builder_pypath, board_path=p)
+              for p in board_paths]
+    return Settings(boards={'t': boards}, dispatch_boards=True, **kwargs)
+
+
+def layout_of(client: TestClient, path: str):
+    response = client.get(path + '_dash-layout')
+    if response.status_code != 200:
+        return response.status_code
+    return response.json()['props']['children']
+
+
+def test_dispatch_boards():
+    app = FastAPI()
+    target = DashboardSubApp(app, 'test')
+    target.mount_dashboards(mk_config('/', 'a', 'b'))
+
+    @app.get('/dazzler/-/ping')
+    def ping():
+        return 'pong'
+
+    client = TestClient(app)
+    routes = [r for r in app.router.routes if isinstance(r, BoardRoutes)]
+    assert len(routes) == 1
+    for p in ('/dazzler/t/-/', '/dazzler/t/-/a/', '/dazzler/t/-/b/'):
+        assert layout_of(client, p) == p
+    assert client.get('/dazzler/-/ping').json() == 'pong'
+
+    target.remount_dashboards(mk_config('a', 'c', lazy_boards=True))
+    assert layout_of(client, '/dazzler/t/-/c/') == '/dazzler/t/-/c/'
+    assert layout_of(client, '/dazzler/t/-/b/') == 404
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pytest
+
+from dazzler.config import DownsampleSettings
+from dazzler.dash.downsample import LTTB, MIN_MAX, Downsampler, \
+    downsample_frame, lttb_indices, minmax_indices
+
+
+def test_lttb_keeps_short_series():
+    y = np.arange(5, dtype=float)
+
+    assert list(lttb_indices(np.arange(5.0), y, 5)) == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 10
+    picked = lttb_indices(x, y, 50)
+
+    assert len(picked) == 50
+    assert (picked[0], picked[-1]) == (0, 999)
+    assert 500 in picked
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_lttb_skips_nans():
+    x = np.arange(100, dtype=float)
+    y = np.ones(100)
+    y[1:50] = np.nan
+    y[30] = 5
+
+    assert 30 in lttb_indices(x, y, 10)
+
+
+def test_minmax_keeps_extremes():
+    y = np.sin(np.arange(10000) / 100.0)
+    y[1234], y[4321] = 3, -3
+    picked = minmax_indices(y, 100)
+
+    assert len(picked) <= 100
+    assert {0, 9999, 1234, 4321} <= set(picked)
+    assert np.all(np.diff(picked) > 0)
+
+
+@pytest.mark.parametrize('method', [LTTB, MIN_MAX])
+def test_downsample_frame(method):
+    idx = pd.date_range('2022-08-06', periods=5000, freq='s', tz='utc')
+    frame = pd.DataFrame({
+        'a': np.random.rand(5000), 'b': np.random.rand(5000),
+        'okay': [True] * 5000
+    }, index=idx)
+    shown = downsample_frame(frame, 200, method)
+
+    assert 100 <= len(shown) <= 200
+    assert shown.index.is_monotonic_increasing
+    assert list(shown.columns) == ['a', 'b', 'okay']
+    assert frame.loc[shown.index].equals(shown)
+
+
+def test_leave_non_numeric_frames_alone():
+    frame = pd.DataFrame({'s': ['x'] * 1000})
+
+    assert downsample_frame(frame, 10) is frame
+
+
+def test_frames_split_target_and_renumber_rows():
+    frames = {
+        f"e{k}": pd.DataFrame({
+            'index': pd.date_range('2022-08-06', periods=1000, freq='s',
+                                   tz='utc'),
+            'v': np.random.rand(1000)
+        })
+        for k in range(4)
+    }
+    frames['short'] = frames['e0'].iloc[:3]
+    downsampler = Downsampler(DownsampleSettings(target_points=400))
+    shown, total = downsampler.frames(frames)
+
+    assert total == 4003
+    assert all(len(shown[f"e{k}"]) <= 80 for k in range(4))
+    assert shown['short'] is frames['short']
+    assert list(shown['e0'].index) == list(range(len(shown['e0'])))
+
+
+def test_disabled():
+    frame = pd.DataFrame({'v': np.random.rand(1000)})
+    downsampler = Downsampler(DownsampleSettings(enabled=False,
+                                                 target_points=10))
+
+    assert downsampler.frame(frame) == (frame, 1000)
+
+
+def test_annotate_downsampled_figures_only():
+    downsampler = Downsampler(DownsampleSettings())
+    figure = px.line(x=[1, 2], y=[1, 2])
+
+    assert not downsampler.annotate(figure, 2, 2).layout.annotations
+    annotations = downsampler.annotate(figure, 2, 3000).layout.annotations
+    assert '2 of 3,000 points' in annotations[0].text
@@ -0,0 +1,185 @@
+from dash import Dash
+from fastapi import FastAPI
+import pytest
+
+from dazzler.config import EntityIndexSettings, Settings
+from dazzler.dash.entityindex import EntityIdIndex, EntityIdIndexes, \
+    quantumleap_entity_ids
+from dazzler.dash.fiware import OrionSource
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+from tests.util.qlstub import QlStub
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Pages:
+
+    def __init__(self, *ids):
+        self.ids = list(ids)
+        self.calls = []
+        self.error = None
+
+    def __call__(self, offset, limit):
+        self.calls.append((offset, limit))
+        if self.error:
+            raise self.error
+        return self.ids[offset:offset + limit]
+
+
+def settings(**kwargs) -> EntityIndexSettings:
+    return EntityIndexSettings(**{'page_size': 2, 'refresh_interval': 10,
+                                  'rebuild_interval': 100, **kwargs})
+
+
+def test_first_search_loads_all_pages():
+    pages = Pages('m3', 'm1', 'x', 'm2', 'm10')
+    index = EntityIdIndex(pages, settings())
+
+    assert pages.calls == []
+    assert index.search('m') == ['m1', 'm10', 'm2', 'm3']
+    assert pages.calls == [(0, 2), (2, 2), (4, 2)]
+    assert len(index) == 5
+
+
+def test_search_by_prefix():
+    index = EntityIdIndex(Pages('a1', 'b1', 'b2', 'b3', 'c1'), settings())
+
+    assert index.search('b', limit=2) == ['b1', 'b2']
+    assert index.search('b3') == ['b3']
+    assert index.search('bz') == []
+    assert index.search('') == ['a1', 'b1', 'b2', 'b3', 'c1']
+    assert index.search('', limit=0) == []
+
+
+def test_search_limit_defaults_to_max_options():
+    pages = Pages(*[f"e{k:03d}" for k in range(100)])
+    index = EntityIdIndex(pages, settings(max_options=3))
+
+    assert index.search('e') == ['e000', 'e001', 'e002']
+
+
+def test_refresh_only_fetches_new_entities():
+    clock = Clock()
+    pages = Pages('b', 'a', 'c')
+    index = EntityIdIndex(pages, settings(), clock)
+    index.search('')
+
+    pages.ids.append('aa')
+    clock.now = 5
+    assert index.search('a') == ['a']
+
+    pages.calls.clear()
+    clock.now = 10
+    assert index.search('a') == ['a', 'aa']
+    assert pages.calls == [(3, 2)]
+
+
+def test_rebuild_drops_deleted_entities():
+    clock = Clock()
+    pages = Pages('a', 'b', 'c')
+    index = EntityIdIndex(pages, settings(), clock)
+    index.search('')
+
+    pages.ids.remove('b')
+    clock.now = 100
+    assert index.search('') == ['a', 'c']
+
+
+def test_failed_update_keeps_ids():
+    clock = Clock()
+    pages = Pages('a', 'b')
+    index = EntityIdIndex(pages, settings(), clock)
+    index.search('')
+
+    pages.error = ConnectionError('down')
+    clock.now = 10
+    assert index.search('') == ['a', 'b']
+
+    pages.calls.clear()
+    clock.now = 15
+    assert index.search('') == ['a', 'b']
+    assert pages.calls == []
+
+
+def test_failed_first_load_raises():
+    pages = Pages('a')
+    pages.error = ConnectionError('down')
+    index = EntityIdIndex(pages, settings())
+
+    with pytest.raises(ConnectionError):
+        index.search('')
+
+    pages.error = None
+    assert index.search('') == ['a']
+
+
+def test_options_keep_selected_id():
+    index = EntityIdIndex(Pages('a1', 'a2', 'b1'), settings())
+
+    assert index.options('a') == [{'label': 'a1', 'value': 'a1'},
+                                  {'label': 'a2', 'value': 'a2'}]
+    assert index.options('a2', 'b1') == [{'label': 'b1', 'value': 'b1'},
+                                         {'label': 'a2', 'value': 'a2'}]
+    assert index.options(None) == index.options('')
+
+
+def test_indexes_share_index_by_key():
+    indexes = EntityIdIndexes(settings())
+    x = indexes.index(('k', 1), Pages('a'))
+
+    assert indexes.index(('k', 1), Pages('b')) is x
+    assert indexes.index(('k', 2), Pages('b')) is not x
+
+
+@pytest.fixture
+def ql():
+    stub = QlStub(entity_ids=('e3', 'e1', 'e2')).start()
+    yield stub
+    stub.stop()
+
+
+def board_app(ql: QlStub) -> Dash:
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings(quantumleap_base_url=ql.base_url)
+    return wiring._make_board(str(BasePath(tenant_name='t1')))
+
+
+def test_quantumleap_index_pages_through_entities(ql):
+    index = quantumleap_entity_ids(board_app(ql), 'T')
+    index._page_size = 2
+
+    assert index.search('e') == ['e1', 'e2', 'e3']
+    pages = [(q['offset'], q['limit']) for (path, q, _) in ql.requests
+             if path == '/v2/entities']
+    assert pages == [(['0'], ['2']), (['2'], ['2'])]
+
+
+class FakeHttp:
+
+    def __init__(self, page):
+        self.page = page
+        self.calls = []
+
+    def get_json(self, rel_path, params=None):
+        self.calls.append((rel_path, params))
+        return self.page
+
+
+def test_orion_ids_page():
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings()
+    source = OrionSource(wiring._make_board(str(BasePath(tenant_name='t1'))))
+    source._http = FakeHttp([{'id': 'x1', 'type': 'T'}])
+
+    assert source.fetch_entity_ids_page('T', 20, 10) == ['x1']
+    assert source._http.calls == [('/v2/entities', {
+        'type': 'T', 'options': 'keyValues', 'attrs': 'id', 'orderBy': None,
+        'limit': 10, 'offset': 20
+    })]
@@ -0,0 +1,76 @@
+import pandas as pd
+import plotly.express as px
+
+from dazzler.dash.figures import FigureCache, fingerprint
+
+
+def mk_frame(*xs) -> pd.DataFrame:
+    index = pd.date_range('2022-08-06', periods=len(xs), freq='S', tz='UTC')
+    return pd.DataFrame({'x': list(xs)}, index=index)
+
+
+def test_same_data_same_fingerprint():
+    assert fingerprint(mk_frame(1, 2)) == fingerprint(mk_frame(1, 2))
+    assert fingerprint({'a': mk_frame(1)}) == fingerprint({'a': mk_frame(1)})
+
+
+def test_fingerprint_changes_with_data_index_and_columns():
+    df = mk_frame(1, 2)
+    fps = {
+        fingerprint(df),
+        fingerprint(mk_frame(1, 3)),
+        fingerprint(df.shift(freq='S')),
+        fingerprint(df.rename(columns={'x': 'y'})),
+        fingerprint(df.astype('float64')),
+        fingerprint(df['x']),
+        fingerprint({'a': df}),
+        fingerprint({'b': df})
+    }
+    assert len(fps) == 8
+
+
+def test_fingerprint_structured_values():
+    df = pd.DataFrame({'s': [{'a': 1}, None]})
+    other = pd.DataFrame({'s': [{'a': 2}, None]})
+
+    assert fingerprint(df) != fingerprint(other)
+
+
+def test_build_once_per_data():
+    cache = FigureCache()
+    builds = []
+
+    def build(df):
+        builds.append(1)
+        return px.line(df)
+
+    first = cache.figure('line', mk_frame(1, 2),
+                         lambda: build(mk_frame(1, 2)))
+    again = cache.figure('line', mk_frame(1, 2),
+                         lambda: build(mk_frame(1, 2)))
+    other = cache.figure('line', mk_frame(3, 4),
+                         lambda: build(mk_frame(3, 4)))
+
+    assert isinstance(first, dict)
+    assert again is first
+    assert other is not first
+    assert len(builds) == 2
+
+
+def test_kinds_dont_clash():
+    cache = FigureCache()
+    df = mk_frame(1, 2)
+
+    line = cache.figure('line', df, lambda: px.line(df))
+    bar = cache.figure('bar', df, lambda: px.bar(df))
+
+    assert line is not bar
+
+
+def test_evict_least_recently_used():
+    cache = FigureCache(max_entries=2)
+    for k in range(3):
+        cache.figure(str(k), None, lambda: {'k': k})
+
+    assert len(cache) == 2
+    assert cache.figure('0', None, lambda: 'rebuilt') == 'rebuilt'
@@ -0,0 +1,133 @@
+import multiprocessing
+
+from fipy.ngsi.headers import FiwareContext
+import pandas as pd
+
+from dazzler.config import HttpSettings
+from dazzler.dash.fiware import columnar_series_frame, series_frame
+from dazzler.dash.http import SessionPool, fiware_headers
+
+
+def test_one_session_per_backend():
+    pool = SessionPool(HttpSettings())
+    ql = pool.session_for('http://ql:8668')
+
+    assert pool.session_for('http://ql:8668/') is ql
+    assert pool.session_for('http://orion:1026') is not ql
+
+
+def test_connection_pool_size():
+    pool = SessionPool(HttpSettings(pool_maxsize=7, retries=3))
+    adapter = pool.session_for('http://ql').get_adapter('http://ql')
+
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 3
+
+
+def test_no_keep_alive():
+    pool = SessionPool(HttpSettings(keep_alive=False))
+    session = pool.session_for('http://ql')
+
+    assert session.headers['Connection'] == 'close'
+
+
+def session_in_child(pool, parent_session, conn):
+    child_session = pool.session_for('http://ql')
+    conn.send((child_session is parent_session,
+               pool.session_for('http://ql') is child_session))
+    conn.close()
+
+
+def test_forked_child_gets_fresh_sessions():
+    pool = SessionPool(HttpSettings())
+    parent_session = pool.session_for('http://ql')
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.get_context('fork').Process(
+        target=session_in_child, args=(pool, parent_session, sender)
+    )
+    child.start()
+    inherited, reused = receiver.recv()
+    child.join()
+
+    assert not inherited
+    assert reused
+    assert pool.session_for('http://ql') is parent_session
+
+
+def test_fiware_headers():
+    ctx = FiwareContext(service='t', service_path='/sp')
+
+    assert fiware_headers(ctx) == {
+        'fiware-service': 't', 'fiware-servicepath': '/sp'
+    }
+
+
+def test_fiware_headers_skip_missing_values():
+    ctx = FiwareContext(service='t')
+
+    assert fiware_headers(ctx) == {'fiware-service': 't'}
+
+
+def test_series_frame():
+    payload = {
+        'entityId': 'e:1',
+        'index': ['2022-08-06T17:42:37.524+00:00',
+                  '2022-08-06T17:42:44.493+00:00'],
+        'attributes': [
+            {'attrName': 'area', 'values': [0.1, 0.2]},
+            {'attrName': 'okay', 'values': [True, False]}
+        ]
+    }
+    df = series_frame(payload)
+
+    assert df.columns.tolist() == ['index', 'area', 'okay']
+    assert str(df['index'].dt.tz) == 'UTC'
+    assert df['area'].tolist() == [0.1, 0.2]
+    assert df['okay'].tolist() == [True, False]
+
+
+def test_columnar_series_frame_types():
+    payload = {
+        'entityId': 'e:1',
+        'index': ['2022-08-06T17:42:37.524+00:00',
+                  '2022-08-06T17:42:44.493Z'],
+        'attributes': [
+            {'attrName': 'count', 'values': [1, None]},
+            {'attrName': 'okay', 'values': [True, False]},
+            {'attrName': 'maybe', 'values': [True, None]},
+            {'attrName': 'state', 'values': [{'level': 1}, None]}
+        ]
+    }
+    df = columnar_series_frame(payload)
+
+    assert str(df['index'].dt.tz) == 'UTC'
+    assert df['index'][1] == pd.Timestamp('2022-08-06T17:42:44.493Z')
+    assert df['count'].dtype == 'float64'
+    assert df['count'].isna().tolist() == [False, True]
+    assert df['okay'].dtype == 'bool'
+    assert df['maybe'].tolist() == [True, None]
+    assert df['state'].tolist() == [{'level': 1}, None]
+
+
+def test_columnar_series_frame_handles_offsets():
+    payload = {
+        'index': ['2022-08-06T19:42:37+02:00', '2022-08-06T17:42:38+00:00'],
+        'attributes': [{'attrName': 'x', 'values': [1.5, 2.5]}]
+    }
+    df = columnar_series_frame(payload)
+
+    assert df['index'].tolist() == [
+        pd.Timestamp('2022-08-06T17:42:37Z'),
+        pd.Timestamp('2022-08-06T17:42:38Z')
+    ]
+
+
+def test_decoders_agree_on_numeric_series():
+    payload = {
+        'index': ['2022-08-06T17:42:37.524+00:00',
+                  '2022-08-06T17:42:44.493+00:00'],
+        'attributes': [{'attrName': 'x', 'values': [1.5, None]},
+                       {'attrName': 'ok', 'values': [True, False]}]
+    }
+
+    assert columnar_series_frame(payload).equals(series_frame(payload))
@@ -0,0 +1,82 @@
+import multiprocessing
+
+from fastapi.testclient import TestClient
+import pytest
+
+from dazzler.dash.images import IMAGE_CACHE_CONTROL, IMAGES_PATH, \
+    ImageStore, content_digest, etag_for, image_store, image_url
+from dazzler.dash.sharedcache import ShmStore
+
+
+@pytest.fixture(scope='module')
+def client():
+    from dazzler.main import app
+    return TestClient(app)
+
+
+def test_content_addressed_urls():
+    store = ImageStore()
+    url = store.put(b'jpeg')
+    digest = content_digest(b'jpeg')
+
+    assert url == image_url(digest) == f"{IMAGES_PATH}/{digest}.jpg"
+    assert store.get(digest) == b'jpeg'
+    assert store.get(content_digest(b'gif')) is None
+
+
+def test_evict_least_recently_put():
+    store = ImageStore(max_entries=2)
+    store.put(b'1')
+    store.put(b'2')
+    store.put(b'1')
+    store.put(b'3')
+
+    assert store.get(content_digest(b'1')) == b'1'
+    assert store.get(content_digest(b'2')) is None
+    assert store.get(content_digest(b'3')) == b'3'
+
+
+def test_serve_image(client):
+    url = image_store().put(b'served jpeg')
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.content == b'served jpeg'
+    assert response.headers['content-type'] == 'image/jpeg'
+    assert response.headers['cache-control'] == IMAGE_CACHE_CONTROL
+    assert response.headers['etag'] == etag_for(content_digest(b'served jpeg'))
+
+
+def test_not_modified(client):
+    digest = content_digest(b'cached jpeg')
+    response = client.get(image_url(digest),
+                          headers={'If-None-Match': etag_for(digest)})
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag_for(digest)
+
+
+def test_unknown_image(client):
+    response = client.get(image_url(content_digest(b'never stored')))
+
+    assert response.status_code == 404
+
+
+def render_in_child(directory: str):
+    store = ImageStore(shared=ShmStore(directory, max_bytes=1024))
+    store.put(b'rendered by another worker')
+
+
+def test_image_rendered_by_another_worker(tmp_path):
+    child = multiprocessing.get_context('fork').Process(
+        target=render_in_child, args=(str(tmp_path),)
+    )
+    child.start()
+    child.join()
+
+    store = ImageStore(shared=ShmStore(str(tmp_path), max_bytes=1024))
+    digest = content_digest(b'rendered by another worker')
+
+    assert store.get(digest) == b'rendered by another worker'
+    assert store.get(content_digest(b'never rendered')) is None
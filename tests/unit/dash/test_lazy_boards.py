@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Tuple
+
+from dash import Dash, html
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from dazzler.config import BoardAssembly, Settings
+from dazzler.dash.metrics import dazzler_metrics
+from dazzler.dash.wiring import DashboardSubApp, LazyBoard
+
+
+built = []
+
+
+def builder(app: Dash) -> Dash:
+    built.append(app.config.requests_pathname_prefix)
+    time.sleep(0.05)
+    app.layout = html.Div('lazy')
+    return app
+
+
+builder_pypath = 'tests.unit.dash.test_lazy_boards.builder'
+
+
+def mk_config(lazy: bool, **warm_up: bool) -> Settings:
+    boards = [BoardAssembly(builder=builder_pypath, board_path=p,
+                            warm_up=w)
+              for (p, w) in warm_up.items()]
+    return Settings(boards={'lz': boards}, lazy_boards=lazy)
+
+
+def mount(config: Settings) -> Tuple[FastAPI, DashboardSubApp]:
+    built.clear()
+    app = FastAPI()
+    target = DashboardSubApp(app, 'test')
+    target.mount_dashboards(config)
+    return app, target
+
+
+def test_eager_boards_get_built_at_mount():
+    _, target = mount(mk_config(False, a=False, b=False))
+
+    assert sorted(built) == ['/dazzler/lz/-/a/', '/dazzler/lz/-/b/']
+    assert set(target.assembly_times()) == set(built)
+
+
+def test_lazy_boards_get_built_on_first_request():
+    app, target = mount(mk_config(True, a=False, b=True))
+
+    assert built == ['/dazzler/lz/-/b/']
+    assert set(target.assembly_times()) == {'/dazzler/lz/-/b/'}
+
+    client = TestClient(app)
+    assert client.get('/dazzler/lz/-/a/').status_code == 200
+    assert client.get('/dazzler/lz/-/a/_dash-layout').json()['props'] == \
+        {'children': 'lazy'}
+    assert built == ['/dazzler/lz/-/b/', '/dazzler/lz/-/a/']
+    assert target.assembly_times()['/dazzler/lz/-/a/'] >= 0.05
+
+
+def test_concurrent_first_requests_build_once():
+    app, _ = mount(mk_config(True, a=False))
+    client = TestClient(app)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(
+            lambda _: client.get('/dazzler/lz/-/a/').status_code, range(8)
+        ))
+
+    assert codes == [200] * 8
+    assert built == ['/dazzler/lz/-/a/']
+
+
+def test_failed_assembly_gets_retried():
+    attempts = []
+
+    def assemble():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError('orion down')
+        return Dash(__name__)
+
+    board = LazyBoard(assemble)
+    try:
+        board.server()
+    except ConnectionError:
+        pass
+
+    assert not board.assembled()
+    assert board.server() is board.server()
+    assert len(attempts) == 2
+
+
+def test_assembly_time_metric():
+    mount(mk_config(False, m=False))
+    seconds = dazzler_metrics().board_assembly_seconds.value('lz', '/', '/m/')
+
+    assert seconds is not None and seconds >= 0.05
@@ -0,0 +1,166 @@
+from dash import Dash, Input, Output, html
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from requests import HTTPError
+
+from dazzler.config import MetricsSettings, Settings
+from dazzler.dash.cache import CacheStats
+from dazzler.dash.fiware import QuantumLeapSource
+from dazzler.dash.metrics import CacheCollector, DazzlerMetrics, \
+    MetricsRegistry, dazzler_metrics, endpoint_of
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+from tests.util.qlstub import QlStub
+
+
+def test_render_counter():
+    registry = MetricsRegistry()
+    errors = registry.counter('errors_total', 'Errors.', ('board',))
+    errors.inc('a"b')
+    errors.inc('a"b', amount=2)
+
+    assert registry.render() == '\n'.join([
+        '# HELP errors_total Errors.',
+        '# TYPE errors_total counter',
+        'errors_total{board="a\\"b"} 3',
+        ''
+    ])
+
+
+def test_render_histogram():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency.', ('x',),
+                                 [0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, 'y')
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{x="y",le="0.1"} 2',
+        'latency_seconds_bucket{x="y",le="1"} 3',
+        'latency_seconds_bucket{x="y",le="+Inf"} 4',
+        'latency_seconds_sum{x="y"} 3.65',
+        'latency_seconds_count{x="y"} 4'
+    ]
+
+
+def test_render_cache_stats():
+    registry = MetricsRegistry()
+    registry.register(CacheCollector('qc', lambda: CacheStats(hits=5,
+                                                              entries=2)))
+    lines = registry.render().splitlines()
+
+    assert 'qc_hits_total 5' in lines
+    assert 'qc_misses_total 0' in lines
+    assert 'qc_entries 2' in lines
+
+
+def test_endpoints():
+    assert endpoint_of('/v2/entities') == '/v2/entities'
+    assert endpoint_of('/v2/entities/urn:x:1') == '/v2/entities/{id}'
+    assert endpoint_of('/v2/types/T/value') == '/v2/types/{id}'
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = DazzlerMetrics(MetricsSettings(enabled=False))
+    metrics.observe_backend('http://ql', 't', '/v2/entities', 0.1, 10)
+
+    assert metrics.backend_seconds.count('http://ql', 't',
+                                         '/v2/entities') == 0
+
+
+def make_board(**kwargs) -> Dash:
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings(**kwargs)
+    path = BasePath(tenant_name='t1', service_path='/s', board_path='b')
+    return wiring._make_board(str(path))
+
+
+def update(app: Dash, output: str, value: str):
+    client = app.server.test_client()
+    return client.post('/_dash-update-component', json={
+        'output': output, 'outputs': {'id': output.split('.')[0],
+                                      'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': value}],
+        'changedPropIds': ['in.children']
+    })
+
+
+def test_callback_latency_and_errors():
+    app = make_board()
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='ok'),
+                           html.Div(id='fail')])
+    app.callback(Output('ok', 'children'), Input('in', 'children'))(
+        lambda x: x
+    )
+
+    def fail(x):
+        raise ValueError(x)
+    app.callback(Output('fail', 'children'), Input('in', 'children'))(fail)
+
+    metrics = dazzler_metrics()
+    ok = ('t1', '/s/', '/b/', 'ok.children')
+    failed = ('t1', '/s/', '/b/', 'fail.children')
+    before = (metrics.callback_seconds.count(*ok),
+              metrics.callback_seconds.count(*failed),
+              metrics.callback_errors.value(*failed))
+
+    assert update(app, 'ok.children', 'x').status_code == 200
+    assert update(app, 'fail.children', 'x').status_code == 500
+    assert (metrics.callback_seconds.count(*ok),
+            metrics.callback_seconds.count(*failed),
+            metrics.callback_errors.value(*failed)) == \
+        (before[0] + 1, before[1] + 1, before[2] + 1)
+    assert metrics.callback_errors.value(*ok) == 0
+
+
+def test_unknown_callback_outputs_share_one_label():
+    app = make_board()
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='ok')])
+    app.callback(Output('ok', 'children'), Input('in', 'children'))(
+        lambda x: x
+    )
+
+    metrics = dazzler_metrics()
+    unknown = ('t1', '/s/', '/b/', 'unknown')
+    before = (metrics.callback_seconds.count(*unknown),
+              metrics.callback_errors.value(*unknown))
+
+    assert update(app, 'made-up-1.children', 'x').status_code == 500
+    assert update(app, 'made-up-2.children', 'x').status_code == 500
+    assert (metrics.callback_seconds.count(*unknown),
+            metrics.callback_errors.value(*unknown)) == \
+        (before[0] + 2, before[1] + 2)
+    assert metrics.callback_seconds.count(
+        't1', '/s/', '/b/', 'made-up-1.children') == 0
+    assert 'made-up' not in metrics.render()
+
+
+@pytest.fixture
+def ql():
+    stub = QlStub(points=3).start()
+    yield stub
+    stub.stop()
+
+
+def test_backend_latency_size_and_errors(ql):
+    source = QuantumLeapSource(make_board(quantumleap_base_url=ql.base_url))
+    metrics = dazzler_metrics()
+    labels = (ql.base_url, 't1', '/v2/entities/{id}')
+
+    source.fetch_entity_series('e1', 'T')
+    with pytest.raises(HTTPError):
+        source.fetch_entity_series('missing', 'T')
+
+    assert metrics.backend_seconds.count(*labels) == 2
+    assert metrics.backend_bytes.count(*labels) == 2
+    assert metrics.backend_errors.value(*labels, '404') == 1
+
+
+def test_metrics_route():
+    from dazzler.main import app
+    response = TestClient(app).get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert '# TYPE dazzler_callback_seconds histogram' in response.text
+    assert 'dazzler_query_cache_hits_total' in response.text
@@ -0,0 +1,182 @@
+from datetime import timedelta
+import multiprocessing
+import threading
+
+import pandas as pd
+import pytest
+
+from dazzler.dash.prefetch import PrefetchJob, TenantPrefetch
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Fetch:
+
+    def __init__(self):
+        self.windows = []
+        self.error = None
+
+    def __call__(self, window: timedelta):
+        self.windows.append(window)
+        if self.error:
+            raise self.error
+        now = pd.Timestamp.now('utc')
+        idx = [now - timedelta(minutes=m) for m in (9, 5, 1)]
+        return {
+            'e1': pd.DataFrame({'index': idx, 'v': [1.0, 2.0, 3.0]}),
+            'e2': pd.DataFrame({'index': idx[:1], 'v': [4.0]})
+        }
+
+
+def stopped_tenant(clock=None) -> TenantPrefetch:
+    tenant = TenantPrefetch('t', idle_expiry=10, clock=clock or Clock())
+    tenant.stop()
+    return tenant
+
+
+def test_first_read_runs_query():
+    fetch = Fetch()
+    job = PrefetchJob(fetch)
+    job.widen(timedelta(minutes=10), 5)
+    frames = job.read(timedelta(minutes=10))
+
+    assert fetch.windows == [timedelta(minutes=10)]
+    assert list(frames['e1']['v']) == [1.0, 2.0, 3.0]
+    assert list(frames['e2']['v']) == [4.0]
+
+
+def test_read_slices_window():
+    job = PrefetchJob(Fetch())
+    job.widen(timedelta(minutes=10), 5)
+    frames = job.read(timedelta(minutes=3))
+
+    assert list(frames) == ['e1']
+    assert list(frames['e1']['v']) == [3.0]
+
+
+def test_readers_get_copies():
+    job = PrefetchJob(Fetch())
+    job.read(timedelta(minutes=10))['e1']['v'] = 0.0
+
+    assert list(job.read(timedelta(minutes=10))['e1']['v']) == \
+        [1.0, 2.0, 3.0]
+
+
+def test_shared_job_covers_widest_window_and_shortest_period():
+    tenant = stopped_tenant()
+    fetch = Fetch()
+    job = tenant.job('k', fetch, timedelta(minutes=3), 5)
+    same = tenant.job('k', Fetch(), timedelta(minutes=10), 1)
+    tenant.job('k', Fetch(), timedelta(minutes=1), 60)
+
+    assert job is same
+    assert (job.window, job.period) == (timedelta(minutes=10), 1)
+
+
+def test_run_due_jobs_once_per_period():
+    clock = Clock()
+    tenant = stopped_tenant(clock)
+    fetch = Fetch()
+    tenant.job('k', fetch, timedelta(minutes=10), 5)
+
+    assert tenant.run_due() == 5
+    clock.now = 3
+    assert tenant.run_due() == 2
+    clock.now = 5
+    tenant.run_due()
+    assert len(fetch.windows) == 2
+
+
+def test_failed_run_keeps_result():
+    clock = Clock()
+    tenant = stopped_tenant(clock)
+    fetch = Fetch()
+    job = tenant.job('k', fetch, timedelta(minutes=10), 5)
+    tenant.run_due()
+    fetch.error = RuntimeError('down')
+    clock.now = 5
+
+    assert tenant.run_due() == 5
+    assert list(job.read(timedelta(minutes=10))) == ['e1', 'e2']
+
+
+def test_drop_idle_jobs():
+    clock = Clock()
+    tenant = stopped_tenant(clock)
+    tenant.job('idle', Fetch(), timedelta(minutes=10), 5)
+    busy = tenant.job('busy', Fetch(), timedelta(minutes=10), 5)
+    clock.now = 11
+    busy.read(timedelta(minutes=10))
+    tenant.run_due()
+
+    assert len(tenant) == 1
+
+
+def test_first_read_raises_query_errors():
+    fetch = Fetch()
+    fetch.error = RuntimeError('down')
+
+    with pytest.raises(RuntimeError):
+        PrefetchJob(fetch).read(timedelta(minutes=10))
+
+
+def started_threads(start) -> set:
+    before = set(threading.enumerate())
+    start()
+    return set(threading.enumerate()) - before
+
+
+def test_pause_joins_thread_and_next_job_restarts_it():
+    tenant = TenantPrefetch('t', idle_expiry=10, clock=Clock())
+    window = timedelta(minutes=10)
+    threads = started_threads(lambda: tenant.job('k', Fetch(), window, 5))
+    tenant.pause()
+
+    assert len(threads) == 1
+    assert not any(t.is_alive() for t in threads)
+
+    restarted = started_threads(lambda: tenant.job('k', Fetch(), window, 5))
+    tenant.stop()
+
+    assert len(restarted) == 1
+
+
+def read_in_child(tenant: TenantPrefetch):
+    job = tenant.job('k', Fetch(), timedelta(minutes=10), 5)
+    assert 'e1' in job.read(timedelta(minutes=10))
+
+
+def test_child_can_read_after_pause():
+    running, release = threading.Event(), threading.Event()
+    fetch = Fetch()
+
+    def slow_fetch(window):
+        running.set()
+        release.wait()
+        return fetch(window)
+
+    tenant = TenantPrefetch('t', idle_expiry=10, clock=Clock())
+    job = tenant.job('k', slow_fetch, timedelta(minutes=10), 5)
+    running.wait(5)
+    threading.Timer(0.2, release.set).start()
+    tenant.pause()
+
+    assert job.fetched_at is not None
+
+    child = multiprocessing.get_context('fork').Process(
+        target=read_in_child, args=(tenant,)
+    )
+    child.start()
+    child.join(10)
+    if child.is_alive():
+        child.kill()
+    tenant.stop()
+
+    assert child.exitcode == 0
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from dazzler.dash.push import NotificationHub, Topic, normalize_service_path
+from tests.util.push import StubNotifier
+
+
+@pytest.mark.parametrize('given, want', [
+    (None, '/'), ('', '/'), ('/', '/'), ('sp', '/sp'), ('/sp/', '/sp'),
+    ('/s/p/', '/s/p')
+])
+def test_normalize_service_path(given, want):
+    assert normalize_service_path(given) == want
+
+
+def test_topic_normalizes_service_path():
+    assert Topic.of('t', '/sp/', 'T') == Topic('t', '/sp', 'T')
+
+
+async def next_message(stream) -> str:
+    return await asyncio.wait_for(stream.__anext__(), 1)
+
+
+def test_stream_gets_notified_of_updates():
+    notifier = StubNotifier()
+    hub = NotificationHub(notifier)
+    topic = Topic.of('t', '/', 'T')
+
+    async def run():
+        stream = hub.stream([topic])
+        assert (await next_message(stream)).startswith('retry:')
+        notifier.notify(hub, topic, ['e1', 'e2'])
+        got = await next_message(stream)
+        await stream.aclose()
+        return got
+
+    got = asyncio.run(run())
+
+    assert got == 'data: {"entity_type": "T", "ids": ["e1", "e2"]}\n\n'
+    assert notifier.subscriptions == [topic]
+    assert hub.listener_count(topic) == 0
+
+
+def test_subscribe_once_per_topic():
+    notifier = StubNotifier()
+    hub = NotificationHub(notifier)
+    topic = Topic.of('t', '/', 'T')
+
+    async def run():
+        streams = [hub.stream([topic]) for _ in range(3)]
+        for s in streams:
+            await next_message(s)
+        count = hub.listener_count(topic)
+        for s in streams:
+            await s.aclose()
+        return count
+
+    assert asyncio.run(run()) == 3
+    assert notifier.subscriptions == [topic]
+
+
+def test_publish_only_reaches_matching_topics():
+    notifier = StubNotifier()
+    hub = NotificationHub(notifier)
+    t1 = Topic.of('t', '/', 'T1')
+    t2 = Topic.of('t', '/', 'T2')
+    other_tenant = Topic.of('u', '/', 'T1')
+
+    async def run():
+        s1 = hub.stream([t1])
+        await next_message(s1)
+        s2 = hub.stream([t2])
+        await next_message(s2)
+
+        notified = notifier.notify(hub, t1, ['e']) + \
+            notifier.notify(hub, other_tenant, ['e'])
+
+        await next_message(s1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(s2.__anext__(), 0.1)
+        await s1.aclose()
+        return notified
+
+    assert asyncio.run(run()) == 1
+
+
+class Watcher:
+
+    def __init__(self):
+        self.updated = []
+
+    def mark_updated(self, entity_ids):
+        self.updated.append(entity_ids)
+
+
+def test_publish_tells_watchers_of_updated_entities():
+    hub = NotificationHub(StubNotifier())
+    topic = Topic.of('t', '/sp/', 'T')
+    watcher, other = Watcher(), Watcher()
+    hub.watch(topic, watcher)
+    hub.watch(Topic.of('t', '/sp', 'U'), other)
+
+    hub.publish('t', '/sp', [{'id': 'e1', 'type': 'T'},
+                             {'id': 'e2', 'type': 'T'}])
+
+    assert watcher.updated == [['e1', 'e2']]
+    assert other.updated == []
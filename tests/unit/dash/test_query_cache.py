@@ -0,0 +1,119 @@
+from threading import Barrier, Thread
+from typing import Tuple
+import time
+
+import pytest
+
+from dazzler.dash.cache import QueryCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def mk_cache(max_bytes: int = 100) -> Tuple[QueryCache, FakeClock]:
+    clock = FakeClock()
+    cache = QueryCache(max_bytes=max_bytes, sizeof=len, clock=clock)
+    return cache, clock
+
+
+def test_hit_after_miss():
+    cache, _ = mk_cache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return 'abc'
+
+    assert cache.get_or_fetch('k', 10, fetch) == 'abc'
+    assert cache.get_or_fetch('k', 10, fetch) == 'abc'
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.entries == 1
+    assert stats.size_bytes == 3
+
+
+def test_expired_entry_gets_refetched():
+    cache, clock = mk_cache()
+    cache.get_or_fetch('k', 10, lambda: 'a')
+    clock.now = 10
+
+    assert cache.get_or_fetch('k', 10, lambda: 'b') == 'b'
+    assert cache.stats().expirations == 1
+
+
+def test_zero_ttl_bypasses_cache():
+    cache, _ = mk_cache()
+    cache.get_or_fetch('k', 0, lambda: 'a')
+
+    assert cache.get_or_fetch('k', 0, lambda: 'b') == 'b'
+    assert cache.stats().entries == 0
+
+
+def test_lru_eviction_when_over_budget():
+    cache, _ = mk_cache(max_bytes=10)
+    cache.get_or_fetch('k1', 10, lambda: 'x' * 4)
+    cache.get_or_fetch('k2', 10, lambda: 'x' * 4)
+    cache.get_or_fetch('k1', 10, lambda: 'not called')  # k2 is now LRU
+    cache.get_or_fetch('k3', 10, lambda: 'x' * 4)
+
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.size_bytes == 8
+    assert cache.get_or_fetch('k1', 10, lambda: 'gone') == 'xxxx'
+    assert cache.get_or_fetch('k2', 10, lambda: 'gone') == 'gone'
+
+
+def test_value_bigger_than_budget_is_not_cached():
+    cache, _ = mk_cache(max_bytes=2)
+    cache.get_or_fetch('k', 10, lambda: 'abc')
+
+    assert cache.stats().entries == 0
+
+
+def test_failed_fetch_is_not_cached():
+    cache, _ = mk_cache()
+
+    def boom():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        cache.get_or_fetch('k', 10, boom)
+    assert cache.get_or_fetch('k', 10, lambda: 'a') == 'a'
+
+
+def test_concurrent_misses_get_coalesced():
+    cache = QueryCache(max_bytes=100, sizeof=len)
+    n = 8
+    barrier = Barrier(n)
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'abc'
+
+    def lookup():
+        barrier.wait()
+        results.append(cache.get_or_fetch('k', 10, fetch))
+
+    threads = [Thread(target=lookup) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert results == ['abc'] * n
+    assert stats.misses == n
+    assert stats.coalesced == n - 1
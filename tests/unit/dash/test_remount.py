@@ -0,0 +1,62 @@
+from typing import Dict
+
+from dash import Dash
+from fastapi import FastAPI
+from starlette.routing import Mount
+
+from dazzler.config import BoardAssembly, Settings
+from dazzler.dash.wiring import DashboardSubApp, settings_for
+
+
+def builder(app: Dash) -> Dash:
+    return app
+
+
+builder_pypath = 'tests.unit.dash.test_remount.builder'
+
+
+def mk_config(*board_paths: str, **kwargs) -> Settings:
+    boards = [BoardAssembly(builder=builder_pypath, board_path=p)
+              for p in board_paths]
+    return Settings(boards={'t': boards}, **kwargs)
+
+
+def mounts(app: FastAPI) -> Dict[str, Mount]:
+    return {r.path: r for r in app.router.routes if isinstance(r, Mount)}
+
+
+def test_settings_get_injected():
+    app = FastAPI()
+    cfg = mk_config('a', quantumleap_base_url='http://ql/')
+    DashboardSubApp(app, 'test').mount_dashboards(cfg)
+    board = mounts(app)['/dazzler/t/-/a'].app.app
+
+    assert board.config['DAZZLER_SETTINGS'] is cfg
+
+
+def test_remount_only_changed_boards():
+    app = FastAPI()
+    target = DashboardSubApp(app, 'test')
+    target.mount_dashboards(mk_config('a', 'b'))
+    before = mounts(app)
+
+    target.remount_dashboards(mk_config('a', 'c'))
+    after = mounts(app)
+
+    assert set(after) == {'/dazzler/t/-/a', '/dazzler/t/-/c'}
+    assert after['/dazzler/t/-/a'] is before['/dazzler/t/-/a']
+
+
+def test_remount_all_boards_when_other_settings_change():
+    app = FastAPI()
+    target = DashboardSubApp(app, 'test')
+    target.mount_dashboards(mk_config('a', 'b'))
+    before = mounts(app)
+
+    target.remount_dashboards(mk_config('a', 'b',
+                                        quantumleap_base_url='http://ql/'))
+    after = mounts(app)
+
+    assert set(after) == set(before)
+    for path in after:
+        assert after[path] is not before[path]
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from requests import HTTPError, Response
+
+from dazzler.dash.rolling import RollingSeriesStore
+
+
+T0 = datetime(2022, 8, 6, 17, 42, tzinfo=timezone.utc)
+
+
+def mk_frame(points: List[int]) -> pd.DataFrame:
+    index = [T0 + timedelta(seconds=p) for p in points]
+    return pd.DataFrame({'index': index, 'x': points}).set_index('index')
+
+
+class FakeSource:
+
+    def __init__(self, points: List[int]):
+        self.points = points
+        self.calls = []
+        self.uncached = 0
+
+    def fetch_entity_series(self, entity_id: str, entity_type: str,
+                            entries_from_latest: Optional[int] = None,
+                            from_timepoint: Optional[datetime] = None,
+                            to_timepoint: Optional[datetime] = None,
+                            decoder=None, cached=True) -> pd.DataFrame:
+        self.calls.append((entries_from_latest, from_timepoint))
+        self.uncached += 0 if cached else 1
+        ps = self.points
+        if from_timepoint:
+            ps = [p for p in ps if T0 + timedelta(seconds=p) >= from_timepoint]
+        if not ps:
+            r = Response()
+            r.status_code = 404
+            raise HTTPError(response=r)
+        return mk_frame(ps[-entries_from_latest:])
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def mk_store(source: FakeSource) -> Tuple[RollingSeriesStore, FakeClock]:
+    clock = FakeClock()
+    store = RollingSeriesStore(source=source, entity_type='T', max_age=1,
+                               clock=clock)
+    return store, clock
+
+
+def test_first_window_is_fetched_in_full():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    got = store.window('e', 3)
+
+    assert got['x'].tolist() == [7, 8, 9]
+    assert source.calls == [(3, None)]
+
+
+def test_fresh_window_is_served_from_memory():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    store.window('e', 3)
+    source.points.append(10)
+
+    assert store.window('e', 3)['x'].tolist() == [7, 8, 9]
+    assert len(source.calls) == 1
+
+
+def test_stale_window_only_fetches_newer_points():
+    source = FakeSource(list(range(10)))
+    store, clock = mk_store(source)
+    store.window('e', 3)
+    source.points += [10, 11]
+    clock.now += 1
+
+    assert store.window('e', 3)['x'].tolist() == [9, 10, 11]
+    assert source.calls[-1] == (3, T0 + timedelta(seconds=9))
+
+
+def test_no_newer_points():
+    source = FakeSource(list(range(10)))
+    store, clock = mk_store(source)
+    store.window('e', 3)
+    source.points = []
+    clock.now += 1
+
+    assert store.window('e', 3)['x'].tolist() == [7, 8, 9]
+
+
+def test_bigger_window_gets_fetched_in_full():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    store.window('e', 3)
+
+    assert store.window('e', 5)['x'].tolist() == [5, 6, 7, 8, 9]
+    assert store.window('e', 2)['x'].tolist() == [8, 9]
+    assert source.calls == [(3, None), (5, None)]
+
+
+def test_update_within_max_age_fetches_newer_points():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    store.window('e', 3)
+    source.points.append(10)
+    store.mark_updated(['e'])
+
+    assert store.window('e', 3)['x'].tolist() == [8, 9, 10]
+    assert source.calls[-1] == (3, T0 + timedelta(seconds=9))
+    assert source.uncached == 1
+
+    store.window('e', 3)
+    assert len(source.calls) == 2
+
+
+def test_update_not_in_quantumleap_yet_gets_retried():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    store.window('e', 3)
+    store.mark_updated(['e'])
+
+    assert store.window('e', 3)['x'].tolist() == [7, 8, 9]
+    source.points.append(10)
+    assert store.window('e', 3)['x'].tolist() == [8, 9, 10]
+    assert source.uncached == 2
+
+
+def test_update_retries_run_out():
+    source = FakeSource(list(range(10)))
+    store, _ = mk_store(source)
+    store.window('e', 3)
+    store.mark_updated(['e', 'unknown'])
+
+    for _ in range(4):
+        store.window('e', 3)
+    assert source.uncached == 2
+    assert len(source.calls) == 3
@@ -0,0 +1,87 @@
+from dash import Dash
+from fastapi import FastAPI
+import pytest
+
+from dazzler.config import QueryCacheSettings, Settings
+from dazzler.dash.fiware import Aggregation, QuantumLeapSource, SeriesQuery
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+from tests.util.qlstub import QlStub
+
+
+@pytest.fixture
+def ql():
+    stub = QlStub().start()
+    yield stub
+    stub.stop()
+
+
+def board_app(ql: QlStub) -> Dash:
+    cfg = Settings(quantumleap_base_url=ql.base_url,
+                   query_cache=QueryCacheSettings(default_ttl=60))
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = cfg
+    return wiring._make_board(str(BasePath(tenant_name='t1')))
+
+
+def test_aggregated_entity_type_series(ql):
+    source = QuantumLeapSource(board_app(ql))
+    frames = source.fetch_entity_type_series(
+        'T', attrs=['roughness'],
+        aggregation=Aggregation(method='avg', period='minute')
+    )
+    _, query, _ = ql.requests[-1]
+
+    assert list(frames) == ['e1', 'e2']
+    assert query['attrs'] == ['roughness']
+    assert query['aggrMethod'] == ['avg']
+    assert query['aggrPeriod'] == ['minute']
+
+
+def test_aggregation_without_period(ql):
+    source = QuantumLeapSource(board_app(ql))
+    source.fetch_entity_series('e1', 'T', attrs=['roughness'],
+                               aggregation=Aggregation(method='max'))
+    _, query, _ = ql.requests[-1]
+
+    assert query['aggrMethod'] == ['max']
+    assert 'aggrPeriod' not in query
+
+
+def test_plain_queries_send_no_aggregation_params(ql):
+    QuantumLeapSource(board_app(ql)).fetch_entity_series('e1', 'T')
+    _, query, _ = ql.requests[-1]
+
+    assert not {'attrs', 'aggrMethod', 'aggrPeriod'} & set(query)
+
+
+def test_cache_tells_apart_aggregations(ql):
+    source = QuantumLeapSource(board_app(ql))
+    for aggregation in [None, Aggregation(method='min', period='hour'),
+                        Aggregation(method='max', period='hour'),
+                        Aggregation(method='max', period='hour')]:
+        source.fetch_entity_series('e1', 'T', attrs=['roughness'],
+                                   aggregation=aggregation)
+
+    assert len(ql.requests) == 3
+
+
+def test_batched_aggregated_query(ql):
+    source = QuantumLeapSource(board_app(ql))
+    [frame] = source.fetch_batch([SeriesQuery(
+        entity_type='T', entity_id='e1', attrs=['roughness'],
+        aggregation=Aggregation(method='count', period='second')
+    )])
+    _, query, _ = ql.requests[-1]
+
+    assert 'roughness' in frame.columns
+    assert query['aggrMethod'] == ['count']
+
+
+def test_uncached_queries_skip_cache(ql):
+    source = QuantumLeapSource(board_app(ql))
+    source.fetch_entity_type_series('T')
+    for _ in range(2):
+        source.fetch_entity_type_series('T', cached=False)
+        source.fetch_entity_series('e1', 'T', cached=False)
+
+    assert len(ql.requests) == 5
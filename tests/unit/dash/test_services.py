@@ -0,0 +1,33 @@
+from dazzler.config import HttpSettings, MetricsSettings, PushSettings, \
+    Settings
+from dazzler.dash.http import http_sessions
+from dazzler.dash.prefetch import prefetch_scheduler
+from dazzler.dash.services import apply_settings
+
+
+def use_settings(monkeypatch, settings: Settings):
+    monkeypatch.setattr('dazzler.config._settings', settings)
+    monkeypatch.setattr('dazzler.dash.http._session_pool', None)
+    monkeypatch.setattr('dazzler.dash.prefetch._prefetch_scheduler', None)
+
+
+def test_changed_settings_recreate_service(monkeypatch):
+    old = Settings()
+    new = Settings(http=HttpSettings(pool_maxsize=3))
+    use_settings(monkeypatch, old)
+    sessions, scheduler = http_sessions(), prefetch_scheduler()
+
+    monkeypatch.setattr('dazzler.config._settings', new)
+    assert apply_settings(old, new) == []
+
+    assert http_sessions() is not sessions
+    assert http_sessions()._settings.pool_maxsize == 3
+    assert prefetch_scheduler() is scheduler
+
+
+def test_report_settings_needing_restart():
+    old = Settings()
+    new = Settings(metrics=MetricsSettings(enabled=False),
+                   push=PushSettings(enabled=True, throttling=5))
+
+    assert apply_settings(old, new) == ['metrics', 'push.throttling']
@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+from dazzler.config import QueryCacheSettings
+from dazzler.dash.cache import QueryCache
+from dazzler.dash.fiware import columnar_series_frame, series_frame
+from dazzler.dash.sharedcache import ShmStore, _stable_repr, key_digest, \
+    shared_store
+
+
+def test_key_digest_names_functions():
+    key = ('http://ql', 't', '/', 'series', 'e1', 10, series_frame)
+
+    assert _stable_repr(key) == \
+        "('http://ql','t','/','series','e1',10," \
+        "dazzler.dash.fiware.series_frame)"
+    assert key_digest(key) != key_digest(key[:-1] + (columnar_series_frame,))
+
+
+def test_shm_round_trip(tmp_path):
+    store = ShmStore(str(tmp_path), max_bytes=1024 * 1024)
+    frame = pd.DataFrame({'x': [1, 2]})
+    store.put('k', frame, ttl=60)
+    value, left = store.get('k')
+
+    pd.testing.assert_frame_equal(value, frame)
+    assert 0 < left <= 60
+    assert store.get('other') is None
+
+
+def test_shm_expired_values(tmp_path):
+    store = ShmStore(str(tmp_path), max_bytes=1024 * 1024)
+    store.put('k', 'v', ttl=-1)
+
+    assert store.get('k') is None
+    store.prune()
+    assert os.listdir(tmp_path) == []
+
+
+def test_shm_prune_keeps_budget(tmp_path):
+    store = ShmStore(str(tmp_path), max_bytes=250)
+    for (k, ttl) in enumerate([30, 10, 20]):
+        store.put(f"k{k}", b'x' * 90, ttl=ttl)
+    store.prune()
+
+    assert store.get('k1') is None
+    assert store.get('k0') is not None
+    assert store.get('k2') is not None
+
+
+def test_shm_skips_values_over_budget(tmp_path):
+    store = ShmStore(str(tmp_path), max_bytes=10)
+    store.put('k', b'x' * 100, ttl=60)
+
+    assert store.get('k') is None
+
+
+def put_in_child(directory: str):
+    ShmStore(directory, max_bytes=1024).put('k', 'from child', ttl=60)
+
+
+def test_shm_shared_across_processes(tmp_path):
+    child = multiprocessing.get_context('fork').Process(
+        target=put_in_child, args=(str(tmp_path),)
+    )
+    child.start()
+    child.join()
+
+    value, _ = ShmStore(str(tmp_path), max_bytes=1024).get('k')
+    assert value == 'from child'
+
+
+def two_caches(tmp_path):
+    store = ShmStore(str(tmp_path), max_bytes=1024 * 1024)
+    return (QueryCache(max_bytes=1000, sizeof=len, shared=store),
+            QueryCache(max_bytes=1000, sizeof=len, shared=store))
+
+
+def test_caches_share_fetched_values(tmp_path):
+    first, second = two_caches(tmp_path)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return 'value'
+
+    assert first.get_or_fetch(('q', 1), 60, fetch) == 'value'
+    assert second.get_or_fetch(('q', 1), 60, fetch) == 'value'
+    assert second.get_or_fetch(('q', 1), 60, fetch) == 'value'
+    assert len(calls) == 1
+    assert second.stats().shared_hits == 1
+    assert second.stats().hits == 1
+
+
+def test_async_caches_share_fetched_values(tmp_path):
+    first, second = two_caches(tmp_path)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return 'value'
+
+    async def run():
+        return (await first.get_or_fetch_async(('q', 2), 60, fetch),
+                await second.get_or_fetch_async(('q', 2), 60, fetch))
+
+    assert asyncio.run(run()) == ('value', 'value')
+    assert len(calls) == 1
+
+
+class BrokenStore:
+
+    def get(self, key):
+        raise ConnectionError('down')
+
+    def put(self, key, value, ttl):
+        raise ConnectionError('down')
+
+
+def test_broken_shared_store_falls_back_to_fetching():
+    cache = QueryCache(max_bytes=1000, sizeof=len, shared=BrokenStore())
+
+    assert cache.get_or_fetch(('q', 3), 60, lambda: 'value') == 'value'
+    assert cache.get_or_fetch(('q', 3), 60, lambda: 'other') == 'value'
+
+
+def test_no_shared_store_by_default():
+    assert shared_store(QueryCacheSettings()) is None
+
+
+def test_shm_store_from_settings(tmp_path):
+    settings = QueryCacheSettings(shared='shm', shm_dir=str(tmp_path / 's'))
+
+    assert isinstance(shared_store(settings), ShmStore)
+    assert os.path.isdir(tmp_path / 's')
+
+
+def test_shm_dir_is_private(tmp_path):
+    ShmStore(str(tmp_path / 's'), max_bytes=1024)
+
+    assert os.stat(tmp_path / 's').st_mode & 0o777 == 0o700
+
+
+def test_shm_refuses_dir_others_can_access(tmp_path):
+    directory = tmp_path / 's'
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+
+    with pytest.raises(PermissionError):
+        ShmStore(str(directory), max_bytes=1024)
+
+
+def test_shm_refuses_symlinked_dir(tmp_path):
+    (tmp_path / 's').mkdir(mode=0o700)
+    os.symlink(tmp_path / 's', tmp_path / 'link')
+
+    with pytest.raises(PermissionError):
+        ShmStore(str(tmp_path / 'link'), max_bytes=1024)
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason='needs root to chown')
+def test_shm_refuses_dir_of_another_user(tmp_path):
+    directory = tmp_path / 's'
+    directory.mkdir(mode=0o700)
+    os.chown(directory, 12345, 12345)
+
+    with pytest.raises(PermissionError):
+        ShmStore(str(directory), max_bytes=1024)
+
+
+def test_no_shared_store_if_shm_dir_unsafe(tmp_path):
+    directory = tmp_path / 's'
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    settings = QueryCacheSettings(shared='shm', shm_dir=str(directory))
+
+    assert shared_store(settings) is None
@@ -0,0 +1,170 @@
+import threading
+
+from fastapi import FastAPI
+import pytest
+
+from dazzler.config import BoardAssembly, Settings, SnapshotSettings
+from dazzler.dash.fiware import OrionSource
+from dazzler.dash.snapshot import SnapshotTable, SnapshotTables
+from dazzler.dash.wiring import BasePath, DashboardSubApp, \
+    DashboardsConfig, orion_snapshots_for
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Fetch:
+
+    def __init__(self, *entities):
+        self.entities = list(entities)
+        self.calls = 0
+        self.error = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return [dict(x) for x in self.entities]
+
+
+def test_first_read_loads_snapshot():
+    fetch = Fetch({'id': 'e2', 'v': 2}, {'id': 'e1', 'v': 1})
+    table = SnapshotTable(fetch)
+
+    assert fetch.calls == 0
+    assert table.latest() == {'id': 'e2', 'v': 2}
+    assert table.get('e1') == {'id': 'e1', 'v': 1}
+    assert table.get('e3') is None
+    assert [x['id'] for x in table.entities()] == ['e2', 'e1']
+    assert fetch.calls == 1
+
+
+def test_readers_get_copies():
+    table = SnapshotTable(Fetch({'id': 'e1', 'v': 1}))
+    table.latest()['v'] = 2
+
+    assert table.get('e1') == {'id': 'e1', 'v': 1}
+
+
+def test_empty_snapshot():
+    assert SnapshotTable(Fetch()).latest() is None
+
+
+def test_failed_refresh_keeps_snapshot():
+    fetch = Fetch({'id': 'e1', 'v': 1})
+    table = SnapshotTable(fetch)
+    table.latest()
+    fetch.error = RuntimeError('down')
+
+    with pytest.raises(RuntimeError):
+        table.refresh()
+    assert table.latest() == {'id': 'e1', 'v': 1}
+
+
+def test_refresh_loaded_tables_only():
+    tables = SnapshotTables(SnapshotSettings(interval=3600))
+    loaded, unloaded = Fetch({'id': 'e1'}), Fetch()
+    tables.table('loaded', loaded).latest()
+    tables.table('unloaded', unloaded)
+    loaded.entities = [{'id': 'e2'}]
+    tables.refresh()
+
+    assert tables.table('loaded', Fetch()).latest() == {'id': 'e2'}
+    assert (loaded.calls, unloaded.calls) == (2, 0)
+    tables.stop()
+
+
+def test_drop_idle_tables():
+    clock = Clock()
+    tables = SnapshotTables(SnapshotSettings(interval=3600, idle_expiry=10),
+                            clock)
+    tables.table('idle', Fetch()).latest()
+    tables.table('busy', Fetch()).latest()
+    clock.now = 11
+    tables.table('busy', Fetch()).latest()
+    tables.refresh()
+
+    assert len(tables) == 1
+    tables.stop()
+
+
+def test_refresh_survives_errors():
+    tables = SnapshotTables(SnapshotSettings(interval=3600))
+    failing, working = Fetch({'id': 'e1'}), Fetch({'id': 'e1'})
+    tables.table('failing', failing).latest()
+    tables.table('working', working).latest()
+    failing.error = RuntimeError('down')
+    working.entities = [{'id': 'e2'}]
+    tables.refresh()
+
+    assert tables.table('failing', Fetch()).latest() == {'id': 'e1'}
+    assert tables.table('working', Fetch()).latest() == {'id': 'e2'}
+    tables.stop()
+
+
+def test_pause_joins_thread_and_next_lookup_restarts_it():
+    tables = SnapshotTables(SnapshotSettings(interval=3600))
+    before = set(threading.enumerate())
+    tables.table('k', Fetch())
+    threads = set(threading.enumerate()) - before
+    tables.pause()
+
+    assert len(threads) == 1
+    assert not any(t.is_alive() for t in threads)
+
+    before = set(threading.enumerate())
+    tables.table('k', Fetch())
+    restarted = set(threading.enumerate()) - before
+    tables.stop()
+
+    assert len(restarted) == 1
+
+
+class PagedHttp:
+
+    def __init__(self, entities):
+        self.entities = entities
+        self.calls = []
+
+    def get_json(self, rel_path, params=None):
+        self.calls.append(params)
+        offset, limit = params['offset'], params['limit']
+        return self.entities[offset:offset + limit]
+
+
+def test_fetch_entities_pages(monkeypatch):
+    monkeypatch.setattr(OrionSource, 'PAGE_SIZE', 2)
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings()
+    source = OrionSource(wiring._make_board(str(BasePath(tenant_name='t'))))
+    source._http = PagedHttp([{'id': f"e{k}"} for k in range(5)])
+    entities = source.fetch_entities('T', attrs=['a'],
+                                     order_by='!dateModified')
+
+    assert [x['id'] for x in entities] == ['e0', 'e1', 'e2', 'e3', 'e4']
+    assert [p['offset'] for p in source._http.calls] == [0, 2, 4]
+    assert source._http.calls[0]['attrs'] == 'a'
+    assert source._http.calls[0]['orderBy'] == '!dateModified'
+
+
+def test_board_option():
+    cfg = Settings(boards={'t': [
+        BoardAssembly(builder='dazzler.dash.board.dbc_demo.dash_builder',
+                      orion_snapshots=True),
+        BoardAssembly(builder='dazzler.dash.board.dbc_demo.dash_builder',
+                      board_path='b')
+    ]})
+    apps = []
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = cfg
+    for args in DashboardsConfig(cfg).assemble_args():
+        args['builder'] = lambda app: apps.append(app) or app
+        wiring.assemble(**args)
+
+    assert [orion_snapshots_for(app) for app in apps] == [True, False]
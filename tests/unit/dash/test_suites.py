@@ -0,0 +1,159 @@
+import gzip
+import re
+import threading
+import time
+
+from dash import html
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from dazzler.config import ComponentSuiteSettings, Settings
+from dazzler.dash.compression import preferred_encoding
+from dazzler.dash.suites import IMMUTABLE_CACHE_CONTROL, ComponentSuites, \
+    shared_suite_url
+from dazzler.dash.wiring import BasePath, DashboardSubApp
+
+
+def test_shared_suite_url():
+    base = '/dazzler/t/-/b/'
+
+    assert shared_suite_url(base + '_dash-component-suites/dash/x.v1m2.js',
+                            base) == \
+        '/dazzler/-/_dash-component-suites/dash/x.v1m2.js'
+    assert shared_suite_url(base + 'assets/push.js', base) == \
+        base + 'assets/push.js'
+    assert shared_suite_url('https://cdn/x.css', base) == 'https://cdn/x.css'
+
+
+@pytest.mark.parametrize('header, want', [
+    (None, 'identity'),
+    ('gzip', 'gzip'),
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0, gzip;q=0.5', 'gzip'),
+    ('*', 'br'),
+    ('deflate', 'identity')
+])
+def test_preferred_encoding(header, want):
+    assert preferred_encoding(header, ('br', 'gzip', 'identity')) == want
+
+
+def board_index(shared: bool) -> str:
+    wiring = DashboardSubApp(FastAPI(), 'test')
+    wiring._config = Settings(
+        component_suites=ComponentSuiteSettings(shared=shared)
+    )
+    app = wiring._make_board(str(BasePath(tenant_name='t1')))
+    app.layout = html.Div()
+    return app.server.test_client().get('/').get_data(as_text=True)
+
+
+def test_boards_load_shared_suites():
+    shared = board_index(True)
+    own = board_index(False)
+
+    assert 'src="/dazzler/-/_dash-component-suites/dash/dash-renderer/' \
+        in shared
+    assert '/dazzler/t1/-/_dash-component-suites/' not in shared
+    assert 'src="/dazzler/t1/-/_dash-component-suites/dash/' in own
+
+
+def test_suites_get_compressed_once():
+    suites = ComponentSuites(ComponentSuiteSettings(brotli_quality=1))
+    suite, fingerprinted = suites.get('dash', 'deps/react@16.v2m1.14.0.min.js')
+    again, _ = suites.get('dash', 'deps/react@16.14.0.min.js')
+
+    assert fingerprinted and again is suite
+    assert gzip.decompress(suite.body('gzip')) == suite.body('identity')
+    for _ in range(100):
+        if 'br' in suite.encodings():
+            break
+        time.sleep(0.05)
+    assert suite.encodings() == ('br', 'gzip', 'identity')
+
+
+def test_slow_bundle_only_holds_up_its_own_requests():
+    suites = ComponentSuites(ComponentSuiteSettings())
+    slow = 'deps/react@16.14.0.min.js'
+    loading, release = threading.Event(), threading.Event()
+    loads = []
+    load = suites._load
+
+    def blocking_load(namespace, path):
+        loads.append(path)
+        if path == slow:
+            loading.set()
+            release.wait(5)
+        return load(namespace, path)
+    suites._load = blocking_load
+
+    readers = [threading.Thread(target=suites.get, args=('dash', slow))
+               for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    loading.wait(5)
+    started = time.monotonic()
+    other = suites.get('dash', 'deps/prop-types@15.8.1.min.js')
+    waited = time.monotonic() - started
+    release.set()
+    for reader in readers:
+        reader.join()
+
+    assert other is not None and waited < 1
+    assert loads.count(slow) == 1
+    assert suites.get('dash', slow) is not None
+
+
+@pytest.mark.parametrize('namespace, path', [
+    ('dash', 'dash.py'),
+    ('dash', 'dcc/../dcc/dash_core_components.js'),
+    ('dash', 'deps/missing.js'),
+    ('os', 'x.js')
+])
+def test_only_serve_component_bundles(namespace, path):
+    suites = ComponentSuites(ComponentSuiteSettings())
+    assert suites.get(namespace, path) is None
+
+
+def test_suite_route():
+    from dazzler.main import app
+    client = TestClient(app)
+    url = '/dazzler/-/_dash-component-suites/dash/deps/' \
+        'prop-types@15.v2m1.8.1.min.js'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'immutable' in response.headers['cache-control']
+    assert response.headers['vary'] == 'Accept-Encoding'
+
+    etag = response.headers['etag']
+    cached = client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    plain = client.get(
+        '/dazzler/-/_dash-component-suites/dash/deps/prop-types@15.8.1.min.js',
+        headers={'Accept-Encoding': 'identity'}
+    )
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['cache-control'] == 'no-cache'
+    assert plain.content == response.content
+
+    assert client.get(
+        '/dazzler/-/_dash-component-suites/dash/dash.py'
+    ).status_code == 404
+
+
+def test_lazy_chunks_get_fingerprinted():
+    from dazzler.main import app
+    dcc_src = re.search(r'src="([^"]*/dcc/dash_core_components\.[^"]*)"',
+                        board_index(True)).group(1)
+    assert re.search(r'/_dash-component-suites/', dcc_src)
+
+    directory, bundle = dcc_src.rsplit('/', 1)
+    fingerprint = bundle.split('.')[1]
+    chunk = f"{directory}/async-graph.{fingerprint}.js"
+    response = TestClient(app).get(chunk)
+
+    assert response.status_code == 200
+    assert response.headers['cache-control'] == IMMUTABLE_CACHE_CONTROL
@@ -1,6 +1,9 @@
-from dazzler.config import CONFIG_FILE_ENV_VAR_NAME, dazzler_config, Settings
+from dazzler.config import CONFIG_FILE_ENV_VAR_NAME, dazzler_config, \
+    reload_config, Settings
 from pathlib import Path
 
+import pytest
+
 
 def get_config_path(file_name: str) -> str:
     enclosing_dir = Path(__file__).parent.resolve()
@@ -13,6 +16,13 @@ EMPTY_YAML_PATH = get_config_path('empty.yaml')
 QL_URL_YAML_PATH = get_config_path('ql-url.yaml')
 
 
+@pytest.fixture(autouse=True)
+def reset_config(monkeypatch):
+    yield
+    monkeypatch.delenv(CONFIG_FILE_ENV_VAR_NAME, raising=False)
+    reload_config()
+
+
 def builder_1() -> int:
     return 1
 
@@ -25,7 +35,7 @@ def test_from_empty_file(monkeypatch):
     monkeypatch.setenv(CONFIG_FILE_ENV_VAR_NAME, EMPTY_YAML_PATH)
     got = Settings.load()
 
-    assert got == dazzler_config()
+    assert got == reload_config()
 
 
 def test_from_ql_url_file(monkeypatch):
@@ -33,14 +43,14 @@ def test_from_ql_url_file(monkeypatch):
     got = Settings.load()
 
     assert got.quantumleap_base_url == 'http://ql/'
-    assert got.boards == dazzler_config().boards
+    assert got.boards == reload_config().boards
 
 
 def test_from_boards_file(monkeypatch):
     monkeypatch.setenv(CONFIG_FILE_ENV_VAR_NAME, BOARDS_YAML_PATH)
     got = Settings.load()
 
-    assert got.quantumleap_base_url == dazzler_config().quantumleap_base_url
+    assert got.quantumleap_base_url == reload_config().quantumleap_base_url
     assert len(got.boards) == 2
 
     t1_boards = got.boards['t1']
@@ -64,3 +74,17 @@ def test_from_boards_file(monkeypatch):
     assert t2_b.builder() == 1
     assert t2_b.service_path == '/sp'
     assert t2_b.board_path == '/b1'
+
+
+def test_config_is_loaded_once(monkeypatch):
+    monkeypatch.setenv(CONFIG_FILE_ENV_VAR_NAME, QL_URL_YAML_PATH)
+    loaded = reload_config()
+    monkeypatch.setenv(CONFIG_FILE_ENV_VAR_NAME, EMPTY_YAML_PATH)
+
+    assert dazzler_config() is loaded
+    assert dazzler_config().quantumleap_base_url == 'http://ql/'
+
+    reloaded = reload_config()
+
+    assert dazzler_config() is reloaded
+    assert reloaded == Settings.demo_config()
@@ -0,0 +1,46 @@
+from typing import List
+from uuid import uuid4
+
+import requests
+
+from dazzler.dash.push import NOTIFY_PATH, NotificationHub, Topic
+
+
+class StubNotifier:
+    """Stands in for Orion in push mode tests.
+
+    Use it as the hub's subscribe function to record subscriptions, then
+    send notifications either straight to a hub or over HTTP to a running
+    Dazzler instance.
+    """
+
+    def __init__(self):
+        self.subscriptions: List[Topic] = []
+
+    def __call__(self, topic: Topic):
+        self.subscriptions.append(topic)
+
+    @staticmethod
+    def payload(topic: Topic, entity_ids: List[str]) -> dict:
+        return {
+            'subscriptionId': str(uuid4()),
+            'data': [{'id': x, 'type': topic.entity_type}
+                     for x in entity_ids]
+        }
+
+    def notify(self, hub: NotificationHub, topic: Topic,
+               entity_ids: List[str]) -> int:
+        notification = self.payload(topic, entity_ids)
+        return hub.publish(topic.tenant, topic.service_path,
+                           notification['data'])
+
+    def post(self, dazzler_base_url: str, topic: Topic,
+             entity_ids: List[str]):
+        headers = {
+            'fiware-service': topic.tenant,
+            'fiware-servicepath': topic.service_path
+        }
+        response = requests.post(f"{dazzler_base_url}{NOTIFY_PATH}",
+                                 headers=headers,
+                                 json=self.payload(topic, entity_ids))
+        response.raise_for_status()
@@ -0,0 +1,132 @@
+"""
+Stand-in for Quantum Leap in tests and benchmarks.
+
+A threaded HTTP server answering the handful of QL endpoints Dazzler
+queries with canned series, after an optional artificial delay to
+simulate a slow backend.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Lock, Thread
+import time
+from typing import List, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+def series_payload(entity_id: str, points: int) -> dict:
+    return {
+        'entityId': entity_id,
+        'index': [f"2022-08-06T17:{m:02d}:{s:02d}.000+00:00"
+                  for (m, s) in (divmod(k % 3600, 60)
+                                 for k in range(points))],
+        'attributes': [
+            {'attrName': 'roughness', 'values': [float(k)
+                                                 for k in range(points)]}
+        ]
+    }
+
+
+class QlStub:
+    """Runs the stub server on a background thread.
+
+    Every request gets recorded, along with its FIWARE service header, in
+    `requests`. The server waits `delay` seconds before answering and keeps
+    track of how many requests it was handling at the same time at most.
+    Any entity ID gets a series back, except the `missing` ones which get
+    a 404.
+    """
+
+    def __init__(self, delay: float = 0, points: int = 10,
+                 entity_ids: Tuple[str, ...] = ('e1', 'e2'),
+                 missing: Tuple[str, ...] = ('missing',)):
+        self.delay = delay
+        self.points = points
+        self.entity_ids = entity_ids
+        self.missing = missing
+        self.requests: List[Tuple[str, dict, str]] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = Lock()
+        server_type = type('Server', (ThreadingHTTPServer,),
+                           {'request_queue_size': 128,
+                            'daemon_threads': True})
+        self._server = server_type(('127.0.0.1', 0), self._handler())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _enter(self, path: str, query: dict, tenant: str):
+        with self._lock:
+            self.requests.append((path, query, tenant))
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _body(self, path: str, query: dict) -> object:
+        if path.startswith('/v2/entities/'):
+            entity_id = unquote(path.split('/')[-1])
+            if entity_id in self.missing:
+                return None
+            return series_payload(entity_id, self.points)
+        if path.startswith('/v2/types/'):
+            return {
+                'entityType': unquote(path.split('/')[-1]),
+                'entities': [series_payload(x, self.points)
+                             for x in self.entity_ids]
+            }
+        if path == '/v2/entities':
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['10000'])[0])
+            page = self.entity_ids[offset:offset + limit]
+            if not page:
+                return None
+            return [{'entityId': x, 'entityType': 'T', 'index': ''}
+                    for x in page]
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                stub._enter(url.path, query,
+                            self.headers.get('fiware-service'))
+                try:
+                    time.sleep(stub.delay)
+                    body = stub._body(url.path, query)
+                    if body is None:
+                        self.send_response(404)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    data = json.dumps(body).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    stub._leave()
+
+        return Handler
+
+    def start(self) -> 'QlStub':
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()